@@ -0,0 +1,344 @@
+"""
+Завантаження site-прайсу постачальника у product_catalog.
+
+Режими (env CATALOG_LOAD_MODE):
+- copy   (за замовчуванням): COPY FROM STDIN у тимчасову staging-таблицю,
+         потім DELETE + INSERT ... SELECT в ОДНІЙ транзакції.
+         Поки йде завантаження, /api/search бачить старі рядки постачальника.
+- diff:  та сама staging-таблиця, але замість повного перезапису порівнюємо
+         хеш рядка (row_hash) з уже збереженим і робимо лише INSERT / UPDATE / DELETE
+         для змінених рядків. Кількості потрапляють у stats (inserted/updated/deleted/unchanged).
+- insert: старий шлях — DELETE з окремим commit, потім pandas.to_sql (INSERT-и).
+
+Кожне успішне оновлення збільшує catalog_meta.generation (у copy/diff — у тій самій
+транзакції), тож кеш пошуку скидається після імпорту будь-якого постачальника.
+
+Обидва лоадери мають однаковий інтерфейс begin() / append(chunk) / finish() -> stats,
+тож працюють і з одним кадром, і з потоковим режимом.
+Помилки БД не зупиняють експорт прайсу: лоадер друкує помилку і вимикається.
+"""
+import csv
+import io
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from . import search_cache
+from .catalog_schema import BUMP_GENERATION_SQL, CATALOG_TABLE, ensure_catalog_schema
+from .db import get_engine
+
+STAGING_TABLE = "product_catalog_staging"
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def frame_to_copy_csv(out_df: pd.DataFrame) -> io.StringIO:
+    """
+    DataFrame → CSV-буфер для COPY ... (FORMAT csv).
+    Рядки беруться в лапки, тож "" лишається порожнім рядком; NaN пишеться як "",
+    і для нетекстових колонок COPY перетворює його на NULL через FORCE_NULL (як у to_sql).
+    """
+    buf = io.StringIO()
+    out_df.to_csv(buf, index=False, header=False, quoting=csv.QUOTE_NONNUMERIC, lineterminator="\n")
+    buf.seek(0)
+    return buf
+
+
+class _BaseCatalogLoader:
+    mode = ""
+
+    def __init__(self, supplier_id: int, engine=None):
+        self.supplier_id = supplier_id
+        self.engine = engine
+        self.failed = False
+        self.rows = 0
+        self.started_at = 0.0
+
+    def _fail(self, e: Exception) -> None:
+        self.failed = True
+        print(f"\n[ERROR] PostgreSQL save failed!!!! Details: {e}\n")
+
+    def stats(self) -> Dict[str, Any]:
+        seconds = max(time.perf_counter() - self.started_at, 1e-9)
+        return {
+            "mode": self.mode,
+            "ok": not self.failed,
+            "rows": self.rows,
+            "seconds": round(seconds, 3),
+            "rows_per_sec": int(self.rows / seconds),
+        }
+
+    def begin(self) -> None:
+        self.started_at = time.perf_counter()
+        print(f"[INFO] DB Trigger: Updating site prices for supplier ID {self.supplier_id} "
+              f"(mode={self.mode}). Connecting to PostgreSQL...")
+        try:
+            if self.engine is None:
+                self.engine = get_engine()
+            # таблиця та індекси — з app/catalog_schema.py (один раз на процес)
+            ensure_catalog_schema(self.engine)
+            self._begin()
+        except Exception as e:
+            self._fail(e)
+
+    def append(self, out_df: pd.DataFrame) -> None:
+        if self.failed:
+            return
+        try:
+            self._append(out_df)
+            self.rows += len(out_df)
+        except Exception as e:
+            self._fail(e)
+            self._abort()
+
+    def finish(self) -> Dict[str, Any]:
+        if not self.failed:
+            try:
+                self._finish()
+            except Exception as e:
+                self._fail(e)
+                self._abort()
+        stats = self.stats()
+        if stats["ok"]:
+            # кеш пошуку цього процесу перевірить generation на наступному запиті
+            search_cache.mark_stale()
+            print(f"[INFO] PostgreSQL: SUCCESS! {stats['rows']} site prices for supplier ID {self.supplier_id} "
+                  f"updated in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec, mode={self.mode}).")
+        return stats
+
+    def abort(self) -> None:
+        """Перервати завантаження (напр. якщо впав парсинг); незакомічені зміни відкочуються."""
+        self.failed = True
+        self._abort()
+
+    def _begin(self) -> None:
+        raise NotImplementedError
+
+    def _append(self, out_df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def _finish(self) -> None:
+        pass
+
+    def _abort(self) -> None:
+        pass
+
+
+class InsertCatalogLoader(_BaseCatalogLoader):
+    """Старий шлях: DELETE + commit, потім to_sql (рядкові INSERT-и в окремій транзакції)."""
+
+    mode = "insert"
+
+    def _begin(self) -> None:
+        # КРОК А: Очищення старих даних ТІЛЬКИ цього постачальника
+        print(f"[INFO] DB: Removing old records for supplier ID {self.supplier_id}...")
+        with self.engine.connect() as conn:
+            conn.execute(
+                text(f"DELETE FROM {CATALOG_TABLE} WHERE supplier_id = :sup_id"),
+                {"sup_id": self.supplier_id}
+            )
+            conn.commit()
+            print(f"[INFO] DB: Old records deleted.")
+
+    def _append(self, out_df: pd.DataFrame) -> None:
+        # КРОК Б: Додавання нових даних (append)
+        out_df.to_sql(CATALOG_TABLE, con=self.engine, if_exists="append", index=False)
+
+    def _finish(self) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(text(BUMP_GENERATION_SQL))
+
+
+class CopyCatalogLoader(_BaseCatalogLoader):
+    """COPY FROM STDIN → staging → DELETE + INSERT SELECT в одній транзакції."""
+
+    mode = "copy"
+
+    def __init__(self, supplier_id: int, engine=None):
+        super().__init__(supplier_id, engine)
+        self.conn = None
+        self.columns: Optional[List[str]] = None
+        self.force_null: List[str] = []
+
+    def _begin(self) -> None:
+        # з'єднання і staging створюються на першому append, коли відомі колонки
+        pass
+
+    def _open(self, out_df: pd.DataFrame) -> None:
+        self.columns = [str(c) for c in out_df.columns]
+        self.force_null = [str(c) for c in out_df.columns if out_df[c].dtype != object]
+        self.conn = self.engine.raw_connection()
+        with self.conn.cursor() as cur:
+            cur.execute(
+                f"CREATE TEMP TABLE {STAGING_TABLE} "
+                f"(LIKE {CATALOG_TABLE} INCLUDING DEFAULTS) ON COMMIT DROP"
+            )
+
+    def _append(self, out_df: pd.DataFrame) -> None:
+        if self.conn is None:
+            self._open(out_df)
+        cols = ", ".join(_quote_ident(c) for c in self.columns)
+        options = "FORMAT csv"
+        if self.force_null:
+            options += ", FORCE_NULL (" + ", ".join(_quote_ident(c) for c in self.force_null) + ")"
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {STAGING_TABLE} ({cols}) FROM STDIN WITH ({options})",
+                frame_to_copy_csv(out_df[self.columns]),
+            )
+
+    def _finish(self) -> None:
+        if self.conn is None:
+            # порожній прайс: атомарно прибираємо рядки постачальника
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text(f"DELETE FROM {CATALOG_TABLE} WHERE supplier_id = :sup_id"),
+                    {"sup_id": self.supplier_id},
+                )
+                conn.execute(text(BUMP_GENERATION_SQL))
+            return
+        cols = ", ".join(_quote_ident(c) for c in self.columns)
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"DELETE FROM {CATALOG_TABLE} WHERE supplier_id = %s", (self.supplier_id,))
+                cur.execute(f"INSERT INTO {CATALOG_TABLE} ({cols}) SELECT {cols} FROM {STAGING_TABLE}")
+                cur.execute(BUMP_GENERATION_SQL)
+            self.conn.commit()
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def _abort(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.rollback()
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+
+class DiffCatalogLoader(CopyCatalogLoader):
+    """
+    Інкрементальна синхронізація: staging → diff із рядками постачальника → лише зміни.
+
+    Ключ рядка — (code, brand); дублікати ключа в прайсі розводимо порядковим номером
+    (row_number за row_hash), тож результат збігається з повним перезаписом.
+    row_hash = md5 від усіх колонок рядка, крім supplier_id (code, unicode, brand, name,
+    stock, price_eur) — зміна назви теж оновлює рядок. Рядки, завантажені режимами
+    copy/insert, мають row_hash = NULL і при першому diff-запуску просто оновлюються.
+    Колонку row_hash додає міграція схеми (catalog_schema.py).
+    """
+
+    mode = "diff"
+    DIFF_TABLE = "product_catalog_diff"
+
+    def __init__(self, supplier_id: int, engine=None):
+        super().__init__(supplier_id, engine)
+        self.counts: Dict[str, int] = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    def _finish(self) -> None:
+        if self.conn is None:
+            # порожній прайс: усі рядки постачальника — видалені
+            with self.engine.begin() as conn:
+                res = conn.execute(
+                    text(f"DELETE FROM {CATALOG_TABLE} WHERE supplier_id = :sup_id"),
+                    {"sup_id": self.supplier_id},
+                )
+                self.counts["deleted"] = res.rowcount
+                if res.rowcount:
+                    conn.execute(text(BUMP_GENERATION_SQL))
+            return
+
+        data_cols = [c for c in self.columns if c != "supplier_id"]
+        cols = ", ".join(_quote_ident(c) for c in self.columns)
+        new_hash = "md5(ROW(" + ", ".join("s." + _quote_ident(c) for c in data_cols) + ")::text)"
+        set_cols = ", ".join(f"{_quote_ident(c)} = s.{_quote_ident(c)}" for c in data_cols)
+        s_cols = ", ".join("s." + _quote_ident(c) for c in self.columns)
+        key = "coalesce(code, ''), coalesce(brand, '')"
+        diff = self.DIFF_TABLE
+        try:
+            with self.conn.cursor() as cur:
+                # old.rid / new.srid — фізичні адреси рядків (ctid) у каталозі та staging
+                cur.execute(
+                    f"""
+                    CREATE TEMP TABLE {diff} ON COMMIT DROP AS
+                    WITH old AS (
+                        SELECT ctid AS rid, coalesce(code, '') AS k_code, coalesce(brand, '') AS k_brand,
+                               row_hash, row_number() OVER (PARTITION BY {key} ORDER BY row_hash) AS rn
+                        FROM {CATALOG_TABLE} WHERE supplier_id = %(sid)s
+                    ), new AS (
+                        SELECT h.*, row_number() OVER (PARTITION BY k_code, k_brand ORDER BY row_hash) AS rn
+                        FROM (
+                            SELECT s.ctid AS srid, coalesce(s.code, '') AS k_code,
+                                   coalesce(s.brand, '') AS k_brand, {new_hash} AS row_hash
+                            FROM {STAGING_TABLE} s
+                        ) h
+                    )
+                    SELECT o.rid, n.srid, n.row_hash,
+                           CASE WHEN o.rid IS NULL THEN 'I'
+                                WHEN n.srid IS NULL THEN 'D'
+                                WHEN o.row_hash IS DISTINCT FROM n.row_hash THEN 'U'
+                                ELSE '=' END AS op
+                    FROM old o
+                    FULL JOIN new n ON o.k_code = n.k_code AND o.k_brand = n.k_brand AND o.rn = n.rn
+                    """,
+                    {"sid": self.supplier_id},
+                )
+                cur.execute(
+                    f"DELETE FROM {CATALOG_TABLE} c USING {diff} d "
+                    f"WHERE d.op = 'D' AND c.ctid = d.rid"
+                )
+                cur.execute(
+                    f"UPDATE {CATALOG_TABLE} c SET {set_cols}, row_hash = d.row_hash "
+                    f"FROM {diff} d JOIN {STAGING_TABLE} s ON s.ctid = d.srid "
+                    f"WHERE d.op = 'U' AND c.ctid = d.rid"
+                )
+                cur.execute(
+                    f"INSERT INTO {CATALOG_TABLE} ({cols}, row_hash) "
+                    f"SELECT {s_cols}, d.row_hash FROM {diff} d JOIN {STAGING_TABLE} s ON s.ctid = d.srid "
+                    f"WHERE d.op = 'I'"
+                )
+                cur.execute(f"SELECT op, count(*) FROM {diff} GROUP BY op")
+                names = {"I": "inserted", "U": "updated", "D": "deleted", "=": "unchanged"}
+                for op, n in cur.fetchall():
+                    self.counts[names[op]] = n
+                # без змін — кеш пошуку лишається валідним
+                if self.counts["inserted"] or self.counts["updated"] or self.counts["deleted"]:
+                    cur.execute(BUMP_GENERATION_SQL)
+            self.conn.commit()
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats.update(self.counts)
+        return stats
+
+    def finish(self) -> Dict[str, Any]:
+        stats = super().finish()
+        if stats["ok"]:
+            print(f"[INFO] PostgreSQL diff: +{stats['inserted']} ~{stats['updated']} "
+                  f"-{stats['deleted']} ={stats['unchanged']} for supplier ID {self.supplier_id}.")
+        return stats
+
+
+LOADERS = {
+    "copy": CopyCatalogLoader,
+    "diff": DiffCatalogLoader,
+    "insert": InsertCatalogLoader,
+}
+
+
+def make_catalog_loader(supplier_id: int, mode: Optional[str] = None, engine=None) -> _BaseCatalogLoader:
+    """Лоадер за режимом: параметр → env CATALOG_LOAD_MODE → "copy"."""
+    mode = (mode or os.getenv("CATALOG_LOAD_MODE") or "copy").lower()
+    if mode not in LOADERS:
+        raise ValueError(f"Unknown CATALOG_LOAD_MODE: {mode}")
+    return LOADERS[mode](supplier_id, engine=engine)
@@ -0,0 +1,166 @@
+"""
+Схема product_catalog, якою володіє бекенд (раніше таблицю неявно створював pandas.to_sql).
+
+- явні типи колонок;
+- GIN-індекси pg_trgm на code / name / brand — для ILIKE '%q%' у /api/search;
+- btree на supplier_id (DELETE / diff по постачальнику) і на ключ сортування
+  SORT_KEY = (price_eur, supplier_id, code, brand, id) — порядок видачі й keyset-пагінації
+  /api/search (id — сурогатний ключ, робить порядок однозначним навіть для дублікатів);
+- code_key (нормалізований артикул, див. app/code_key.py): btree text_pattern_ops для
+  точного (=) і префіксного (LIKE 'KEY%') пошуку + trigram для входження.
+
+catalog_meta — один рядок із лічильником generation: кожне успішне оновлення каталогу
+збільшує його в тій самій транзакції, а кеш пошуку (app/search_cache.py) скидається,
+побачивши нове значення — навіть якщо імпорт ішов в іншому процесі.
+
+Міграція ідемпотентна (IF NOT EXISTS), її можна запускати скільки завгодно разів:
+    python -m app.catalog_schema        (з backend/)
+Лоадери каталогу викликають ensure_catalog_schema() один раз на процес перед записом.
+
+pg_trgm — розширення PostgreSQL (contrib). Якщо його немає або бракує прав на
+CREATE EXTENSION, таблиця і btree-індекси все одно створюються, а пошук працює
+без trigram-індексів (seq scan), з попередженням у лозі.
+"""
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from .db import get_async_engine, get_engine
+
+CATALOG_TABLE = "product_catalog"
+
+CREATE_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {CATALOG_TABLE} (
+    id          bigserial PRIMARY KEY,
+    supplier_id bigint NOT NULL,
+    code        text,
+    unicode     text,
+    brand       text,
+    name        text,
+    stock       bigint,
+    price_eur   double precision,
+    code_key    text,
+    row_hash    text
+)
+"""
+
+# Колонки, яких може не бути в старій таблиці (створеній через to_sql)
+ADD_COLUMNS: List[Tuple[str, str]] = [
+    ("id", "bigserial PRIMARY KEY"),
+    ("row_hash", "text"),
+    ("code_key", "text"),
+]
+
+# Ключ сортування пошуку. NULL-и згорнуті, щоб порівняння рядків (keyset) було тотальним;
+# пошукові запити мають використовувати рівно цей вираз, інакше індекс не спрацює.
+SORT_KEY_COLUMNS = [
+    "coalesce(price_eur, 'Infinity'::double precision)",
+    "supplier_id",
+    "coalesce(code, '')",
+    "coalesce(brand, '')",
+    "id",
+]
+SORT_KEY = ", ".join(SORT_KEY_COLUMNS)
+
+BTREE_INDEXES: List[Tuple[str, str]] = [
+    (f"ix_{CATALOG_TABLE}_supplier_id", "(supplier_id)"),
+    (f"ix_{CATALOG_TABLE}_sort_key", "(" + ", ".join(f"({c})" for c in SORT_KEY_COLUMNS) + ")"),
+    (f"ix_{CATALOG_TABLE}_code_key", "(code_key text_pattern_ops)"),
+]
+
+TRGM_INDEXES: List[Tuple[str, str]] = [
+    (f"ix_{CATALOG_TABLE}_code_trgm", "USING gin (code gin_trgm_ops)"),
+    (f"ix_{CATALOG_TABLE}_name_trgm", "USING gin (name gin_trgm_ops)"),
+    (f"ix_{CATALOG_TABLE}_brand_trgm", "USING gin (brand gin_trgm_ops)"),
+    (f"ix_{CATALOG_TABLE}_code_key_trgm", "USING gin (code_key gin_trgm_ops)"),
+]
+
+META_TABLE = "catalog_meta"
+
+CREATE_META = f"""
+CREATE TABLE IF NOT EXISTS {META_TABLE} (
+    id          smallint PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    generation  bigint NOT NULL DEFAULT 0,
+    updated_at  timestamptz NOT NULL DEFAULT now()
+)
+"""
+
+BUMP_GENERATION_SQL = f"UPDATE {META_TABLE} SET generation = generation + 1, updated_at = now() WHERE id = 1"
+READ_GENERATION_SQL = f"SELECT generation FROM {META_TABLE} WHERE id = 1"
+
+# Індекси, замінені новішими (видаляються міграцією)
+DROP_INDEXES: List[str] = [
+    f"ix_{CATALOG_TABLE}_price_eur",   # → ix_product_catalog_sort_key
+]
+
+_ensured = set()
+_lock = threading.Lock()
+
+
+def migrate(engine=None) -> Dict[str, bool]:
+    """Створити / доповнити таблицю та індекси. Повертає {"table": ..., "trgm": ...}."""
+    engine = engine or get_engine()
+
+    with engine.begin() as conn:
+        conn.execute(text(CREATE_TABLE))
+        for col, col_type in ADD_COLUMNS:
+            conn.execute(text(f"ALTER TABLE {CATALOG_TABLE} ADD COLUMN IF NOT EXISTS {col} {col_type}"))
+        for name, spec in BTREE_INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {CATALOG_TABLE} {spec}"))
+        for name in DROP_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text(CREATE_META))
+        conn.execute(text(f"INSERT INTO {META_TABLE} (id) VALUES (1) ON CONFLICT (id) DO NOTHING"))
+
+    # pg_trgm — окремою транзакцією: без розширення решта схеми лишається валідною
+    trgm = True
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for name, spec in TRGM_INDEXES:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {CATALOG_TABLE} {spec}"))
+    except Exception as e:
+        trgm = False
+        print(f"[WARN] DB: pg_trgm indexes are not available, search will scan the table. Details: {e}")
+
+    return {"table": True, "trgm": trgm}
+
+
+def read_generation(engine=None) -> int:
+    """Поточне покоління каталогу."""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        return int(conn.execute(text(READ_GENERATION_SQL)).scalar() or 0)
+
+
+async def read_generation_async(engine=None) -> int:
+    """read_generation для async-роутера."""
+    engine = engine or get_async_engine()
+    async with engine.connect() as conn:
+        return int((await conn.execute(text(READ_GENERATION_SQL))).scalar() or 0)
+
+
+def ensure_catalog_schema(engine=None) -> None:
+    """migrate() один раз на процес для даного engine (для лоадерів каталогу)."""
+    engine = engine or get_engine()
+    key = str(engine.url)
+    if key in _ensured:
+        return
+    with _lock:
+        if key not in _ensured:
+            migrate(engine)
+            _ensured.add(key)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    status = migrate()
+    print(f"[INFO] DB: schema for '{CATALOG_TABLE}' is up to date "
+          f"(trgm indexes: {'yes' if status['trgm'] else 'NO'}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Пошук у product_catalog з ранжуванням за якістю збігу.
+
+Запит "oc-90" / "OC 90" / "oc90" → code_key "OC90" (app/code_key.py), далі рівні по черзі:
+1. exact     — code_key = 'OC90'             (btree ix_product_catalog_code_key, точкове читання)
+2. prefix    — code_key LIKE 'OC90%'         (той самий btree, text_pattern_ops)
+3. substring — code_key LIKE '%OC90%' або ILIKE '%oc-90%' по code / name / brand (pg_trgm GIN)
+Наступний рівень виконується, лише якщо попередні не заповнили limit; рядки з вищих рівнів
+у нижчих не повторюються. Усередині рівня — за ключем сортування
+(price_eur, supplier_id, code, brand, id), див. SORT_KEY у catalog_schema.py.
+
+Пагінація (search_page) — keyset, без OFFSET: курсор — це позиція останнього рядка
+(рівень + ключ сортування), наступна сторінка читає "рядки після неї". Глибокі сторінки
+коштують стільки ж, скільки перша. Курсор непрозорий для клієнта (base64 JSON).
+"""
+import base64
+import json
+import math
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from .catalog_schema import CATALOG_TABLE, SORT_KEY
+from .code_key import code_key
+
+SELECT_COLUMNS = "id, supplier_id, code, unicode, brand, name, stock, price_eur"
+
+# рядок без code_key (завантажений до міграції) не вважаємо префіксним збігом
+_NOT_PREFIX = "NOT coalesce(code_key LIKE :key_prefix, false)"
+_TEXT_MATCH = "code ILIKE :pattern OR name ILIKE :pattern OR brand ILIKE :pattern"
+
+
+def like_pattern(q: str) -> str:
+    """'%q%' для ILIKE; % і _ з запиту шукаються буквально, а не як шаблон."""
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_tiers(q: str) -> Tuple[List[Tuple[str, str]], Dict[str, Any]]:
+    """[(match, WHERE-умова)] від найкращого збігу до найгіршого + параметри запиту."""
+    key = code_key(q)
+    params: Dict[str, Any] = {"pattern": like_pattern(q)}
+    if not key:
+        # у запиті немає ні літер, ні цифр — лише текстовий пошук
+        return [("substring", _TEXT_MATCH)], params
+
+    params.update({"key": key, "key_prefix": key + "%", "key_substring": "%" + key + "%"})
+    return [
+        ("exact", "code_key = :key"),
+        ("prefix", "code_key LIKE :key_prefix AND code_key <> :key"),
+        ("substring", f"(code_key LIKE :key_substring OR {_TEXT_MATCH}) AND {_NOT_PREFIX}"),
+    ], params
+
+
+def tier_sql(where: str, after_cursor: bool = False) -> str:
+    if after_cursor:
+        where = f"({where}) AND ({SORT_KEY}) > (:c_price, :c_supplier_id, :c_code, :c_brand, :c_id)"
+    return (
+        f"SELECT {SELECT_COLUMNS} FROM {CATALOG_TABLE} "
+        f"WHERE {where} ORDER BY {SORT_KEY} LIMIT :limit_val"
+    )
+
+
+# ----------------------- Steps (однакові для sync і async) -----------------------
+# Логіка пошуку написана як генератор кроків: він віддає (sql, params) і отримує рядки
+# (список dict). Виконують його _run (sync Connection) або _run_async (AsyncConnection),
+# тож SQL і ранжування не дублюються між routers/search.py і routers/search_async.py.
+
+Step = Tuple[str, Dict[str, Any]]
+
+
+def _search_steps(q: str, limit: int) -> Generator[Step, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    tiers, params = search_tiers(q)
+    results: List[Dict[str, Any]] = []
+    for match, where in tiers:
+        left = limit - len(results)
+        if left <= 0:
+            break
+        rows = yield tier_sql(where), {**params, "limit_val": left}
+        for item in rows:
+            item["match"] = match
+            results.append(item)
+    return results
+
+
+def _run(steps, conn):
+    try:
+        sql, params = next(steps)
+        while True:
+            rows = [dict(row._mapping) for row in conn.execute(text(sql), params)]
+            sql, params = steps.send(rows)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _run_async(steps, conn):
+    try:
+        sql, params = next(steps)
+        while True:
+            rows = [dict(row._mapping) for row in await conn.execute(text(sql), params)]
+            sql, params = steps.send(rows)
+    except StopIteration as stop:
+        return stop.value
+
+
+def search_catalog(conn, q: str, limit: int) -> List[Dict[str, Any]]:
+    """Ранжований пошук на відкритому з'єднанні SQLAlchemy. Кожен рядок має поле "match"."""
+    return _run(_search_steps(q, limit), conn)
+
+
+async def search_catalog_async(conn, q: str, limit: int) -> List[Dict[str, Any]]:
+    """search_catalog для AsyncConnection."""
+    return await _run_async(_search_steps(q, limit), conn)
+
+
+# ----------------------- Keyset pagination -----------------------
+
+def _sort_key(item: Dict[str, Any]) -> List[Any]:
+    """Ключ сортування рядка так само, як SORT_KEY у SQL (NULL-и згорнуті)."""
+    price = item.get("price_eur")
+    return [
+        math.inf if price is None else float(price),
+        int(item["supplier_id"]),
+        item.get("code") or "",
+        item.get("brand") or "",
+        int(item["id"]),
+    ]
+
+
+def encode_cursor(q: str, tier: int, key: List[Any]) -> str:
+    raw = json.dumps([q, tier] + key, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, q: str) -> Tuple[int, List[Any]]:
+    """cursor → (рівень, ключ). ValueError, якщо курсор битий або від іншого запиту."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cq, tier, price, supplier_id, code, brand, id_ = json.loads(raw.decode("utf-8"))
+        key = [float(price), int(supplier_id), str(code), str(brand), int(id_)]
+        tier = int(tier)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cq != q:
+        raise ValueError("Cursor does not belong to this query")
+    return tier, key
+
+
+def _estimate_steps(q: str) -> Generator[Step, List[Dict[str, Any]], int]:
+    """
+    Оцінка кількості збігів за статистикою планувальника (EXPLAIN, без COUNT(*)).
+    Усі рівні разом — це умова останнього рівня без виключення префіксів.
+    """
+    key = code_key(q)
+    params: Dict[str, Any] = {"pattern": like_pattern(q)}
+    where = _TEXT_MATCH
+    if key:
+        where = f"code_key LIKE :key_substring OR {_TEXT_MATCH}"
+        params["key_substring"] = "%" + key + "%"
+    rows = yield f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {CATALOG_TABLE} WHERE {where}", params
+    plan = next(iter(rows[0].values()))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def estimate_total(conn, q: str) -> int:
+    return _run(_estimate_steps(q), conn)
+
+
+def _page_steps(
+        q: str,
+        limit: int,
+        cursor: Optional[str],
+        with_total: bool,
+) -> Generator[Step, List[Dict[str, Any]], Dict[str, Any]]:
+    tiers, params = search_tiers(q)
+    start_tier, after = (0, None) if not cursor else decode_cursor(cursor, q)
+    if not 0 <= start_tier < len(tiers):
+        raise ValueError("Invalid cursor")
+
+    items: List[Dict[str, Any]] = []
+    item_tiers: List[int] = []
+    for tier in range(start_tier, len(tiers)):
+        # +1 рядок наперед — щоб знати, чи є наступна сторінка
+        left = limit + 1 - len(items)
+        if left <= 0:
+            break
+        match, where = tiers[tier]
+        tier_params = {**params, "limit_val": left}
+        use_cursor = after is not None and tier == start_tier
+        if use_cursor:
+            tier_params.update(zip(("c_price", "c_supplier_id", "c_code", "c_brand", "c_id"), after))
+        rows = yield tier_sql(where, after_cursor=use_cursor), tier_params
+        for item in rows:
+            item["match"] = match
+            items.append(item)
+            item_tiers.append(tier)
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(q, item_tiers[limit - 1], _sort_key(items[-1]))
+
+    estimated_total = None
+    if with_total and not cursor:
+        estimated_total = yield from _estimate_steps(q)
+
+    return {"items": items, "next_cursor": next_cursor, "estimated_total": estimated_total}
+
+
+def search_page(
+        conn,
+        q: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+) -> Dict[str, Any]:
+    """
+    Одна сторінка ранжованого пошуку: {"items", "next_cursor", "estimated_total"}.
+    next_cursor = None — це остання сторінка. estimated_total рахується лише для
+    першої сторінки і лише на запит (with_total).
+    """
+    return _run(_page_steps(q, limit, cursor, with_total), conn)
+
+
+async def search_page_async(
+        conn,
+        q: str,
+        limit: int,
+        cursor: Optional[str] = None,
+        with_total: bool = False,
+) -> Dict[str, Any]:
+    """search_page для AsyncConnection."""
+    return await _run_async(_page_steps(q, limit, cursor, with_total), conn)
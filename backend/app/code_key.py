@@ -0,0 +1,16 @@
+"""
+Нормалізований ключ артикула (code_key).
+
+Клієнти вводять той самий номер як "OC 90", "oc-90" або "OC90" — усі вони дають ключ "OC90":
+великі літери, без пробілів, дефісів, крапок, слешів та інших роздільників.
+Ключ рахується при імпорті (price_processor / vector_parser), зберігається в
+product_catalog.code_key і використовується /api/search для точного та префіксного пошуку.
+"""
+import re
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def code_key(code: str) -> str:
+    """'oc-90 ' → 'OC90'."""
+    return _SEPARATORS.sub("", code or "").upper()
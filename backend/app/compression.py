@@ -0,0 +1,76 @@
+"""
+Стиснення вихідних файлів профілів (compression: gzip | zstd у config/profiles.yaml).
+
+Стискається потоком під час експорту (price_processor._OutputUpload): компресор пише одразу
+в storage.UploadStream, тож ні стиснутий, ні нестиснутий файл не тримається на диску чи в пам'яті.
+Об'єкт у R2 — справжній архів: суфікс (.gz / .zst) і Content-Type application/gzip | application/zstd,
+без Content-Encoding. Користувач завантажує саме стиснутий файл і розпаковує його сам; браузери та
+HTTP-клієнти не розпаковують його «тихо» (інакше під ім'ям *.gz лежав би звичайний CSV).
+
+zstandard — опційна залежність: без неї zstd-профіль падає з зрозумілою помилкою, gzip працює завжди.
+"""
+import gzip
+from typing import BinaryIO, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - залежить від оточення
+    zstandard = None
+
+CODECS = ("gzip", "zstd")
+
+_SUFFIX = {"gzip": ".gz", "zstd": ".zst"}
+_DEFAULT_LEVEL = {"gzip": 6, "zstd": 3}
+
+
+def available(codec: str) -> bool:
+    return codec == "gzip" or (codec == "zstd" and zstandard is not None)
+
+
+def suffix(codec: Optional[str]) -> str:
+    """Суфікс ключа в R2: "x.csv" → "x.csv.gz"."""
+    return _SUFFIX[codec] if codec else ""
+
+
+_CONTENT_TYPE = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+
+def content_type(codec: Optional[str], default: str) -> str:
+    """Content-Type об'єкта: для стиснутого — тип архіву, інакше default (тип вихідного формату)."""
+    return _CONTENT_TYPE[codec] if codec else default
+
+
+class _GzipWriter:
+    def __init__(self, raw: BinaryIO, level: int):
+        # mtime=0: однаковий вміст → однакові байти (без часу стиснення в заголовку)
+        self._gz = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=level, mtime=0)
+
+    def write(self, data: bytes) -> int:
+        return self._gz.write(data)
+
+    def close(self) -> None:
+        self._gz.close()   # дописує трейлер; raw не закривається
+
+
+class _ZstdWriter:
+    def __init__(self, raw: BinaryIO, level: int):
+        self._zw = zstandard.ZstdCompressor(level=level).stream_writer(raw, closefd=False)
+
+    def write(self, data: bytes) -> int:
+        return self._zw.write(data)
+
+    def close(self) -> None:
+        self._zw.close()   # завершує кадр; raw не закривається
+
+
+def open_writer(codec: str, raw: BinaryIO, level: Optional[int] = None) -> BinaryIO:
+    """
+    Компресор поверх потоку raw: write(bytes) → стиснуті байти в raw.
+    close() завершує стиснутий потік, але raw не закриває (ним керує власник).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown compression: {codec}")
+    if not available(codec):
+        raise RuntimeError(f"Compression {codec} requires the 'zstandard' package")
+    level = _DEFAULT_LEVEL[codec] if level is None else level
+    return _GzipWriter(raw, level) if codec == "gzip" else _ZstdWriter(raw, level)
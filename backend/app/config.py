@@ -0,0 +1,458 @@
+"""
+Типізована конфігурація: config/suppliers.yaml і config/profiles.yaml.
+
+Раніше YAML відкривався і парсився заново в кожному місці (_load_supplier_cfg,
+_get_supplier_id, process_all_prices) по кілька разів за імпорт, а помилка в конфігу
+виявлялась посеред прогону. Тут:
+- файл парситься один раз у незмінні (frozen, slots) dataclass-и і перевіряється цілком:
+  ConfigError з шляхом до поля ("profiles.yaml: profiles[2].factor: ...");
+- перечитується лише тоді, коли змінився mtime / розмір файлу;
+- план парсингу постачальника (ParsePlan) і колонки профілів готуються один раз.
+
+Читають звідси і пайплайн (price_processor / price_manager), і API (routers/admin.py;
+main.py перевіряє обидва файли на старті — з битим конфігом сервер не підніметься).
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import yaml
+
+from .compression import CODECS
+from .paths import CONFIG_DIR
+
+SUPPLIERS_FILE = "suppliers.yaml"
+PROFILES_FILE = "profiles.yaml"
+
+STD_FIELDS = ("code", "unicode", "brand", "name", "stock", "price")
+# звідки профіль може брати колонки (див. price_processor._build_output_df)
+OUTPUT_SOURCES = STD_FIELDS + ("code_key", "supplier_id")
+# звідки планувальник (app/scheduler.py) бере прайс постачальника
+SCHEDULE_SOURCES = ("ftp", "gmail")
+
+
+class ConfigError(ValueError):
+    """Конфіг не пройшов перевірку."""
+
+
+# ----------------------- Typed objects -----------------------
+
+@dataclass(frozen=True, slots=True)
+class ParsePlan:
+    """Як парсити сирий прайс постачальника (raw_layout / preprocess / normalize)."""
+    engine: str                      # vectorized | legacy (env PRICE_PARSER_ENGINE має пріоритет)
+    colmap: Mapping[str, int]
+    skip_rows: int
+    stock_index: Optional[int]
+    stock_header_token: str
+    gt5_to: Optional[int]
+    normalize_mode: str              # spaces | csv
+
+    def parser_kwargs(self) -> Dict[str, Any]:
+        """kwargs для lines_to_rows / vector_parser.parse_standard_df."""
+        return {
+            "stock_index": self.stock_index,
+            "stock_header_token": self.stock_header_token,
+            "gt5_to": self.gt5_to,
+            "normalize_mode": self.normalize_mode,
+        }
+
+
+# план для постачальника без секції в suppliers.yaml (поведінка, як і раніше, з порожнім конфігом)
+EMPTY_PLAN = ParsePlan(
+    engine="vectorized",
+    colmap=MappingProxyType({}),
+    skip_rows=0,
+    stock_index=None,
+    stock_header_token="STAN",
+    gt5_to=None,
+    normalize_mode="spaces",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleConfig:
+    """Автоімпорт постачальника (секція schedule, див. app/scheduler.py)."""
+    source: str                      # ftp | gmail
+    path: Optional[str]              # ftp: шлях до прайсу на FTP
+    query: Optional[str]             # gmail: пошуковий запит
+    attachment: Optional[str]        # gmail: точна назва вкладення
+    interval: int                    # секунди між перевірками
+    jitter: float                    # ± частка interval (щоб перевірки не збігались)
+    retry: int                       # пауза після першого збою, далі ×2
+    max_backoff: int                 # верхня межа паузи після збоїв
+    profile_filter: Optional[str]
+    enabled: bool
+
+
+@dataclass(frozen=True, slots=True)
+class SupplierConfig:
+    name: str
+    supplier_id: Optional[int]
+    plan: ParsePlan
+    raw: Mapping[str, Any] = field(repr=False)  # секція як є (для полів, яких тут ще не описано)
+    schedule: Optional[ScheduleConfig] = None
+
+
+@dataclass(frozen=True, slots=True)
+class RateParams:
+    add_uah: float
+    min_rate: float
+    fallback: float
+
+
+@dataclass(frozen=True, slots=True)
+class ProfileConfig:
+    name: str
+    factor: float
+    currency_out: str                # EUR | UAH
+    format: str                      # xlsx | csv
+    r2_prefix_template: str          # "1_23/{supplier}/"
+    columns: Tuple[Mapping[str, Any], ...]
+    csv: Mapping[str, Any]
+    rate: Optional[RateParams]       # лише для UAH
+    compression: Optional[str] = None        # gzip | zstd (лише csv, див. app/compression.py)
+    compression_level: Optional[int] = None
+
+    def r2_prefix(self, supplier: str) -> str:
+        prefix = self.r2_prefix_template.format(supplier=supplier.lower())
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        return prefix
+
+    def columns_cfg(self) -> List[Dict[str, Any]]:
+        """Колонки як list[dict] (export_profile / ProfileStream; dict — щоб передати в пул процесів)."""
+        return [dict(c) for c in self.columns]
+
+
+@dataclass(frozen=True, slots=True)
+class RetentionPolicy:
+    prefix: str
+    keep: int
+    env: Optional[str]               # R2_KEEP_* — перекриває keep, якщо задана
+
+
+@dataclass(frozen=True, slots=True)
+class RetentionConfig:
+    """Скільки файлів лишати в префіксі R2 (common.retention у profiles.yaml)."""
+    default_keep: int
+    policies: Tuple[RetentionPolicy, ...]
+
+    def keep_for(self, prefix: str) -> int:
+        matches = [p for p in self.policies if prefix.startswith(p.prefix)]
+        if not matches:
+            return self.default_keep
+        policy = max(matches, key=lambda p: len(p.prefix))
+        env = os.getenv(policy.env) if policy.env else None
+        return int(env) if env else policy.keep
+
+
+@dataclass(frozen=True, slots=True)
+class ProfilesConfig:
+    rounding: Mapping[str, int]
+    profiles: Tuple[ProfileConfig, ...]
+    retention: RetentionConfig
+
+    def select(self, profile_filter: Optional[str] = None) -> List[ProfileConfig]:
+        """Профілі, назва яких містить profile_filter (без урахування регістру)."""
+        if not profile_filter:
+            return list(self.profiles)
+        return [p for p in self.profiles if profile_filter.lower() in p.name.lower()]
+
+
+# ----------------------- Validation helpers -----------------------
+
+def _fail(where: str, msg: str) -> None:
+    raise ConfigError(f"{where}: {msg}")
+
+
+def _mapping(value: Any, where: str) -> Dict[str, Any]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        _fail(where, f"expected a mapping, got {type(value).__name__}")
+    return value
+
+
+def _int(value: Any, where: str, optional: bool = True, minimum: Optional[int] = None) -> Optional[int]:
+    if value is None and optional:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        _fail(where, f"expected an integer, got {value!r}")
+    if minimum is not None and value < minimum:
+        _fail(where, f"must be >= {minimum}, got {value}")
+    return value
+
+
+def _number(value: Any, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        _fail(where, f"expected a number, got {value!r}")
+    return float(value)
+
+
+def _string(value: Any, where: str) -> str:
+    if not isinstance(value, str) or not value.strip():
+        _fail(where, "expected a non-empty string")
+    return value.strip()
+
+
+def _choice(value: Any, where: str, choices: Tuple[str, ...]) -> str:
+    val = str(value).lower()
+    if val not in choices:
+        _fail(where, f"expected one of {', '.join(choices)}, got {value!r}")
+    return val
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# ----------------------- Parsing -----------------------
+
+def parse_supplier(name: str, node: Any, where: str) -> SupplierConfig:
+    node = _mapping(node, where)
+    layout = _mapping(node.get("raw_layout"), f"{where}.raw_layout")
+    preprocess = _mapping(node.get("preprocess"), f"{where}.preprocess")
+    normalize = _mapping(node.get("normalize"), f"{where}.normalize")
+
+    colmap: Dict[str, int] = {}
+    for field, idx in _mapping(layout.get("columns"), f"{where}.raw_layout.columns").items():
+        if field not in STD_FIELDS:
+            _fail(f"{where}.raw_layout.columns.{field}", f"unknown column, expected one of {', '.join(STD_FIELDS)}")
+        colmap[field] = _int(idx, f"{where}.raw_layout.columns.{field}", optional=False, minimum=0)
+
+    plan = ParsePlan(
+        engine=_choice(normalize.get("engine") or "vectorized", f"{where}.normalize.engine", ("vectorized", "legacy")),
+        colmap=MappingProxyType(colmap),
+        skip_rows=_int(preprocess.get("skip_rows", 0) or 0, f"{where}.preprocess.skip_rows", minimum=0),
+        stock_index=_int(layout.get("stock_index"), f"{where}.raw_layout.stock_index", minimum=0),
+        stock_header_token=str(layout.get("stock_header_token", "STAN")),
+        gt5_to=_int(layout.get("gt5_to"), f"{where}.raw_layout.gt5_to"),
+        normalize_mode=_choice(normalize.get("mode", "spaces"), f"{where}.normalize.mode", ("spaces", "csv")),
+    )
+    return SupplierConfig(
+        name=name,
+        supplier_id=_int(node.get("supplier_id"), f"{where}.supplier_id", minimum=1),
+        plan=plan,
+        raw=_freeze(node),
+        schedule=parse_schedule(node.get("schedule"), f"{where}.schedule"),
+    )
+
+
+def parse_schedule(node: Any, where: str) -> Optional[ScheduleConfig]:
+    if node is None:
+        return None
+    node = _mapping(node, where)
+    source = _choice(node.get("source"), f"{where}.source", SCHEDULE_SOURCES)
+    path = query = attachment = None
+    if source == "ftp":
+        path = _string(node.get("path"), f"{where}.path")
+    else:
+        query = _string(node.get("query"), f"{where}.query")
+        attachment = _string(node.get("attachment"), f"{where}.attachment")
+
+    jitter = _number(node.get("jitter", 0.1), f"{where}.jitter")
+    if not 0 <= jitter < 1:
+        _fail(f"{where}.jitter", f"must be in [0, 1), got {jitter}")
+    retry = _int(node.get("retry", 60), f"{where}.retry", optional=False, minimum=1)
+    return ScheduleConfig(
+        source=source,
+        path=path,
+        query=query,
+        attachment=attachment,
+        interval=_int(node.get("interval", 900), f"{where}.interval", optional=False, minimum=60),
+        jitter=jitter,
+        retry=retry,
+        max_backoff=_int(node.get("max_backoff", 3600), f"{where}.max_backoff", optional=False, minimum=retry),
+        profile_filter=str(node["profile_filter"]) if node.get("profile_filter") else None,
+        enabled=bool(node.get("enabled", True)),
+    )
+
+
+def parse_suppliers(data: Any, file_name: str = SUPPLIERS_FILE) -> Mapping[str, SupplierConfig]:
+    data = _mapping(data, file_name)
+    suppliers = {name: parse_supplier(name, node, f"{file_name}: {name}") for name, node in data.items()}
+    ids: Dict[int, str] = {}
+    for sup in suppliers.values():
+        if sup.supplier_id is not None:
+            if sup.supplier_id in ids:
+                _fail(f"{file_name}: {sup.name}.supplier_id", f"{sup.supplier_id} is already used by {ids[sup.supplier_id]}")
+            ids[sup.supplier_id] = sup.name
+    return MappingProxyType(suppliers)
+
+
+def parse_profile(node: Any, where: str) -> ProfileConfig:
+    node = _mapping(node, where)
+    name = node.get("name")
+    if not isinstance(name, str) or not name:
+        _fail(f"{where}.name", "expected a non-empty string")
+    factor = _number(node.get("factor"), f"{where}.factor")
+    if factor <= 0:
+        _fail(f"{where}.factor", f"must be > 0, got {factor}")
+    currency = _choice(node.get("currency_out"), f"{where}.currency_out", ("eur", "uah")).upper()
+
+    columns = []
+    raw_columns = node.get("columns") or []
+    if not isinstance(raw_columns, list):
+        _fail(f"{where}.columns", "expected a list")
+    for i, col in enumerate(raw_columns):
+        col_where = f"{where}.columns[{i}]"
+        col = _mapping(col, col_where)
+        if col.get("from") not in OUTPUT_SOURCES:
+            _fail(f"{col_where}.from", f"expected one of {', '.join(OUTPUT_SOURCES)}, got {col.get('from')!r}")
+        if not isinstance(col.get("header"), str):
+            _fail(f"{col_where}.header", "expected a string")
+        if col.get("width") is not None:
+            _number(col["width"], f"{col_where}.width")
+        columns.append(MappingProxyType(dict(col)))
+
+    rate = None
+    if currency == "UAH":
+        rp = _mapping(node.get("rate_params"), f"{where}.rate_params")
+        fb = rp.get("fallback")
+        fallback = fb.get("value") if isinstance(fb, dict) else (fb or 50)
+        rate = RateParams(
+            add_uah=_number(rp.get("add_uah", 1), f"{where}.rate_params.add_uah"),
+            min_rate=_number(rp.get("min_rate", 49), f"{where}.rate_params.min_rate"),
+            fallback=_number(fallback, f"{where}.rate_params.fallback"),
+        )
+
+    format_ = _choice(node.get("format"), f"{where}.format", ("xlsx", "csv"))
+    compression = None
+    if node.get("compression"):
+        compression = _choice(node["compression"], f"{where}.compression", CODECS)
+        if format_ == "xlsx":
+            _fail(f"{where}.compression", "xlsx is already a zip archive, compression is for csv only")
+
+    return ProfileConfig(
+        name=name,
+        factor=factor,
+        currency_out=currency,
+        format=format_,
+        r2_prefix_template=str(node.get("r2_prefix") or ""),
+        columns=tuple(columns),
+        csv=_freeze(_mapping(node.get("csv"), f"{where}.csv")),
+        rate=rate,
+        compression=compression,
+        compression_level=_int(node.get("compression_level"), f"{where}.compression_level", minimum=1),
+    )
+
+
+def parse_retention(node: Any, where: str) -> RetentionConfig:
+    node = _mapping(node, where)
+    default_keep = _int(node.get("default_keep", 7), f"{where}.default_keep", optional=False, minimum=1)
+    raw_policies = node.get("prefixes") or []
+    if not isinstance(raw_policies, list):
+        _fail(f"{where}.prefixes", "expected a list")
+    policies = []
+    for i, item in enumerate(raw_policies):
+        item_where = f"{where}.prefixes[{i}]"
+        item = _mapping(item, item_where)
+        if not isinstance(item.get("prefix"), str) or not item["prefix"]:
+            _fail(f"{item_where}.prefix", "expected a non-empty string")
+        policies.append(RetentionPolicy(
+            prefix=item["prefix"],
+            keep=_int(item.get("keep", default_keep), f"{item_where}.keep", optional=False, minimum=1),
+            env=str(item["env"]) if item.get("env") else None,
+        ))
+    return RetentionConfig(default_keep=default_keep, policies=tuple(policies))
+
+
+def parse_profiles(data: Any, file_name: str = PROFILES_FILE) -> ProfilesConfig:
+    data = _mapping(data, file_name)
+    common = _mapping(data.get("common"), f"{file_name}: common")
+    rounding = _mapping(common.get("rounding"), f"{file_name}: common.rounding") or {"EUR": 2, "UAH": 0}
+    for cur, digits in rounding.items():
+        _int(digits, f"{file_name}: common.rounding.{cur}", optional=False, minimum=0)
+
+    raw_profiles = data.get("profiles") or []
+    if not isinstance(raw_profiles, list):
+        _fail(f"{file_name}: profiles", "expected a list")
+    profiles = tuple(parse_profile(node, f"{file_name}: profiles[{i}]") for i, node in enumerate(raw_profiles))
+    seen = set()
+    for i, profile in enumerate(profiles):
+        if profile.name in seen:
+            _fail(f"{file_name}: profiles[{i}].name", f"duplicate profile name {profile.name!r}")
+        seen.add(profile.name)
+    return ProfilesConfig(
+        rounding=MappingProxyType(dict(rounding)),
+        profiles=profiles,
+        retention=parse_retention(common.get("retention"), f"{file_name}: common.retention"),
+    )
+
+
+# ----------------------- Cached loading -----------------------
+
+class _CachedFile:
+    """
+    Розпарсений файл, що перечитується лише при зміні mtime / розміру.
+    Файлу немає: empty() або FileNotFoundError, якщо empty не задано.
+    """
+
+    def __init__(self, file_name: str, parser: Callable[[Any, str], Any], empty: Optional[Callable[[], Any]] = None):
+        self.file_name = file_name
+        self.parser = parser
+        self.empty = empty
+        self._stamp: Optional[Tuple[str, int, int]] = None
+        self._value: Any = None
+        self._lock = threading.Lock()
+
+    def get(self, config_dir: Optional[Path] = None) -> Any:
+        path = Path(config_dir or CONFIG_DIR) / self.file_name
+        try:
+            st = os.stat(path)
+            stamp = (str(path), st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = (str(path), -1, -1)
+        if stamp == self._stamp:
+            return self._value
+        with self._lock:
+            if stamp != self._stamp:
+                if stamp[1] < 0:
+                    if self.empty is None:
+                        raise FileNotFoundError(f"{path} not found")
+                    value = self.empty()
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        try:
+                            data = yaml.safe_load(f)
+                        except yaml.YAMLError as e:
+                            raise ConfigError(f"{self.file_name}: invalid YAML: {e}")
+                    value = self.parser(data, self.file_name)
+                    if self._stamp is not None:
+                        print(f"[INFO] Config: {self.file_name} reloaded")
+                self._value, self._stamp = value, stamp
+            return self._value
+
+
+_suppliers = _CachedFile(SUPPLIERS_FILE, parse_suppliers, lambda: MappingProxyType({}))
+_profiles = _CachedFile(PROFILES_FILE, parse_profiles)  # без profiles.yaml імпорт неможливий
+
+
+def get_suppliers(config_dir: Optional[Path] = None) -> Mapping[str, SupplierConfig]:
+    return _suppliers.get(config_dir)
+
+
+def get_supplier(supplier: str, config_dir: Optional[Path] = None) -> Optional[SupplierConfig]:
+    """Секція постачальника: точна назва, потім UPPER і lower (як і раніше)."""
+    suppliers = get_suppliers(config_dir)
+    return suppliers.get(supplier) or suppliers.get(supplier.upper()) or suppliers.get(supplier.lower())
+
+
+def get_profiles(config_dir: Optional[Path] = None) -> ProfilesConfig:
+    return _profiles.get(config_dir)
+
+
+def validate_config(config_dir: Optional[Path] = None) -> Dict[str, int]:
+    """Перевірити обидва файли (на старті API); ConfigError, якщо щось не так."""
+    return {
+        "suppliers": len(get_suppliers(config_dir)),
+        "profiles": len(get_profiles(config_dir).profiles),
+    }
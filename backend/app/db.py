@@ -0,0 +1,144 @@
+"""
+Спільне підключення до PostgreSQL для API і пайплайну прайсів.
+
+Один довгоживучий engine із пулом з'єднань на процес:
+- /api/search більше не робить TCP + auth handshake на кожен запит;
+- price_processor / catalog_loader беруть той самий engine замість власного.
+
+Налаштування з env (.env):
+- DATABASE_URL — повний URL; якщо не заданий, збирається з
+  DB_USER / DB_PASSWORD / DB_HOST / DB_PORT / DB_NAME
+- DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 с)
+- DB_POOL_PRE_PING (1) — перевіряти з'єднання перед видачею з пулу
+- DB_POOL_RECYCLE (1800 с) — перевідкривати з'єднання, старші за N секунд
+
+Engine створюється ліниво (після load_dotenv) і закривається dispose_engine()
+на shutdown FastAPI.
+
+Для async-роутера пошуку (routers/search_async.py) — окремий AsyncEngine на asyncpg
+з тими самими параметрами пулу: get_async_engine() / dispose_async_engine().
+URL — ASYNC_DATABASE_URL або DATABASE_URL із драйвером, заміненим на postgresql+asyncpg.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+except ImportError:  # pragma: no cover - залежить від оточення (greenlet)
+    AsyncEngine = None
+    create_async_engine = None
+
+_engine: Optional[Engine] = None
+_async_engine: Optional["AsyncEngine"] = None
+_lock = threading.Lock()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    val = os.getenv(name)
+    if val is None or val.strip() == "":
+        return default
+    return val.strip().lower() in ("1", "true", "yes", "on")
+
+
+def database_url() -> str:
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+
+    db_user = os.getenv("DB_USER", "postgres")
+    # ВАЖЛИВО: пароль задається в .env (DB_PASSWORD); значення нижче — локальне за замовчуванням
+    db_password = os.getenv("DB_PASSWORD", "123456789")
+    db_host = os.getenv("DB_HOST", "localhost")
+    db_port = os.getenv("DB_PORT", "5432")
+    db_name = os.getenv("DB_NAME", "postgres")
+
+    return f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+
+def async_database_url() -> str:
+    url = os.getenv("ASYNC_DATABASE_URL")
+    if url:
+        return url
+    return make_url(database_url()).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+
+
+def async_available() -> bool:
+    """Чи можна підняти AsyncEngine (потрібні sqlalchemy[asyncio] і asyncpg)."""
+    if create_async_engine is None:
+        return False
+    try:
+        import asyncpg  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def engine_options() -> Dict[str, Any]:
+    """Параметри пулу з env."""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
+
+
+def get_engine() -> Engine:
+    """Спільний engine процесу (створюється при першому виклику)."""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                opts = engine_options()
+                _engine = create_engine(database_url(), **opts)
+                print(f"[INFO] DB: engine created (pool_size={opts['pool_size']}, "
+                      f"max_overflow={opts['max_overflow']}, pre_ping={opts['pool_pre_ping']}, "
+                      f"recycle={opts['pool_recycle']}s)")
+    return _engine
+
+
+def dispose_engine() -> None:
+    """Закрити всі з'єднання пулу (shutdown застосунку)."""
+    global _engine
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+            print("[INFO] DB: engine disposed")
+
+
+def forget_engine_after_fork() -> None:
+    """
+    У дочірньому процесі (пул рендерингу профілів): не користуватись з'єднаннями батька.
+    Пул закривається без close() сокетів — вони належать батьківському процесу.
+    """
+    global _engine
+    if _engine is not None:
+        _engine.dispose(close=False)
+        _engine = None
+
+
+def get_async_engine() -> "AsyncEngine":
+    """Спільний AsyncEngine процесу (asyncpg, той самий пул-конфіг)."""
+    global _async_engine
+    if _async_engine is None:
+        with _lock:
+            if _async_engine is None:
+                opts = engine_options()
+                _async_engine = create_async_engine(async_database_url(), **opts)
+                print(f"[INFO] DB: async engine created (pool_size={opts['pool_size']}, "
+                      f"max_overflow={opts['max_overflow']})")
+    return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    engine, _async_engine = _async_engine, None
+    if engine is not None:
+        await engine.dispose()
+        print("[INFO] DB: async engine disposed")
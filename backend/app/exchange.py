@@ -1,18 +1,203 @@
+"""
+Курс EUR→UAH (НБУ) для UAH-профілів.
+
+Раніше кожен UAH-профіль робив блокуючий запит до НБУ (таймаут 5 с), а при збої брав
+захардкоджені 50 замість останнього реального курсу. Тепер:
+- кеш у пам'яті процесу: курс береться з мережі не частіше ніж раз на добу
+  (EXCHANGE_RATE_TTL, 86400 с; новий календарний день — теж привід перечитати);
+- last-known-good на диску (data/state/exchange_rate.json): переживає рестарт, і при
+  недоступному НБУ використовується останній реальний курс, а не fallback;
+- після невдалого запиту НБУ не опитується EXCHANGE_RATE_RETRY секунд (300): профілі одразу
+  отримують last-known-good, а не чекають таймаут кожен;
+- prefetch_rate() — підтягнути курс заздалегідь (перед пачкою імпортів, python -m app.exchange,
+  POST /admin/exchange-rate/refresh), щоб імпорт не чекав на мережу;
+- eur_to_uah_quote() повертає курс разом із джерелом і часом — він потрапляє в результати імпорту.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
 import requests
 
+from .paths import STATE_DIR
+
+NBU_URL = "https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=EUR&json"
+RATE_STATE_FILE = STATE_DIR / "exchange_rate.json"
+
+
+def fetch_nbu_rate(timeout: float = 5) -> Dict[str, Any]:
+    """Курс НБУ з мережі: {"rate": 45.12, "nbu_date": "17.10.2026"}."""
+    r = requests.get(NBU_URL, timeout=timeout)
+    r.raise_for_status()
+    item = r.json()[0]
+    return {"rate": float(item["rate"]), "nbu_date": item.get("exchangedate")}
+
+
+class RateProvider:
+    """
+    Курс НБУ з кешем: пам'ять → диск → мережа. Потокобезпечний: паралельні профілі
+    не роблять кількох запитів одночасно.
+    """
+
+    def __init__(
+            self,
+            state_file: Path = RATE_STATE_FILE,
+            ttl: float = 86400,
+            timeout: float = 5,
+            retry: float = 300,
+            fetcher: Callable[[float], Dict[str, Any]] = fetch_nbu_rate,
+            clock: Callable[[], float] = time.time,
+    ):
+        self.state_file = Path(state_file)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retry = retry
+        self.fetcher = fetcher
+        self.clock = clock
+        self._quote: Optional[Dict[str, Any]] = None
+        self._failed_ts: Optional[float] = None   # час останнього невдалого запиту до НБУ
+        self._lock = threading.Lock()
+
+    def _fresh(self, quote: Optional[Dict[str, Any]]) -> bool:
+        if not quote:
+            return False
+        now = self.clock()
+        same_day = datetime.fromtimestamp(quote["fetched_ts"]).date() == datetime.fromtimestamp(now).date()
+        return same_day and now - quote["fetched_ts"] < self.ttl
+
+    def _load_disk(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                quote = json.load(f)
+            float(quote["rate"]), float(quote["fetched_ts"])
+            return quote
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[WARN] Exchange rate: cannot read {self.state_file}: {e}")
+            return None
+
+    def _save_disk(self, quote: Dict[str, Any]) -> None:
+        tmp = self.state_file.with_name(f".{uuid.uuid4().hex[:8]}_{self.state_file.name}")
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(quote, f, ensure_ascii=False)
+            os.replace(tmp, self.state_file)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            print(f"[WARN] Exchange rate: cannot save {self.state_file}: {e}")
+
+    def _fetch(self) -> Dict[str, Any]:
+        now = self.clock()
+        quote = {
+            **self.fetcher(self.timeout),
+            "fetched_ts": now,
+            "fetched_at": datetime.fromtimestamp(now).astimezone().isoformat(timespec="seconds"),
+        }
+        self._save_disk(quote)
+        print(f"[INFO] Exchange rate: NBU EUR→UAH {quote['rate']} ({quote.get('nbu_date')})")
+        return quote
+
+    def _cooling_down(self) -> bool:
+        return self._failed_ts is not None and self.clock() - self._failed_ts < self.retry
+
+    def _last_known_good(self) -> Optional[Dict[str, Any]]:
+        return {**self._quote, "source": "last_known_good"} if self._quote is not None else None
+
+    def get(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Курс НБУ (без надбавок) з полем "source": cache | disk | nbu | last_known_good.
+        None — курсу немає ніде (ні в мережі, ні на диску).
+        Після збою НБУ retry секунд не опитується (force — опитати все одно).
+        """
+        with self._lock:
+            if not force and self._fresh(self._quote):
+                return {**self._quote, "source": "cache"}
+            if self._quote is None:
+                self._quote = self._load_disk()
+                if not force and self._fresh(self._quote):
+                    return {**self._quote, "source": "disk"}
+            if not force and self._cooling_down():
+                return self._last_known_good()
+            try:
+                self._quote = self._fetch()
+                self._failed_ts = None
+                return {**self._quote, "source": "nbu"}
+            except Exception as e:
+                self._failed_ts = self.clock()
+                if self._quote is None:
+                    print(f"[ERROR] Exchange rate: NBU unavailable and no saved rate: {e}")
+                    return None
+                print(f"[WARN] Exchange rate: NBU unavailable, using last known rate "
+                      f"{self._quote['rate']} from {self._quote['fetched_at']} "
+                      f"(next try in {self.retry:.0f}s): {e}")
+                return self._last_known_good()
+
+
+_provider: Optional[RateProvider] = None
+_provider_lock = threading.Lock()
+
+
+def get_rate_provider() -> RateProvider:
+    """Провайдер процесу з налаштуваннями з env (створюється при першому виклику)."""
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = RateProvider(
+                    ttl=float(os.getenv("EXCHANGE_RATE_TTL", "86400")),
+                    timeout=float(os.getenv("EXCHANGE_RATE_TIMEOUT", "5")),
+                    retry=float(os.getenv("EXCHANGE_RATE_RETRY", "300")),
+                )
+    return _provider
+
+
+def prefetch_rate(force: bool = False) -> Optional[Dict[str, Any]]:
+    """Підтягнути курс заздалегідь (перед пачкою імпортів); force — оминути кеш."""
+    return get_rate_provider().get(force=force)
+
+
+def eur_to_uah_quote(add_uah=1, min_rate=49, fallback=50) -> Dict[str, Any]:
+    """
+    Курс для профілю: НБУ + надбавка, не нижче min_rate. Якщо курсу немає взагалі — fallback.
+    {"rate", "nbu_rate", "nbu_date", "fetched_at", "source"} — для звіту імпорту.
+    """
+    quote = get_rate_provider().get()
+    if quote is None:
+        return {"rate": float(fallback), "nbu_rate": None, "nbu_date": None, "fetched_at": None, "source": "fallback"}
+    rate = max(quote["rate"] + float(add_uah or 0), float(min_rate or 0))
+    return {
+        "rate": rate,
+        "nbu_rate": quote["rate"],
+        "nbu_date": quote.get("nbu_date"),
+        "fetched_at": quote["fetched_at"],
+        "source": quote["source"],
+    }
+
 
 def get_eur_to_uah(add_uah=1, min_rate=49, fallback=50, timeout=5) -> float:
     """
     Отримати курс EUR→UAH: курс НБУ + надбавка, з мінімальним порогом і фолбеком.
+    (timeout лишився для сумісності; таймаут провайдера — EXCHANGE_RATE_TIMEOUT.)
     """
-    try:
-        r = requests.get(
-            "https://bank.gov.ua/NBUStatService/v1/statdirectory/exchange?valcode=EUR&json",
-            timeout=timeout,
-        )
-        r.raise_for_status()
-        rate = float(r.json()[0]["rate"])
-        rate += float(add_uah or 0)
-        return max(rate, float(min_rate or 0))
-    except Exception:
-        return float(fallback)
+    return eur_to_uah_quote(add_uah=add_uah, min_rate=min_rate, fallback=fallback)["rate"]
+
+
+def main() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    quote = prefetch_rate(force=True)
+    if quote is None:
+        raise SystemExit("[ERROR] Exchange rate is not available")
+    print(f"[INFO] EUR→UAH {quote['rate']} ({quote['source']}, fetched {quote['fetched_at']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,38 @@
 """
 Gmail puller для MOTOROL:
 - знаходить найновіший лист із вкладенням рівно "09033.cennik.zip"
-- завантажує zip, розпаковує CSV, форматує
+- читає CSV прямо з zip (у пам'яті), форматує рядки на льоту і подає їх у конвеєр — без файлів у data/temp
 - запускає process_all_prices ТІЛЬКИ для профілю "site"
-- прибирає всі тимчасові файли у data/temp (залишає лише state/)
+- курсор пошти (historyId, оброблені листи) — data/state/gmail_puller_state.json, спільний із
+  планувальником (app/scheduler.py); одночасно опитує лише один процес (cursor_lock)
+
+Опитування дешеве: historyId зі state-файлу → users.history.list (без нової пошти — один запит),
+дати кандидатів — одним batch-запитом format=metadata з маскою полів, а повне повідомлення
+(лише filename/attachmentId частин) читається один раз і для перевірки, і для завантаження.
 """
 from __future__ import annotations
 import base64
+import csv
+import hashlib
+import io
 import json
-import shutil
+import os
+import re
+import uuid
 import zipfile
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 from dotenv import load_dotenv
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 
-from .paths import TEMP_DIR
+from .paths import STATE_DIR as APP_STATE_DIR, TEMP_DIR
 from .price_manager import process_all_prices
+from .price_processor import LineSource
 
 # ---------- Налаштування ----------
 PROCESS_ONLY_LATEST = True
@@ -28,10 +42,23 @@ SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 # ВАЖЛИВО: ID постачальника MOTOROL у вашій базі
 MOTOROL_SUPPLIER_ID = 3
 
+# Gmail API: batch до 50 запитів (рекомендація Google), маски полів — лише те, що читаємо
+BATCH_SIZE = 50
+LIST_FIELDS = "messages(id)"
+META_FIELDS = "id,internalDate"
+PARTS_FIELDS = "id,payload/parts(filename,body(attachmentId,data))"
+HISTORY_FIELDS = "history(messagesAdded/message/id),historyId,nextPageToken"
+
+# Форматування MOTOROL: стільки рядків за раз проходить через csv.writer у пам'яті
+FORMAT_BLOCK_ROWS = 10_000
+
 # Шляхи
 TMP_DIR = TEMP_DIR
-STATE_DIR = TMP_DIR / "state"
+# Курсор пошти — поза temp і один на CLI та планувальник; старий файл у data/temp/state
+# читається, поки нового ще немає (перший save_state переносить стан)
+STATE_DIR = APP_STATE_DIR
 STATE_FILE = STATE_DIR / "gmail_puller_state.json"
+LEGACY_STATE_FILE = TMP_DIR / "state" / "gmail_puller_state.json"
 
 BACKEND_DIR = Path(__file__).resolve().parents[1]
 CREDENTIALS_PATH = BACKEND_DIR / "credentials.json"
@@ -42,36 +69,60 @@ load_dotenv(BACKEND_DIR / ".env")
 
 # ---------- Утиліти ----------
 def ensure_tmp():
+    # порожній стан не створюється: load_state() тоді читає LEGACY_STATE_FILE або дає {"processed": []}
     TMP_DIR.mkdir(parents=True, exist_ok=True)
     STATE_DIR.mkdir(parents=True, exist_ok=True)
-    if not STATE_FILE.exists():
-        with open(STATE_FILE, "w", encoding="utf-8") as f:
-            json.dump({"processed": []}, f, ensure_ascii=False)
 
 
 def load_state() -> Dict:
-    if STATE_FILE.exists():
-        with open(STATE_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
+    for path in (STATE_FILE, LEGACY_STATE_FILE):
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
     return {"processed": []}
 
 
 def save_state(state: Dict):
-    with open(STATE_FILE, "w", encoding="utf-8") as f:
-        json.dump(state, f, ensure_ascii=False, indent=2)
+    # атомарно: планувальник і CLI читають той самий файл
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_FILE.with_name(f".{uuid.uuid4().hex[:8]}_{STATE_FILE.name}")
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, STATE_FILE)
+    finally:
+        tmp.unlink(missing_ok=True)
 
 
-def cleanup_temp_preserve_state():
-    for item in TMP_DIR.iterdir():
-        if item.resolve() == STATE_DIR.resolve():
-            continue
+@contextmanager
+def cursor_lock() -> Iterator[bool]:
+    """
+    Курсор пошти між процесами: load_state → обробка → commit_fetched робить лише один опитувач
+    (CLI або планувальник), інакше обидва імпортували б той самий лист або перезаписали б стан
+    один одного. Блокування ОС (flock / msvcrt) знімається і при падінні процесу.
+    Віддає False, якщо курсор зараз у іншого процесу (не чекає).
+    """
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(STATE_FILE.with_suffix(".lock"), "a+b") as f:
+        f.seek(0)
         try:
-            if item.is_file():
-                item.unlink(missing_ok=True)
+            if os.name == "nt":
+                import msvcrt
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
             else:
-                shutil.rmtree(item, ignore_errors=True)
-        except Exception:
-            pass
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            f.seek(0)
+            if os.name == "nt":
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
 
 def get_creds() -> Credentials:
@@ -96,64 +147,104 @@ def gmail_service() -> Any:
 
 
 def search_messages(service, q: str) -> List[Dict]:
-    res = service.users().messages().list(userId="me", q=q, maxResults=50).execute()
+    res = service.users().messages().list(userId="me", q=q, maxResults=50, fields=LIST_FIELDS).execute()
     return res.get("messages", [])
 
 
-def download_first_zip_attachment(service, msg_id: str, dest_dir: Path) -> Optional[Path]:
-    msg = service.users().messages().get(userId="me", id=msg_id).execute()
-    parts = (msg.get("payload") or {}).get("parts", []) or []
+def batch_get_messages(service, msg_ids: List[str], **params) -> Dict[str, Dict]:
+    """
+    messages.get для багатьох id: один HTTP-запит (batch) на BATCH_SIZE повідомлень.
+    Запити, що впали всередині batch (напр. 429), повторюються поодинці.
+    """
+    found: Dict[str, Dict] = {}
+    failed: List[str] = []
 
-    for part in parts:
-        filename = (part.get("filename") or "").strip()
-        if filename.lower() != REQUIRED_FILENAME.lower():
-            continue
-
-        body = part.get("body", {}) or {}
-        att_id = body.get("attachmentId")
-
-        if not att_id:
-            data = body.get("data")
-            if data:
-                raw = base64.urlsafe_b64decode(data.encode("utf-8"))
-                out = dest_dir / filename
-                with open(out, "wb") as f:
-                    f.write(raw)
-                return out
-            continue
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            failed.append(request_id)
+        else:
+            found[request_id] = response
 
-        att = service.users().messages().attachments().get(
-            userId="me", messageId=msg_id, id=att_id
-        ).execute()
-        raw = base64.urlsafe_b64decode(att["data"].encode("utf-8"))
-        out = dest_dir / filename
-        with open(out, "wb") as f:
-            f.write(raw)
-        return out
+    messages = service.users().messages()
+    for i in range(0, len(msg_ids), BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=_collect)
+        for msg_id in msg_ids[i:i + BATCH_SIZE]:
+            batch.add(messages.get(userId="me", id=msg_id, **params), request_id=msg_id)
+        batch.execute()
+
+    for msg_id in failed:
+        found[msg_id] = messages.get(userId="me", id=msg_id, **params).execute()
+    return found
 
+
+def find_attachment_part(service, msg_id: str, required_filename: str) -> Optional[Dict]:
+    """Частина листа з потрібним вкладенням (лише filename і body.attachmentId/data) або None."""
+    msg = service.users().messages().get(userId="me", id=msg_id, fields=PARTS_FIELDS).execute()
+    parts = (msg.get("payload") or {}).get("parts", []) or []
+    for part in parts:
+        if (part.get("filename") or "").strip().lower() == required_filename.lower():
+            return part
     return None
 
 
-def unzip_to_csv(zip_path: Path, extract_dir: Path) -> Path:
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(extract_dir)
-    for p in extract_dir.iterdir():
-        if p.suffix.lower() == ".csv":
-            return p
-    raise FileNotFoundError("CSV file not found inside zip.")
+def fetch_attachment(service, msg_id: str, part: Dict) -> Optional[bytes]:
+    """Байти вкладення (inline data або attachments.get); на диск нічого не пишеться."""
+    body = part.get("body", {}) or {}
+    data = body.get("data")
+    att_id = body.get("attachmentId")
+    if not data and att_id:
+        att = service.users().messages().attachments().get(
+            userId="me", messageId=msg_id, id=att_id, fields="data"
+        ).execute()
+        data = att["data"]
+    return base64.urlsafe_b64decode(data.encode("utf-8")) if data else None
+
+
+_SEMI_SPACE_RE = re.compile(r";\s+")
+_GT5_RE = re.compile(r">\s*5")
+
+
+def _format_row(row: List[str]) -> List[str]:
+    joined = ";".join(row)
+    joined = _SEMI_SPACE_RE.sub(";", joined)
+    joined = _GT5_RE.sub("10", joined)
+    return joined.split(";")
+
+
+def iter_motorol_lines(src: Iterable[str]) -> Iterator[str]:
+    """
+    Сирий CSV MOTOROL (tab, "> 5") → рядки з ";" — ті самі, що потрапили б у файл format_motorol_csv,
+    але потоком: порція рядків пишеться csv.writer-ом у StringIO і одразу віддається далі.
+    """
+    reader = csv.reader(src, delimiter="\t")
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";")
+    while True:
+        block = list(islice(reader, FORMAT_BLOCK_ROWS))
+        if not block:
+            return
+        writer.writerows(_format_row(row) for row in block)
+        # newline=None — ті самі межі рядків, що й при читанні файлу в текстовому режимі
+        yield from io.StringIO(buf.getvalue(), newline=None)
+        buf.seek(0)
+        buf.truncate()
+
+
+@contextmanager
+def open_motorol_zip(raw: bytes) -> Iterator[Iterator[str]]:
+    """Перший .csv усередині zip (байти вкладення) → відформатовані рядки; архів не розпаковується на диск."""
+    with zipfile.ZipFile(io.BytesIO(raw)) as zf:
+        member = next((n for n in zf.namelist() if n.lower().endswith(".csv")), None)
+        if member is None:
+            raise FileNotFoundError("CSV file not found inside zip.")
+        with zf.open(member) as fb, io.TextIOWrapper(fb, encoding="utf-8", errors="ignore", newline="") as text:
+            yield iter_motorol_lines(text)
 
 
 def format_motorol_csv(input_csv: Path, output_csv: Path) -> None:
-    import csv, re
     with open(input_csv, newline="", encoding="utf-8", errors="ignore") as src, \
             open(output_csv, "w", newline="", encoding="utf-8") as dst:
-        reader = csv.reader(src, delimiter="\t")
-        writer = csv.writer(dst, delimiter=";")
-        for row in reader:
-            joined = ";".join(row)
-            joined = re.sub(r";\s+", ";", joined)
-            joined = re.sub(r">\s*5", "10", joined)
-            writer.writerow(joined.split(";"))
+        dst.writelines(iter_motorol_lines(src))
 
 
 def already_processed(state: Dict, msg_id: str) -> bool:
@@ -167,79 +258,171 @@ def mark_processed(state: Dict, msg_id: str):
 
 
 def pick_latest_matching(service, messages: List[Dict], required_filename: str) -> Optional[Dict]:
-    latest = None
-    latest_ts = -1
-    for m in messages:
-        full = service.users().messages().get(userId="me", id=m["id"]).execute()
-        parts = (full.get("payload") or {}).get("parts", []) or []
-        if not any((p.get("filename") or "").strip().lower() == required_filename.lower() for p in parts):
-            continue
-        ts = int(full.get("internalDate", 0))
-        if ts > latest_ts:
-            latest, latest_ts = full, ts
-    return latest
-
-
-def handle_one_message(service, msg_id: str) -> Dict:
-    ensure_tmp()
-    zip_path = download_first_zip_attachment(service, msg_id, TMP_DIR)
-    if not zip_path:
+    """
+    Найновіший лист із вкладенням required_filename.
+    internalDate усіх кандидатів — одним batch-запитом format=metadata (лише id, internalDate);
+    частини читаються від найновішого, доки не знайдеться вкладення (зазвичай — один запит).
+    Повертає {"id", "internalDate", "part"}; part далі йде в handle_one_message без повторного get.
+    """
+    meta = batch_get_messages(service, [m["id"] for m in messages], format="metadata", fields=META_FIELDS)
+    for msg in sorted(meta.values(), key=lambda m: int(m.get("internalDate", 0)), reverse=True):
+        part = find_attachment_part(service, msg["id"], required_filename)
+        if part:
+            return {**msg, "part": part}
+    return None
+
+
+def new_message_ids(service, history_id: str) -> Tuple[Optional[List[str]], Optional[str]]:
+    """
+    Id листів, доданих після history_id, і поточний historyId скриньки (users.history.list).
+    (None, None) — history_id застарів (Gmail тримає історію обмежений час, 404): потрібна повна синхронізація.
+    """
+    ids: List[str] = []
+    token = None
+    while True:
+        try:
+            res = service.users().history().list(
+                userId="me", startHistoryId=history_id, historyTypes="messageAdded",
+                fields=HISTORY_FIELDS, pageToken=token,
+            ).execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                return None, None
+            raise
+        for record in res.get("history", []):
+            ids.extend(added["message"]["id"] for added in record.get("messagesAdded", []))
+        token = res.get("nextPageToken")
+        if not token:
+            return ids, res.get("historyId", history_id)
+
+
+def poll_history(service, state: Dict) -> Optional[str]:
+    """
+    Інкрементальна перевірка пошти за state["history_id"].
+    Повертає historyId, який зберігається після успішної обробки, або None, якщо нових листів
+    немає (state уже оновлено; на таке опитування йде один запит history.list).
+    """
+    saved = state.get("history_id")
+    if saved:
+        added, current = new_message_ids(service, saved)
+        if added is not None:
+            if added:
+                return current
+            if current != saved:
+                state["history_id"] = current
+                save_state(state)
+            return None
+        print("[WARN] Gmail historyId застарів — повна синхронізація.")
+    # historyId беремо ДО пошуку: лист, що прийде під час обробки, побачить наступне опитування
+    return service.users().getProfile(userId="me", fields="historyId").execute()["historyId"]
+
+
+def attachment_source(msg_id: str, raw: bytes) -> LineSource:
+    """
+    zip → CSV → форматування → парсер одним потоком, без zip/CSV/formatted-файлів на диску.
+    fingerprint — хеш байтів вкладення (той самий прайс у новому листі не вивантажується вдруге).
+    """
+    fingerprint = "gmail:" + hashlib.blake2b(raw, digest_size=16).hexdigest()
+    return LineSource(f"gmail:{msg_id}/{REQUIRED_FILENAME}", lambda: open_motorol_zip(raw), fingerprint)
+
+
+def process_attachment(
+        msg_id: str,
+        raw: Optional[bytes],
+        supplier: str = "MOTOROL",
+        supplier_id: Optional[int] = MOTOROL_SUPPLIER_ID,
+        **options: Any,
+) -> Dict:
+    """Zip-вкладення (байти) → process_all_prices; options — як у process_all_prices (profile_filter тощо)."""
+    if not raw:
         return {"msg_id": msg_id, "status": "no-zip"}
 
-    csv_raw = unzip_to_csv(zip_path, TMP_DIR)
-    csv_fmt = TMP_DIR / f"MOTOROL_formatted_{zip_path.stem}.csv"
-    format_motorol_csv(csv_raw, csv_fmt)
+    source = attachment_source(msg_id, raw)
 
     # --- ЗМІНА: Викликаємо обробку ТІЛЬКИ для профілю "site" ---
     # (Вирішує Проблему 2 - не ганяє зайві прайси)
     results = process_all_prices(
-        supplier="MOTOROL",
-        supplier_id=MOTOROL_SUPPLIER_ID,
-        remote_gz_path=str(csv_fmt),
+        supplier=supplier,
+        supplier_id=supplier_id,
+        remote_gz_path=source,
         # profile_filter="site"  # <--- ФІЛЬТР
+        **options,
     )
     # -----------------------------------------------------------
 
-    try:
-        zip_path.unlink(missing_ok=True)
-        csv_raw.unlink(missing_ok=True)
-        csv_fmt.unlink(missing_ok=True)
-    except Exception:
-        pass
-
     return {"msg_id": msg_id, "status": "ok", "results": results}
 
 
-def find_and_process_latest(service) -> None:
-    msgs = search_messages(service, GMAIL_QUERY)
+def handle_one_message(service, msg_id: str, part: Optional[Dict] = None) -> Dict:
+    if part is None:
+        part = find_attachment_part(service, msg_id, REQUIRED_FILENAME)
+    raw = fetch_attachment(service, msg_id, part) if part else None
+    return process_attachment(msg_id, raw)
+
+
+def fetch_latest(
+        service,
+        state: Dict,
+        query: str = GMAIL_QUERY,
+        required_filename: str = REQUIRED_FILENAME,
+) -> Optional[Dict]:
+    """
+    Мережева частина опитування: нова пошта → найновіший необроблений лист і байти вкладення.
+    None — обробляти нічого (historyId за потреби вже збережено).
+    Інакше {"history_id", "msg_id", "raw"}; після успішної обробки — commit_fetched(state, fetched).
+    """
+    history_id = poll_history(service, state)
+    if history_id is None:
+        print("No new mail since last poll.")
+        return None
+
+    latest = None
+    msgs = search_messages(service, query)
     if not msgs:
         print("No messages found.")
-        return
-    latest = pick_latest_matching(service, msgs, REQUIRED_FILENAME)
-    if not latest:
-        print(f"No messages with attachment '{REQUIRED_FILENAME}'.")
-        return
-
-    state = load_state()
-    msg_id = latest["id"]
-    if already_processed(state, msg_id):
-        print("Latest matching message already processed.")
-        return
-
-    out = handle_one_message(service, msg_id)
-    print("Processed latest:", out)
-    mark_processed(state, msg_id)
+    else:
+        latest = pick_latest_matching(service, msgs, required_filename)
+        if not latest:
+            print(f"No messages with attachment '{required_filename}'.")
+        elif already_processed(state, latest["id"]):
+            print("Latest matching message already processed.")
+            latest = None
+
+    if latest is None:
+        state["history_id"] = history_id
+        save_state(state)
+        return None
+    raw = fetch_attachment(service, latest["id"], latest["part"])
+    return {"history_id": history_id, "msg_id": latest["id"], "raw": raw}
+
+
+def commit_fetched(state: Dict, fetched: Dict) -> None:
+    # historyId просуваємо лише після успішної обробки: збій → лист перевіриться знову
+    mark_processed(state, fetched["msg_id"])
+    state["history_id"] = fetched["history_id"]
     save_state(state)
 
 
+def find_and_process_latest(service) -> None:
+    with cursor_lock() as locked:
+        if not locked:
+            print("Another Gmail poll (scheduler or CLI) is running — skipped.")
+            return
+        state = load_state()
+        fetched = fetch_latest(service, state)
+        if fetched is None:
+            return
+
+        out = process_attachment(fetched["msg_id"], fetched["raw"])
+        print("Processed latest:", out)
+        commit_fetched(state, fetched)
+
+
 def main():
+    # data/temp не чиститься: puller нічого туди не пише, а інші імпорти (API, планувальник)
+    # можуть саме зараз тримати там свої файли
     ensure_tmp()
-    try:
-        service = gmail_service()
-        find_and_process_latest(service)
-    finally:
-        cleanup_temp_preserve_state()
-        print("🧹 temp cleaned (state/ збережено).")
+    find_and_process_latest(gmail_service())
 
 
 if __name__ == "__main__":
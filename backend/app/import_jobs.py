@@ -0,0 +1,236 @@
+"""
+Фонові задачі імпорту прайсів для /admin/import-all.
+
+Раніше process_all_prices виконувався прямо в HTTP-запиті: великий прайс тримав з'єднання
+хвилинами, обривався на таймаутах проксі і займав потік сервера. Тепер запит лише ставить
+задачу в чергу і одразу повертає її id, а статус читається через GET /admin/jobs/{id}.
+
+- обмежений пул воркерів (IMPORT_WORKERS, за замовчуванням 1): імпорти не змагаються
+  за пам'ять, CPU і data/temp;
+- дедуплікація: поки для постачальника є задача в черзі або в роботі, повторний запит
+  повертає її ж, а не створює нову;
+- прогрес по профілях (pending → running → done, rows у потоковому режимі) і результат;
+- скасування: задача з черги знімається одразу, а задача в роботі зупиняється між
+  профілями / порціями (див. ImportCancelled у price_manager.py).
+
+Типи задач: "import" (process_all_prices) і "reprice" (reprice_from_snapshot — профілі
+зі знімка, без джерела). Дедуплікація спільна: обидва пишуть ті самі файли постачальника.
+
+Задачі живуть у пам'яті процесу API; зберігаються останні IMPORT_JOBS_KEEP (100) завершених.
+"""
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .price_manager import ImportCancelled, process_all_prices, reprice_from_snapshot
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class ImportJob:
+    def __init__(
+            self,
+            supplier: str,
+            remote_gz_path: Optional[str],
+            options: Optional[Dict[str, Any]] = None,
+            kind: str = "import",
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.supplier = supplier
+        self.remote_gz_path = remote_gz_path
+        self.options = options or {}
+        self.status = QUEUED
+        self.created_at = _now()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.results: Optional[List[Dict[str, Any]]] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = threading.Event()
+        self._lock = threading.Lock()
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_requested.is_set()
+
+    def update_profile(self, name: str, info: Dict[str, Any]) -> None:
+        """progress-колбек для process_all_prices."""
+        with self._lock:
+            self.profiles.setdefault(name, {}).update(info)
+
+    def finish(self, status: str, results: Optional[List[Dict[str, Any]]] = None, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.status = status
+            self.results = results
+            self.error = error
+            self.finished_at = _now()
+            # профілі, які не дійшли до кінця, позначаємо відповідно до результату задачі
+            for info in self.profiles.values():
+                if info.get("status") == "pending":
+                    info["status"] = "skipped"
+                elif info.get("status") == "running":
+                    info["status"] = CANCELLED if status == CANCELLED else FAILED
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "supplier": self.supplier,
+                "remote_gz_path": self.remote_gz_path,
+                "status": self.status,
+                "cancel_requested": self.is_cancelled(),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "profiles": [{"name": name, **info} for name, info in self.profiles.items()],
+                "results": self.results,
+                "error": self.error,
+            }
+
+
+class ImportJobQueue:
+    def __init__(
+            self,
+            workers: int = 1,
+            keep: int = 100,
+            runner: Callable[..., List[Dict[str, Any]]] = process_all_prices,
+            reprice_runner: Callable[..., List[Dict[str, Any]]] = reprice_from_snapshot,
+    ):
+        self.workers = max(1, workers)
+        self.keep = keep
+        self.runner = runner
+        self.reprice_runner = reprice_runner
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import")
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._active: Dict[str, str] = {}  # постачальник → id задачі в черзі / в роботі
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _supplier_key(supplier: str) -> str:
+        return supplier.strip().upper()
+
+    def submit(self, supplier: str, remote_gz_path: str, **options: Any) -> Tuple[ImportJob, bool]:
+        """(задача, created). created=False — для постачальника вже є активна задача."""
+        return self._submit(ImportJob(supplier, remote_gz_path, options))
+
+    def submit_reprice(self, supplier: str, **options: Any) -> Tuple[ImportJob, bool]:
+        """Reprice зі знімка як фонова задача (ті самі правила дедуплікації)."""
+        return self._submit(ImportJob(supplier, None, options, kind="reprice"))
+
+    def _submit(self, job: ImportJob) -> Tuple[ImportJob, bool]:
+        supplier = job.supplier
+        key = self._supplier_key(supplier)
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                return self._jobs[active_id], False
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            self._trim()
+        self._executor.submit(self._run, job)
+        print(f"[INFO] Import job {job.id} ({job.kind}) queued for {supplier}")
+        return job, True
+
+    def _release(self, job: ImportJob) -> None:
+        key = self._supplier_key(job.supplier)
+        if self._active.get(key) == job.id:
+            del self._active[key]
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: ImportJob) -> None:
+        with self._lock:
+            if job.status != QUEUED:
+                return  # скасована, поки чекала в черзі
+            job.status = RUNNING
+            job.started_at = _now()
+
+        print(f"[INFO] Import job {job.id} started for {job.supplier}")
+        try:
+            kwargs = dict(progress=job.update_profile, is_cancelled=job.is_cancelled, **job.options)
+            if job.kind == "reprice":
+                results = self.reprice_runner(job.supplier, **kwargs)
+            else:
+                results = self.runner(job.supplier, job.remote_gz_path, **kwargs)
+            job.finish(SUCCEEDED, results=results)
+            print(f"[INFO] Import job {job.id} succeeded ({len(results)} profile(s))")
+        except ImportCancelled:
+            job.finish(CANCELLED)
+            print(f"[WARN] Import job {job.id} cancelled")
+        except Exception as e:
+            job.finish(FAILED, error=str(e))
+            print(f"[ERROR] Import job {job.id} failed: {e}")
+        finally:
+            with self._lock:
+                self._release(job)
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[ImportJob]:
+        """Від найновішої до найстарішої."""
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested.set()
+            if job.status == QUEUED:
+                job.finish(CANCELLED)
+                self._release(job)
+        print(f"[INFO] Import job {job_id}: cancel requested")
+        return job
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.status not in FINISHED]
+        for job in jobs:
+            self.cancel(job.id)
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_queue: Optional[ImportJobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> ImportJobQueue:
+    """Черга процесу з налаштуваннями з env (створюється при першому виклику)."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = ImportJobQueue(
+                    workers=int(os.getenv("IMPORT_WORKERS", "1")),
+                    keep=int(os.getenv("IMPORT_JOBS_KEEP", "100")),
+                )
+    return _queue
+
+
+def shutdown_queue() -> None:
+    """Зупинити воркери (shutdown застосунку): активні задачі скасовуються."""
+    global _queue
+    with _queue_lock:
+        queue, _queue = _queue, None
+    if queue is not None:
+        queue.shutdown()
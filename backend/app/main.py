@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,11 +11,46 @@ from .routers import admin
 # Якщо ви вже створили search.py на попередньому кроці, розкоментуйте цей рядок:
 from .routers import search
 # -----------------------
+from .catalog_schema import ensure_catalog_schema
+from .config import validate_config
+from .db import async_available, dispose_async_engine, dispose_engine
+from .import_jobs import shutdown_queue
 
 # Завантаження змінних оточення
 load_dotenv()
 
-app = FastAPI(title="Maxgear API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: битий suppliers.yaml / profiles.yaml — помилка одразу, а не посеред імпорту
+    counts = validate_config()
+    print(f"[INFO] Config OK: {counts['suppliers']} supplier(s), {counts['profiles']} profile(s)")
+    # схема каталогу (і catalog_meta, з якої кеш пошуку читає generation) — до першого запиту,
+    # а не з першим імпортом; БД недоступна — API все одно стартує, лоадери спробують знову
+    try:
+        ensure_catalog_schema()
+    except Exception as e:
+        print(f"[WARN] DB: cannot prepare catalog schema on startup: {e}")
+    yield
+    # Shutdown: скасовуємо фонові імпорти і закриваємо пул з'єднань з PostgreSQL
+    shutdown_queue()
+    dispose_engine()
+    await dispose_async_engine()
+
+
+def search_router_module():
+    """
+    SEARCH_ROUTER=async|sync. За замовчуванням — async (asyncpg), якщо драйвер встановлено.
+    Обидва роутери мають однакові шляхи і формат відповіді.
+    """
+    mode = os.getenv("SEARCH_ROUTER", "").strip().lower()
+    if mode == "sync" or (mode != "async" and not async_available()):
+        return search
+    from .routers import search_async
+    return search_async
+
+
+app = FastAPI(title="Maxgear API", lifespan=lifespan)
 
 # === ДОДАТИ ЦЕЙ БЛОК ===
 origins = [
@@ -42,7 +78,7 @@ app.include_router(admin.router, prefix="/admin", tags=["admin"])
 # Всі маршрути будуть починатися з /api
 # Наприклад: /api/search
 # Якщо ви вже створили search.py, розкоментуйте цей рядок:
-app.include_router(search.router, prefix="/api", tags=["search"])
+app.include_router(search_router_module().router, prefix="/api", tags=["search"])
 
 # ----------------------------
 
@@ -5,6 +5,10 @@ from pathlib import Path
 # Базова директорія для тимчасових файлів
 BASE_DATA_DIR = Path("data")
 TEMP_DIR = BASE_DATA_DIR / "temp"
+# Знімки df_std для reprice (app/snapshots.py) — не в temp, бо temp періодично чиститься
+SNAPSHOT_DIR = BASE_DATA_DIR / "snapshots"
+# Невеликі стани між запусками (last-known-good курс тощо) — теж поза temp
+STATE_DIR = BASE_DATA_DIR / "state"
 
 # Гарантуємо, що вона існує
 TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -1,104 +1,422 @@
-from pathlib import Path
-from typing import Dict, List, Any, Optional
-import yaml
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 
-from .paths import CONFIG_DIR
-from .price_processor import process_one_price
-from .exchange import get_eur_to_uah
+import pandas as pd
+from pyarrow import feather
 
+from . import price_processor, search_cache
+from .config import get_profiles, get_supplier
+from .db import forget_engine_after_fork
+from .price_processor import (
+    prepare_standard_df,
+    export_profile,
+    cleanup_local_files,
+    stream_chunk_size,
+    skip_unchanged,
+    source_fingerprint,
+    stream_profiles,
+    sweep_retention,
+    LineSource,
+    ProfileStream,
+)
+from .exchange import eur_to_uah_quote
+from .snapshots import SnapshotWriter, load_snapshot, save_snapshot, snapshot_path, snapshots_enabled
 
-def _load_yaml(path: Path) -> Dict[str, Any]:
-    if not path.exists():
-        raise FileNotFoundError(f"{path} not found")
-    with open(path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+# progress(profile_name, {"status": ..., ...}) — див. app/import_jobs.py
+ProgressFn = Callable[[str, Dict[str, Any]], None]
+
+
+class ImportCancelled(Exception):
+    """Імпорт скасовано (перевіряється між профілями і між порціями потокового режиму)."""
 
 
 def _get_supplier_id(supplier: str) -> Optional[int]:
-    cfg = _load_yaml(CONFIG_DIR / "suppliers.yaml")
-    node = cfg.get(supplier) or cfg.get(supplier.upper()) or cfg.get(supplier.lower())
-    if not node:
-        return None
-    return int(node["supplier_id"]) if "supplier_id" in node and node["supplier_id"] is not None else None
+    sup_cfg = get_supplier(supplier)
+    return sup_cfg.supplier_id if sup_cfg is not None else None
 
 
 def process_all_prices(
         supplier: str,
-        remote_gz_path: str,
+        remote_gz_path: Union[str, LineSource],
         *,
         delete_input_after: bool = False,
         supplier_id: Optional[int] = None,
         # --- НОВИЙ ПАРАМЕТР ДЛЯ ФІЛЬТРАЦІЇ ---
         profile_filter: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        progress: Optional[ProgressFn] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        workers: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
     Пройти профілі з config/profiles.yaml.
     Якщо задано profile_filter, обробляються тільки ті профілі, назва яких містить цей фільтр.
+    Джерело завантажується і парситься ОДИН раз, а всі профілі будуються зі спільного df_std.
+    chunk_size (або env PRICE_CHUNK_ROWS) вмикає потоковий режим: порції df_std
+    проходять через усі профілі одразу, і весь прайс ніколи не тримається в пам'яті.
+
+    progress / is_cancelled — для фонових задач (app/import_jobs.py): progress отримує
+    статус кожного профілю, а is_cancelled() == True зупиняє імпорт з ImportCancelled.
+    У потоковому режимі незавершені профілі відкочуються; у звичайному — профілі,
+    що вже відпрацювали, лишаються.
+
+    workers (або env PROFILE_WORKERS) > 1 — профілі рендеряться паралельно в пулі процесів
+    (див. _run_parallel). Порядок результатів той самий; помилка одного профілю не зупиняє
+    інші — вона потрапляє в його результат ("error", key/url = None).
     """
-    profiles_cfg = _load_yaml(CONFIG_DIR / "profiles.yaml")
-    profiles = profiles_cfg.get("profiles", [])
-    common = profiles_cfg.get("common", {})
-    rounding = (common.get("rounding") or {"EUR": 2, "UAH": 0})
+    hooks = _Hooks(progress, is_cancelled)
+    specs = _profile_specs(supplier, supplier_id, profile_filter, hooks)
+    if not specs:
+        return []
 
-    if supplier_id is None:
-        supplier_id = _get_supplier_id(supplier)
+    chunk_size = stream_chunk_size(chunk_size)
+    if chunk_size:
+        if profile_workers(workers) > 1:
+            print(f"ℹ️  {supplier}: streaming mode renders profiles in one process (PROFILE_WORKERS ignored)")
+        outputs = _run_streaming(remote_gz_path, supplier, specs, chunk_size, hooks)
+    else:
+        # 0-1) одне завантаження + один парсинг на всі профілі; знімок — для reprice
+        df_std = prepare_standard_df(remote_gz_path, supplier)
+        print(f"📦 {supplier}: parsed {len(df_std)} rows once for {len(specs)} profile(s)")
+        save_snapshot(df_std, supplier, source=str(remote_gz_path))
+        outputs = _render(df_std, supplier, specs, hooks, workers)
+    _sweep_retention(specs, outputs)
 
-    results: List[Dict[str, Any]] = []
-    for profile in profiles:
-        name = profile["name"]
+    # вхідний файл видаляємо лише після того, як відпрацювали ВСІ профілі
+    cleanup_local_files([], remote_gz_path, delete_input_after)
+    return _results(specs, outputs)
 
-        # --- ЛОГІКА ФІЛЬТРАЦІЇ (Вирішує Проблему 2) ---
-        if profile_filter and profile_filter.lower() not in name.lower():
-            # Якщо ім'я профілю не містить фільтр (наприклад "site"), пропускаємо його
-            print(f"ℹ️  Skipping profile '{name}' (filter='{profile_filter}')")
-            continue
-        # ----------------------------------------------
 
-        factor = float(profile["factor"])
-        currency_out = str(profile["currency_out"]).upper()
-        format_ = profile["format"]
+def reprice_from_snapshot(
+        supplier: str,
+        *,
+        supplier_id: Optional[int] = None,
+        profile_filter: Optional[str] = None,
+        progress: Optional[ProgressFn] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        workers: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Перебудувати профілі з останнього знімка df_std (app/snapshots.py) — без завантаження
+    і парсингу джерела. Для зміни курсу / factor / колонок у profiles.yaml.
+    Результати — як у process_all_prices, плюс "snapshot" (коли і з чого зроблено знімок).
+    FileNotFoundError, якщо знімка для постачальника ще немає.
+    """
+    df_std, snapshot = load_snapshot(supplier)
+    hooks = _Hooks(progress, is_cancelled)
+    specs = _profile_specs(supplier, supplier_id, profile_filter, hooks)
+    if not specs:
+        return []
+
+    print(f"📦 {supplier}: repricing {len(specs)} profile(s) from snapshot "
+          f"({snapshot['rows']} rows, {snapshot.get('created_at')})")
+    outputs = _render(df_std, supplier, specs, hooks, workers)
+    _sweep_retention(specs, outputs)
+    results = _results(specs, outputs)
+    for result in results:
+        result["snapshot"] = {k: snapshot.get(k) for k in ("created_at", "source", "rows")}
+    return results
 
-        r2_prefix = (profile.get("r2_prefix") or "").format(supplier=supplier.lower())
-        if r2_prefix and not r2_prefix.endswith("/"):
-            r2_prefix += "/"
 
-        columns = profile.get("columns") or []
-        csv_cfg = profile.get("csv") or {}
+def _profile_specs(
+        supplier: str,
+        supplier_id: Optional[int],
+        profile_filter: Optional[str],
+        hooks: "_Hooks",
+) -> List[Dict[str, Any]]:
+    """Профілі з config/profiles.yaml (з урахуванням profile_filter) → параметри export_profile."""
+    profiles_cfg = get_profiles()
+    rounding = dict(profiles_cfg.rounding)
 
+    if supplier_id is None:
+        supplier_id = _get_supplier_id(supplier)
+
+    selected = profiles_cfg.select(profile_filter)
+    if profile_filter:
+        for profile in profiles_cfg.profiles:
+            if profile not in selected:
+                print(f"ℹ️  Skipping profile '{profile.name}' (filter='{profile_filter}')")
+
+    for profile in selected:
+        hooks.notify(profile.name, status="pending")
+
+    specs: List[Dict[str, Any]] = []
+    for profile in selected:
         rate = 1.0
-        if currency_out == "UAH":
-            rp = profile.get("rate_params") or {}
-            fb = rp.get("fallback")
-            fallback_value = fb.get("value") if isinstance(fb, dict) else (fb or 50)
-            rate = get_eur_to_uah(
-                add_uah=rp.get("add_uah", 1),
-                min_rate=rp.get("min_rate", 49),
-                fallback=fallback_value,
+        report: Dict[str, Any] = {}
+        if profile.rate is not None:
+            # курс із кешу / диска (app/exchange.py); звідки він і коли отриманий — у результаті профілю
+            quote = eur_to_uah_quote(
+                add_uah=profile.rate.add_uah,
+                min_rate=profile.rate.min_rate,
+                fallback=profile.rate.fallback,
             )
+            rate = quote["rate"]
+            report["rate"] = quote
 
-        print(f"➡️  {name}: factor={factor}, out={currency_out}, fmt={format_}, r2={r2_prefix}")
-
-        key, url = process_one_price(
-            remote_gz_path=remote_gz_path,
-            supplier=supplier,
-            supplier_id=supplier_id,
-            factor=factor,
-            currency_out=currency_out,
-            format_=format_,
-            rounding=rounding,
-            r2_prefix=r2_prefix,
-            columns=columns,
-            csv_cfg=csv_cfg,
-            rate=rate,
-            delete_input_after=delete_input_after,
-        )
+        specs.append({
+            "name": profile.name,
+            "report": report,
+            "kwargs": dict(
+                supplier=supplier,
+                supplier_id=supplier_id,
+                factor=profile.factor,
+                currency_out=profile.currency_out,
+                format_=profile.format,
+                rounding=rounding,
+                r2_prefix=profile.r2_prefix(supplier),
+                # прості dict-и: specs передаються в пул процесів (MappingProxyType не pickle-ється)
+                columns=profile.columns_cfg(),
+                csv_cfg=dict(profile.csv),
+                rate=rate,
+                report=report,
+                # старі файли в R2 прибираються одним проходом після всіх профілів (_sweep_retention)
+                cleanup=False,
+                compression=profile.compression,
+                compression_level=profile.compression_level,
+            ),
+        })
 
+    return specs
+
+
+def _results(specs: List[Dict[str, Any]], outputs: List[Tuple[Optional[str], Optional[str]]]) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    for spec, (key, url) in zip(specs, outputs):
         results.append({
-            "name": name,
-            "factor": factor,
-            "currency": currency_out,
+            "name": spec["name"],
+            "factor": spec["kwargs"]["factor"],
+            "currency": spec["kwargs"]["currency_out"],
             "key": key,
             "url": url,
+            **spec["report"],
         })
+    return results
+
+
+def _sweep_retention(specs: List[Dict[str, Any]], outputs: List[Tuple[Optional[str], Optional[str]]]) -> None:
+    """
+    Прибирання R2 для префіксів профілів, що вивантажили новий файл; кількість видалених — у результат.
+    Незмінені профілі (upload == "unchanged") нічого не додали — їх префікси не чіпаємо.
+    """
+    prefixes = [
+        spec["kwargs"]["r2_prefix"]
+        for spec, (key, _) in zip(specs, outputs)
+        if key and spec["report"].get("upload") != "unchanged"
+    ]
+    deleted = sweep_retention(prefixes)
+    for spec in specs:
+        prefix = spec["kwargs"]["r2_prefix"]
+        if prefix in deleted:
+            spec["report"]["retention"] = {"keep": price_processor._r2_keep_last(prefix), "deleted": deleted[prefix]}
+
+
+def _render(
+        df_std: pd.DataFrame,
+        supplier: str,
+        specs: List[Dict[str, Any]],
+        hooks: "_Hooks",
+        workers: Optional[int],
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """Усі профілі зі спільного df_std: послідовно або в пулі процесів (PROFILE_WORKERS)."""
+    workers = profile_workers(workers)
+    if workers > 1 and len(specs) > 1:
+        return _run_parallel(df_std, supplier, specs, hooks, workers)
+    return _run_in_memory(df_std, specs, hooks)
+
+
+class _Hooks:
+    """progress + is_cancelled з process_all_prices; без них — нічого не робить."""
+
+    def __init__(self, progress: Optional[ProgressFn], is_cancelled: Optional[Callable[[], bool]]):
+        self.progress = progress
+        self.is_cancelled = is_cancelled
+
+    def notify(self, name: str, **info: Any) -> None:
+        if self.progress is not None:
+            self.progress(name, info)
+
+    def cancelled(self) -> bool:
+        return self.is_cancelled is not None and self.is_cancelled()
+
+    def check_cancelled(self) -> None:
+        if self.cancelled():
+            raise ImportCancelled("Import cancelled")
+
+    def done(self, spec: Dict[str, Any], output: Tuple[str, str]) -> None:
+        key, url = output
+        self.notify(spec["name"], status="done", key=key, url=url, **spec["report"])
+
+
+def _log_profile(spec: Dict[str, Any]) -> None:
+    kw = spec["kwargs"]
+    print(f"➡️  {spec['name']}: factor={kw['factor']}, out={kw['currency_out']}, fmt={kw['format_']}, r2={kw['r2_prefix']}")
+
+
+def _run_in_memory(
+        df_std: pd.DataFrame,
+        specs: List[Dict[str, Any]],
+        hooks: _Hooks,
+) -> List[Tuple[str, str]]:
+    """Усі профілі по черзі зі спільного df_std."""
+    outputs: List[Tuple[str, str]] = []
+    for spec in specs:
+        hooks.check_cancelled()
+        _log_profile(spec)
+        hooks.notify(spec["name"], status="running", rows=len(df_std))
+        outputs.append(export_profile(df_std, **spec["kwargs"]))
+        hooks.done(spec, outputs[-1])
+    return outputs
+
+
+def _run_streaming(
+        remote_gz_path: Union[str, LineSource],
+        supplier: str,
+        specs: List[Dict[str, Any]],
+        chunk_size: int,
+        hooks: _Hooks,
+) -> List[Tuple[str, str]]:
+    """
+    Потоковий режим: порції df_std по chunk_size рядків ідуть у всі профілі.
+    Незмінені виходи визначаються за відбитком джерела (source_fingerprint) ще до читання:
+    джерело читається один раз, а якщо писати нікуди — жодного разу.
+    """
+    hooks.check_cancelled()
+    print(f"📦 {supplier}: streaming in chunks of {chunk_size} rows to {len(specs)} profile(s)")
+    fingerprint = source_fingerprint(remote_gz_path) if skip_unchanged() else None
+    streams: List[ProfileStream] = []
+    try:
+        for spec in specs:
+            _log_profile(spec)
+            streams.append(ProfileStream(**spec["kwargs"], source_fingerprint=fingerprint))
+            hooks.notify(spec["name"], status="running", rows=0)
+    except Exception:
+        for stream in streams:
+            stream.abort()
+        raise
+
+    def on_chunk(rows: int) -> None:
+        for spec in specs:
+            hooks.notify(spec["name"], status="running", rows=rows)
+        hooks.check_cancelled()
+
+    # знімок для reprice пишеться тими ж порціями і публікується останнім, коли всі профілі готові;
+    # якщо жоден профіль не змінився, джерело те саме і наявний знімок актуальний — не читаємо його
+    unchanged = all(stream.idle for stream in streams) and snapshot_path(supplier).exists()
+    snapshot = [SnapshotWriter(supplier, source=str(remote_gz_path))] if snapshots_enabled() and not unchanged else []
+    outputs = stream_profiles(remote_gz_path, supplier, streams + snapshot, chunk_size, on_chunk=on_chunk)
+    outputs = outputs[:len(streams)]
+    for spec, output in zip(specs, outputs):
+        hooks.done(spec, output)
+    return outputs
+
+
+# ----------------------- Parallel profiles (process pool) -----------------------
+# Після парсингу кожен профіль — це CPU: ціна, _build_output_df і особливо to_excel.
+# У паралельному режимі df_std один раз пишеться в Arrow-файл у data/temp, кожен процес
+# пулу читає його (memory map) один раз в initializer-і, а задачі несуть лише параметри
+# профілю — великий кадр не пересилається через pipe на кожен профіль.
+# Пам'ять: числові колонки лишаються view на memory map, але рядкові (code, name, brand, ...)
+# pandas тримає як Python-об'єкти — кожен процес має власну їх копію, тобто пік RAM
+# ≈ workers × розмір df_std. Arrow-backed кадр (pd.ArrowDtype) не копіював би їх, але
+# xlsx_writer і catalog_loader обирають запис за numpy/object dtype.
+# Процеси стартують через forkserver (або spawn): fork багатопотокового процесу API
+# (пул БД, потоки імпорту, boto3) небезпечний. PROFILE_POOL_START=fork — лише явно.
+
+_shared_df: Optional[pd.DataFrame] = None
+
+
+def profile_workers(workers: Optional[int] = None) -> int:
+    """Кількість процесів для профілів: аргумент або env PROFILE_WORKERS (1 — послідовно)."""
+    if workers is None:
+        workers = int(os.getenv("PROFILE_WORKERS", "1") or 1)
+    return max(1, workers)
+
+
+def _init_profile_worker(frame_path: str) -> None:
+    global _shared_df
+    forget_engine_after_fork()
+    # split_blocks — без консолідації в 2D-блоки (ще одна копія), self_destruct звільняє
+    # Arrow-буфери по ходу конвертації
+    table = feather.read_table(frame_path, memory_map=True)
+    _shared_df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    """Метод старту процесів пулу: env PROFILE_POOL_START, інакше forkserver (де є) або spawn."""
+    method = os.getenv("PROFILE_POOL_START")
+    if not method:
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def _render_profile(kwargs: Dict[str, Any]) -> Tuple[str, str, Dict[str, Any]]:
+    report: Dict[str, Any] = {}
+    key, url = export_profile(_shared_df, **kwargs, report=report)
+    return key, url, report
+
+
+def _run_parallel(
+        df_std: pd.DataFrame,
+        supplier: str,
+        specs: List[Dict[str, Any]],
+        hooks: _Hooks,
+        workers: int,
+) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Профілі паралельно в ProcessPoolExecutor (метод старту — _pool_context).
+    Кожен процес тримає власну копію рядкових колонок df_std (див. коментар секції).
+    """
+    rows = len(df_std)
+    workers = min(workers, len(specs))
+    print(f"📦 {supplier}: rendering {len(specs)} profile(s) in {workers} worker process(es)")
+
+    tmp_dir = price_processor.TEMP_DIR
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    frame_path = tmp_dir / f"{uuid.uuid4().hex[:8]}_{supplier.lower()}_df_std.arrow"
+    feather.write_feather(df_std, frame_path, compression="uncompressed")
+
+    outputs: List[Tuple[Optional[str], Optional[str]]] = [(None, None)] * len(specs)
+    try:
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=_pool_context(),
+                initializer=_init_profile_worker,
+                initargs=(str(frame_path),),
+        ) as pool:
+            futures = {}
+            for i, spec in enumerate(specs):
+                _log_profile(spec)
+                kwargs = {k: v for k, v in spec["kwargs"].items() if k != "report"}
+                futures[pool.submit(_render_profile, kwargs)] = i
+                hooks.notify(spec["name"], status="running", rows=rows)
 
-    return results
\ No newline at end of file
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    spec = specs[futures[future]]
+                    try:
+                        key, url, report = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] Profile {spec['name']} failed: {e}")
+                        spec["report"]["error"] = str(e)
+                        hooks.notify(spec["name"], status="failed", error=str(e))
+                        continue
+                    spec["report"].update(report)
+                    outputs[futures[future]] = (key, url)
+                    hooks.done(spec, (key, url))
+                if pending and hooks.cancelled():
+                    # профілі, що вже рендеряться, доробляються; ті, що в черзі пулу, — ні
+                    for future in pending:
+                        future.cancel()
+                    raise ImportCancelled("Import cancelled")
+    finally:
+        frame_path.unlink(missing_ok=True)
+        # каталог писали дочірні процеси — кеш пошуку цього процесу має звірити generation
+        search_cache.mark_stale()
+    return outputs
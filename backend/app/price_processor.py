@@ -1,23 +1,44 @@
+import io
 import os
+import json
+import hashlib
 import re
 import gzip
 import shutil
-import yaml
 import ftplib
+try:
+    import ssl
+except ImportError:  # pragma: no cover
+    ssl = None
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Tuple, List, Dict, Any, Optional
+from itertools import islice
+from typing import (
+    Tuple, List, Dict, Any, Optional, Iterable, Iterator, TextIO, BinaryIO, Callable, ContextManager, Union,
+)
 from pathlib import Path
 
 import pandas as pd
-# --- Імпорт text для безпечних SQL-запитів ---
-from sqlalchemy import create_engine, text
 
+from . import vector_parser
+from .code_key import code_key
+from .compression import content_type as compression_content_type, open_writer as open_compressor, suffix as compression_suffix
+from .config import EMPTY_PLAN, SupplierConfig, get_profiles, get_supplier
+from .catalog_loader import make_catalog_loader
 from .paths import TEMP_DIR
-from .storage import StorageClient
+from .storage import CONTENT_HASH_META, SOURCE_HASH_META, StorageClient, UploadStream
+from .xlsx_writer import XlsxTableWriter
 
 
 # ----------------------- FTP / unzip -----------------------
-def download_file_from_ftp(remote_path: str, local_path: Path) -> None:
+FTP_BLOCK_SIZE = 64 * 1024
+
+
+def _ftp_session(action: Callable[[ftplib.FTP], Any]) -> Any:
+    """
+    Логін + TYPE I, потім action(ftp). Спершу Explicit TLS (FTPS), якщо не вдалось — звичайний FTP.
+    Якщо action впав, з'єднання закривається; інакше ним розпоряджається action / викликач.
+    """
     host = os.getenv("FTP_HOST")
     user = os.getenv("FTP_USER")
     pwd = os.getenv("FTP_PASS")
@@ -25,129 +46,246 @@ def download_file_from_ftp(remote_path: str, local_path: Path) -> None:
         raise RuntimeError("FTP credentials are missing in .env")
 
     # допоміжний виконавець
-    def _retr(ftp):
-        ftp.set_pasv(True)  # як у FileZilla (PASV)
-        ftp.login(user, pwd)
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(local_path, "wb") as f:
-            ftp.retrbinary(f"RETR " + remote_path, f.write)
-        ftp.quit()
+    def _run(ftp):
+        try:
+            ftp.set_pasv(True)  # як у FileZilla (PASV)
+            ftp.login(user, pwd)
+            ftp.voidcmd("TYPE I")
+            return action(ftp)
+        except BaseException:
+            ftp.close()
+            raise
 
     # 1) спроба через Explicit TLS (FTPS)
     try:
         ftps = ftplib.FTP_TLS(host, timeout=20)
         ftps.auth()  # AUTH TLS
         ftps.prot_p()  # шифрувати data channel
-        _retr(ftps)
-        return
+        return _run(ftps)
     except ftplib.all_errors as e_tls:
         # 2) якщо TLS не доступний — пробуємо звичайний FTP
         try:
             ftp = ftplib.FTP(host, timeout=20)
-            _retr(ftp)
-            return
+            return _run(ftp)
         except ftplib.all_errors as e_plain:
             # показати, що пробували обидва варіанти
             raise RuntimeError(f"FTP/FTPS failed. FTPS: {e_tls}; FTP: {e_plain}")
 
 
-def unzip_gz_file(gz_file: Path, output_csv: Path) -> None:
-    with gzip.open(gz_file, "rb") as f_in, open(output_csv, "wb") as f_out:
-        shutil.copyfileobj(f_in, f_out)
+def _ftp_open_transfer(remote_path: str, rest: Optional[int] = None) -> Tuple[ftplib.FTP, Any]:
+    """
+    Логін + RETR (з REST, якщо rest задано). Повертає (ftp, data-socket).
+    """
+    return _ftp_session(lambda ftp: (ftp, ftp.transfercmd("RETR " + remote_path, rest=rest or None)))
 
 
-# ----------------------- Config helpers -----------------------
+def ftp_fingerprint(remote_path: str) -> Optional[str]:
+    """
+    Чи змінився файл на FTP — без завантаження: "MDTM:SIZE" (для планувальника, app/scheduler.py).
+    None — сервер не відповів ні на MDTM, ні на SIZE (тоді кожна перевірка вважається зміною).
+    """
+    def _stat(ftp):
+        try:
+            try:
+                mdtm = ftp.sendcmd("MDTM " + remote_path).split()[-1]
+            except ftplib.error_perm:
+                mdtm = None
+            try:
+                size = ftp.size(remote_path)
+            except ftplib.error_perm:
+                size = None
+        finally:
+            try:
+                ftp.quit()
+            except ftplib.all_errors:
+                ftp.close()
+        if mdtm is None and size is None:
+            return None
+        return f"{mdtm}:{size}"
 
-def _config_dir() -> Path:
-    # backend/app/price_processor.py -> backend/config/...
-    return Path(__file__).resolve().parent.parent / "config"
+    return _ftp_session(_stat)
 
 
-def _load_supplier_cfg(supplier_name: str) -> dict:
-    """Завантажує секцію постачальника з config/suppliers.yaml."""
-    cfg_path = _config_dir() / "suppliers.yaml"
-    if not cfg_path.exists():
-        return {}
-    with open(cfg_path, "r", encoding="utf-8") as f:
-        all_suppliers = yaml.safe_load(f) or {}
-    return (
-            all_suppliers.get(supplier_name)
-            or all_suppliers.get(supplier_name.upper())
-            or all_suppliers.get(supplier_name.lower())
-            or {}
-    )
+class FtpStream(io.RawIOBase):
+    """
+    Потік байтів файлу з FTP без запису на диск (pull-модель поверх transfercmd).
+    Якщо з'єднання обірвалось, перепідключається і продовжує з місця обриву через REST.
+    """
+
+    def __init__(self, remote_path: str, max_resumes: Optional[int] = None):
+        super().__init__()
+        self.remote_path = remote_path
+        self.offset = 0
+        self.resumes_left = int(os.getenv("FTP_MAX_RESUMES", "5")) if max_resumes is None else max_resumes
+        self.ftp: Optional[ftplib.FTP] = None
+        self.conn = None
+        self.done = False
+        self._connect()
+
+    def readable(self) -> bool:
+        return True
+
+    def _connect(self) -> None:
+        self.ftp, self.conn = _ftp_open_transfer(self.remote_path, rest=self.offset)
+
+    def _drop(self) -> None:
+        for obj in (self.conn, self.ftp):
+            try:
+                if obj is not None:
+                    obj.close()
+            except Exception:
+                pass
+        self.conn = self.ftp = None
+
+    def _resume(self, err: BaseException) -> None:
+        self._drop()
+        if self.resumes_left <= 0:
+            raise RuntimeError(f"FTP transfer of {self.remote_path} failed at {self.offset} bytes: {err}")
+        self.resumes_left -= 1
+        print(f"⚠️ FTP transfer interrupted at {self.offset} bytes ({err}); resuming with REST...")
+        self._connect()
+
+    def _finish(self) -> bool:
+        """Закрити data-канал і дочекатись 226. False — якщо сервер повідомив про обрив."""
+        try:
+            if ssl is not None and isinstance(self.conn, ssl.SSLSocket):
+                self.conn.unwrap()
+            self.conn.close()
+            self.ftp.voidresp()
+        except ftplib.all_errors as e:
+            self._resume(e)
+            return False
+        try:
+            self.ftp.quit()
+        except ftplib.all_errors:
+            pass
+        self._drop()
+        self.done = True
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.done:
+            try:
+                n = self.conn.recv_into(b)
+            except ftplib.all_errors as e:
+                self._resume(e)
+                continue
+            if n:
+                self.offset += n
+                return n
+            if self._finish():
+                break
+        return 0
+
+    def close(self) -> None:
+        self._drop()
+        super().close()
+
+
+def download_file_from_ftp(remote_path: str, local_path: Path) -> None:
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    with FtpStream(remote_path) as src, open(local_path, "wb") as f:
+        shutil.copyfileobj(src, f, FTP_BLOCK_SIZE)
+
+
+# ----------------------- Config helpers -----------------------
+
+def _load_supplier_cfg(supplier_name: str) -> Optional[SupplierConfig]:
+    """Секція постачальника з config/suppliers.yaml (кешована, див. app/config.py)."""
+    return get_supplier(supplier_name)
 
 
 # ----------------------- Normalize & parse -----------------------
 
+_GT5_RE = re.compile(r">\s*5")
+_SPLIT_NAME_RE = re.compile(r"\w\s\w*\s\w")
+_SPACE_RE = re.compile(r"\s")
+
+
 def _normalize_line_with_cfg(line: str, gt5_to: Optional[int]) -> str:
     """
     Нормалізація рядка для «пробільних» форматів.
     """
     repl = str(gt5_to if gt5_to is not None else 10)
-    line = re.sub(r">\s*5", repl, line)
-    m = re.search(r"\w\s\w*\s\w", line)
-    if m:
-        line = re.sub(r"\s", "", line, count=1)
-    line = re.sub(r"\s", ";", line)
-    return line
+    line = _GT5_RE.sub(repl, line)
+    if _SPLIT_NAME_RE.search(line):
+        line = _SPACE_RE.sub("", line, count=1)
+    return _SPACE_RE.sub(";", line)
 
 
-def raw_csv_to_rows(
-        input_csv: Path,
+def lines_to_rows(
+        lines: Iterable[str],
         *,
         stock_index: Optional[int],
         stock_header_token: str = "STAN",
         gt5_to: Optional[int] = None,
-        skip_rows: int = 0,
         normalize_mode: str = "spaces",  # "spaces" | "csv"
 ) -> List[List[str]]:
     """
-    Читає сирий CSV і повертає рядки (list[str]).
+    Сирі рядки (skip_rows уже відкинуто) → відфільтровані рядки (list[str]).
     """
     rows: List[List[str]] = []
-    with open(input_csv, "r", encoding="utf-8", errors="ignore") as f:
-        for i, raw in enumerate(f):
-            if i < skip_rows:
-                continue
-            raw = raw.strip()
-            if not raw:
-                continue
+    for raw in lines:
+        raw = raw.strip()
+        if not raw:
+            continue
 
-            if normalize_mode == "csv":
-                parts = raw.split(";")
-            else:
-                norm = _normalize_line_with_cfg(raw, gt5_to=gt5_to)
-                parts = norm.split(";")
+        if normalize_mode == "csv":
+            parts = raw.split(";")
+        else:
+            norm = _normalize_line_with_cfg(raw, gt5_to=gt5_to)
+            parts = norm.split(";")
 
-            if not parts:
-                continue
+        if not parts:
+            continue
 
-            idx = stock_index if stock_index is not None else (len(parts) - 1)
-            if idx < 0 or idx >= len(parts):
-                continue
+        idx = stock_index if stock_index is not None else (len(parts) - 1)
+        if idx < 0 or idx >= len(parts):
+            continue
 
-            val = (parts[idx] or "").strip()
+        val = (parts[idx] or "").strip()
 
-            # пропускаємо службовий заголовок стоку
-            if val.lower() == (stock_header_token or "").lower():
-                continue
+        # пропускаємо службовий заголовок стоку
+        if val.lower() == (stock_header_token or "").lower():
+            continue
 
-            # нормалізуємо '>5' у числове значення
-            if gt5_to is not None and (val.startswith(">") or val.replace(" ", "").startswith(">")):
-                val = str(gt5_to)
-                parts[idx] = val
+        # нормалізуємо '>5' у числове значення
+        if gt5_to is not None and (val.startswith(">") or val.replace(" ", "").startswith(">")):
+            val = str(gt5_to)
+            parts[idx] = val
 
-            try:
-                if int(val) <= 0:
-                    continue
-            except ValueError:
+        try:
+            if int(val) <= 0:
                 continue
+        except ValueError:
+            continue
 
-            rows.append(parts)
+        rows.append(parts)
     return rows
 
 
+def raw_csv_to_rows(
+        input_csv: Path,
+        *,
+        stock_index: Optional[int],
+        stock_header_token: str = "STAN",
+        gt5_to: Optional[int] = None,
+        skip_rows: int = 0,
+        normalize_mode: str = "spaces",  # "spaces" | "csv"
+) -> List[List[str]]:
+    """
+    Читає сирий CSV і повертає рядки (list[str]).
+    """
+    with open(input_csv, "r", encoding="utf-8", errors="ignore") as f:
+        return lines_to_rows(
+            islice(f, skip_rows, None),
+            stock_index=stock_index,
+            stock_header_token=stock_header_token,
+            gt5_to=gt5_to,
+            normalize_mode=normalize_mode,
+        )
+
+
 def _rows_to_standard_df(rows: List[List[str]], colmap: Dict[str, int]) -> pd.DataFrame:
     """
     Приводимо сирі рядки до стандартної моделі колонок.
@@ -181,14 +319,29 @@ def _rows_to_standard_df(rows: List[List[str]], colmap: Dict[str, int]) -> pd.Da
         except Exception:
             price = float("nan")
 
-        data.append([code, unicode_, brand, name, stock, price])
+        data.append([code, unicode_, brand, name, stock, price, code_key(code)])
 
-    df = pd.DataFrame(data, columns=["code", "unicode", "brand", "name", "stock", "price"])
+    df = pd.DataFrame(data, columns=["code", "unicode", "brand", "name", "stock", "price", "code_key"])
     df["price"] = pd.to_numeric(df["price"], errors="coerce")
     df["stock"] = pd.to_numeric(df["stock"], errors="coerce").fillna(0).astype(int)
     return df
 
 
+def _parser_engine(configured: Optional[str]) -> str:
+    """
+    Який парсер використовувати: "vectorized" (за замовчуванням) або "legacy".
+    Пріоритет: змінна PRICE_PARSER_ENGINE → normalize.engine у suppliers.yaml.
+    """
+    engine = os.getenv("PRICE_PARSER_ENGINE") or configured or "vectorized"
+    engine = str(engine).lower()
+    if engine not in ("vectorized", "legacy"):
+        raise ValueError(f"Unknown parser engine: {engine}")
+    if engine == "vectorized" and not vector_parser.available():
+        print("⚠️ pyarrow is not installed, falling back to legacy parser")
+        return "legacy"
+    return engine
+
+
 # ----------------------- Pricing & build output -----------------------
 
 def _apply_pricing(
@@ -235,40 +388,320 @@ def _build_output_df(
     return pd.DataFrame(out_cols)
 
 
-# ----------------------- Materialize to CSV -----------------------
+def _profile_output_df(
+        df_std: pd.DataFrame,
+        supplier_id: Optional[int],
+        factor: float,
+        currency_out: str,
+        rate: float,
+        rounding: Dict[str, int],
+        columns: List[Dict[str, str]],
+) -> pd.DataFrame:
+    """Етапи 2-3 профілю: ціна → вихідний DataFrame."""
+    price_final = _apply_pricing(df_std, factor=factor, currency_out=currency_out, rate=rate, rounding=rounding)
+    return _build_output_df(df_std, price_final, columns_cfg=columns, supplier_id=supplier_id)
+
+
+# ----------------------- Source → text stream -----------------------
+
+class LineSource:
+    """
+    Джерело рядків замість шляху (remote_gz_path у process_all_prices / process_one_price):
+    opener() — контекстний менеджер з ітератором сирих рядків. Так прайс у нестандартній обгортці
+    (напр. zip із листа MOTOROL) іде в конвеєр потоком, без проміжних файлів. name — для логів і знімка.
+    fingerprint — ідентичність вмісту (напр. хеш байтів вкладення) для пропуску незмінених виходів
+    у потоковому режимі; None — невідома.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            opener: Callable[[], ContextManager[Iterable[str]]],
+            fingerprint: Optional[str] = None,
+    ):
+        self.name = name
+        self.opener = opener
+        self.fingerprint = fingerprint
+
+    def open(self) -> ContextManager[Iterable[str]]:
+        return self.opener()
+
+    def __str__(self) -> str:
+        return self.name
+
 
-def _materialize_to_csv(remote_path: str, tmp_dir: Path) -> tuple[Path, list[Path]]:
+@contextmanager
+def open_source_text(remote_path: Union[str, LineSource]) -> Iterator[Iterable[str]]:
     """
-    Приводить будь-яке джерело до локального CSV.
+    Відкриває будь-яке джерело як текстовий потік рядків без проміжних файлів:
+    локальний .csv, локальний .gz, шлях на FTP (.gz розпаковується на льоту) або LineSource.
     """
-    cleanup: list[Path] = []
+    if isinstance(remote_path, LineSource):
+        with remote_path.open() as lines:
+            yield lines
+        return
 
+    raw: Optional[io.RawIOBase] = None
     if os.path.exists(remote_path):
         p = Path(remote_path)
         if p.suffix.lower() == ".csv":
-            return p, cleanup
-        if p.suffix.lower() == ".gz":
-            csv_out = tmp_dir / f"{p.stem}"
-            if csv_out.suffix.lower() != ".csv":
-                csv_out = csv_out.with_suffix(".csv")
-            unzip_gz_file(p, csv_out)
-            cleanup.append(csv_out)
-            return csv_out, cleanup
-        raise ValueError(f"Unsupported local file type: {p.suffix}")
+            f = open(p, "r", encoding="utf-8", errors="ignore")
+        elif p.suffix.lower() == ".gz":
+            f = gzip.open(p, "rt", encoding="utf-8", errors="ignore")
+        else:
+            raise ValueError(f"Unsupported local file type: {p.suffix}")
     else:
-        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        gz_tmp = tmp_dir / f"ftp_{stamp}.csv.gz"
-        csv_tmp = tmp_dir / f"ftp_{stamp}.csv"
-        download_file_from_ftp(remote_path, gz_tmp)
-        unzip_gz_file(gz_tmp, csv_tmp)
-        cleanup.extend([gz_tmp, csv_tmp])
-        return csv_tmp, cleanup
+        raw = FtpStream(remote_path)
+        gz = gzip.GzipFile(fileobj=io.BufferedReader(raw, FTP_BLOCK_SIZE), mode="rb")
+        f = io.TextIOWrapper(gz, encoding="utf-8", errors="ignore")
+    try:
+        yield f
+    finally:
+        f.close()
+        if raw is not None:
+            raw.close()
 
 
-# ----------------------- Main pipeline -----------------------
+# ----------------------- Parse plan -----------------------
 
-def process_one_price(
-        remote_gz_path: str,
+def _parse_plan(supplier: str) -> Dict[str, Any]:
+    """Параметри парсингу постачальника з config/suppliers.yaml (ParsePlan готується при завантаженні)."""
+    sup_cfg = _load_supplier_cfg(supplier)
+    plan = sup_cfg.plan if sup_cfg is not None else EMPTY_PLAN
+    return {
+        "engine": _parser_engine(plan.engine if sup_cfg is not None else None),
+        "colmap": plan.colmap,
+        "skip_rows": plan.skip_rows,
+        "kwargs": plan.parser_kwargs(),
+    }
+
+
+def _parse_lines(lines: List[str], plan: Dict[str, Any]) -> pd.DataFrame:
+    """Сирі рядки → стандартний DataFrame обраним парсером."""
+    colmap: Dict[str, int] = plan["colmap"]
+    if plan["engine"] == "legacy":
+        df_std = _rows_to_standard_df(lines_to_rows(lines, **plan["kwargs"]), colmap)
+    else:
+        df_std = vector_parser.parse_standard_df(lines, colmap, **plan["kwargs"])
+
+    if colmap.get("unicode") == colmap.get("code"):
+        df_std["unicode"] = df_std["code"]
+    if colmap.get("name") == colmap.get("brand"):
+        df_std["name"] = df_std["brand"]
+    return df_std
+
+
+# ----------------------- Site catalog (PostgreSQL) -----------------------
+
+def _catalog_frame(out_df: pd.DataFrame, df_std: pd.DataFrame) -> pd.DataFrame:
+    """Рядки для product_catalog: колонки site-профілю + code_key (для пошуку, не для CSV)."""
+    if "code_key" in out_df.columns or "code_key" not in df_std.columns:
+        return out_df
+    return out_df.assign(code_key=df_std["code_key"].to_numpy())
+
+
+def _update_site_catalog(out_df: pd.DataFrame, supplier_id: int) -> Dict[str, Any]:
+    """Замінити site-прайс постачальника у product_catalog одним кадром."""
+    loader = make_catalog_loader(supplier_id)
+    loader.begin()
+    print(f"[INFO] DB: Loading {len(out_df)} new rows for supplier ID {supplier_id}...")
+    loader.append(out_df)
+    return loader.finish()
+
+
+# ----------------------- Export & upload -----------------------
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def _r2_keep_last(prefix: str) -> int:
+    """Скільки файлів лишати в префіксі: common.retention у profiles.yaml (R2_KEEP_* перекривають)."""
+    return get_profiles().retention.keep_for(prefix)
+
+
+def sweep_retention(prefixes: Iterable[str]) -> Dict[str, int]:
+    """
+    Відкладене прибирання R2 одним проходом у кінці імпорту: кожен префікс ліститься один раз,
+    старі ключі видаляються пачками delete_objects. {prefix: видалено}; помилки — лише в лог.
+    """
+    policies = {prefix: _r2_keep_last(prefix) for prefix in dict.fromkeys(prefixes) if prefix}
+    if not policies:
+        return {}
+    try:
+        return StorageClient().apply_retention(policies)
+    except Exception as e:
+        print(f"⚠️ Retention sweep failed: {e}")
+        return {}
+
+
+def _output_name(supplier: str, format_: str) -> str:
+    stamp = datetime.now().strftime("%Y%m%d_%H%M")
+    ext = "xlsx" if format_.lower() == "xlsx" else "csv"
+    return f"{supplier.lower()}_{stamp}.{ext}"
+
+
+# ----------------------- Unchanged outputs (content hash) -----------------------
+# Постачальник часто надсилає той самий прайс. Кожен вихід профілю несе в метаданих R2 хеш
+# свого вмісту; якщо він збігається з хешем останнього об'єкта в префіксі, нове вивантаження
+# не робиться, а retention не витісняє корисну стару версію. R2_SKIP_UNCHANGED=0 — вимкнути.
+
+def skip_unchanged() -> bool:
+    return (os.getenv("R2_SKIP_UNCHANGED", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+class _ContentHash:
+    """
+    Хеш логічного вмісту виходу: рядки out_df (hash_pandas_object, порядок порцій не важливий)
+    + параметри формату. Не байти файлу — xlsx містить час створення і щоразу відрізняється.
+    """
+
+    def __init__(
+            self,
+            format_: str,
+            columns: List[Dict[str, str]],
+            csv_cfg: Optional[Dict[str, Any]],
+            compression: Optional[str],
+    ):
+        self._h = hashlib.blake2b(digest_size=16)
+        params = [format_.lower(), [dict(c) for c in columns], dict(csv_cfg or {}), compression]
+        self._h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+
+    def update(self, out_df: pd.DataFrame) -> "_ContentHash":
+        if len(out_df):
+            self._h.update(pd.util.hash_pandas_object(out_df, index=False).to_numpy().tobytes())
+        return self
+
+    def hexdigest(self) -> str:
+        return self._h.hexdigest()
+
+
+def source_fingerprint(remote_gz_path: Union[str, LineSource]) -> Optional[str]:
+    """
+    Дешевий відбиток джерела без парсингу: LineSource.fingerprint, хеш байтів локального файлу
+    (одне послідовне читання, набагато дешевше за парсинг) або MDTM/SIZE файлу на FTP
+    (без завантаження). None — невідомо, тоді потоковий режим вивантажує завжди.
+    """
+    if isinstance(remote_gz_path, LineSource):
+        return remote_gz_path.fingerprint
+    if os.path.exists(remote_gz_path):
+        h = hashlib.blake2b(digest_size=16)
+        with open(remote_gz_path, "rb") as f:
+            for block in iter(lambda: f.read(FTP_BLOCK_SIZE), b""):
+                h.update(block)
+        return f"file:{h.hexdigest()}"
+    try:
+        fp = ftp_fingerprint(remote_gz_path)
+    except Exception as e:
+        print(f"⚠️ Cannot stat {remote_gz_path} on FTP: {e}")
+        return None
+    return f"ftp:{remote_gz_path}:{fp}" if fp else None
+
+
+def _source_key(fingerprint: str, supplier: str, profile: Dict[str, Any]) -> str:
+    """
+    Ключ пропуску потокового режиму: відбиток джерела + усе, від чого залежить вихід профілю
+    (план парсингу постачальника, ціна, курс, колонки, формат). Відомий до першого рядка —
+    тож незмінене джерело не читається зовсім, а змінене читається один раз.
+    """
+    plan = _parse_plan(supplier)
+    params = [
+        fingerprint,
+        {"colmap": dict(plan["colmap"]), "skip_rows": plan["skip_rows"], "kwargs": plan["kwargs"]},
+        [profile.get(k) for k in ("supplier_id", "factor", "currency_out", "rate", "rounding",
+                                  "format_", "columns", "csv_cfg", "compression")],
+    ]
+    return hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _unchanged_output(
+        storage: StorageClient,
+        r2_prefix: str,
+        digest: str,
+        field: str = CONTENT_HASH_META,
+) -> Optional[Tuple[str, str]]:
+    """(key, url) останнього об'єкта в префіксі, якщо його вміст той самий (метадане field); інакше None."""
+    if not skip_unchanged():
+        return None
+    try:
+        key, latest_hash = storage.latest_content_hash(r2_prefix, field)
+    except Exception as e:
+        print(f"⚠️ Cannot check latest object in {r2_prefix}: {e}")
+        return None
+    if key is None or latest_hash != digest:
+        return None
+    print(f"⏭️  {r2_prefix}: content unchanged, upload skipped (latest: {key})")
+    return key, storage.url_for(key)
+
+
+class _OutputUpload:
+    """
+    4-5) Вихідний файл профілю пишеться одразу в R2 (storage.UploadStream → multipart upload),
+    без проміжного файлу в data/temp. cleanup=False — прибирання в R2 відкладене (sweep_retention).
+    compression (gzip | zstd, лише csv) — стискається потоком; ключ отримує суфікс .gz / .zst,
+    а об'єкт — Content-Type application/gzip | application/zstd (без Content-Encoding).
+    metadata (хеш вмісту / ключ джерела) відомі до відкриття вивантаження і йдуть у
+    CreateMultipartUpload — без copy_object після вивантаження (той не працює понад 5 ГБ).
+    """
+
+    def __init__(
+            self,
+            supplier: str,
+            format_: str,
+            r2_prefix: str,
+            columns: List[Dict[str, str]],
+            csv_cfg: Optional[Dict[str, Any]] = None,
+            cleanup: bool = True,
+            compression: Optional[str] = None,
+            compression_level: Optional[int] = None,
+            metadata: Optional[Dict[str, str]] = None,
+    ):
+        self.file_name = _output_name(supplier, format_) + compression_suffix(compression)
+        self.key = f"{r2_prefix}{self.file_name}"
+        self.headers = [col["header"] for col in columns]
+        xlsx = format_.lower() == "xlsx"
+        self.content_type = compression_content_type(compression, XLSX_CONTENT_TYPE if xlsx else "text/csv")
+        upload_kwargs: Dict[str, Any] = {}
+        if metadata:
+            upload_kwargs["metadata"] = metadata
+        self.stream = UploadStream(
+            StorageClient(),
+            self.key,
+            self.content_type,
+            cleanup_prefix=r2_prefix if cleanup else None,
+            keep_last=_r2_keep_last(r2_prefix),
+            **upload_kwargs,
+        )
+        try:
+            self.sink = open_compressor(compression, self.stream, compression_level) if compression else None
+            out = self.sink or self.stream
+            self.writer = XlsxTableWriter(out, columns) if xlsx else _CsvChunkWriter(out, csv_cfg)
+        except Exception:
+            self.stream.abort()
+            raise
+
+    def write(self, out_df: pd.DataFrame) -> None:
+        self.writer.write(out_df)
+
+    def finish(self) -> Tuple[str, str]:
+        try:
+            self.writer.close(self.headers)
+            if self.sink is not None:
+                self.sink.close()
+        except Exception:
+            self.stream.abort()
+            raise
+        return self.key, self.stream.finish()
+
+    def abort(self) -> None:
+        self.stream.abort()
+        try:
+            self.writer.close(self.headers)   # лише щоб звільнити ресурси xlsxwriter; потік уже закрито
+        except Exception:
+            pass
+
+
+def export_profile(
+        df_std: pd.DataFrame,
         supplier: str,
         supplier_id: Optional[int],
         factor: float,
@@ -279,154 +712,350 @@ def process_one_price(
         columns: List[Dict[str, str]],
         csv_cfg: Optional[Dict[str, Any]] = None,
         rate: float = 1.0,
-        delete_input_after: bool = False,
+        report: Optional[Dict[str, Any]] = None,
+        cleanup: bool = True,
+        compression: Optional[str] = None,  # gzip | zstd (csv)
+        compression_level: Optional[int] = None,
 ) -> Tuple[str, str]:
     """
-    Повний цикл обробки одного прайсу.
+    Етапи 2-5 для одного профілю: ціна → вихідний DataFrame → БД (site) → експорт → R2.
+    df_std не змінюється, тож один і той самий кадр можна передавати у всі профілі.
+    report (опційно) доповнюється деталями запуску, напр. report["db"] зі статистикою БД
+    і report["upload"]: "uploaded" | "unchanged" (вміст той самий — повертається останній ключ).
+    cleanup=False — не прибирати старі файли в R2 одразу (див. sweep_retention).
     """
-    tmp_dir = TEMP_DIR
-    tmp_dir.mkdir(parents=True, exist_ok=True)
+    # 2) calc + 3) build output
+    out_df = _profile_output_df(df_std, supplier_id, factor, currency_out, rate, rounding, columns)
 
-    stamp = datetime.now().strftime("%Y%m%d_%H%M")
-    supplier_code_str = supplier.lower()
+    if "/site/" in r2_prefix and supplier_id is not None:
+        db_stats = _update_site_catalog(_catalog_frame(out_df, df_std), supplier_id)
+        if report is not None:
+            report["db"] = db_stats
+    elif "/site/" in r2_prefix and supplier_id is None:
+        print(f"\n[WARNING] DB Trigger skipped: Found '/site/' prefix but supplier_id is None.\n")
+
+    # 4-5) export → R2 (потоком, multipart upload) + cloud cleanup policy;
+    # той самий вміст, що й в останньому файлі префікса, — не вивантажується
+    digest = _ContentHash(format_, columns, csv_cfg, compression).update(out_df).hexdigest()
+    latest = _unchanged_output(StorageClient(), r2_prefix, digest)
+    if report is not None:
+        report["upload"] = "unchanged" if latest else "uploaded"
+    if latest is not None:
+        return latest
+
+    output = _OutputUpload(
+        supplier, format_, r2_prefix, columns, csv_cfg, cleanup, compression, compression_level,
+        {CONTENT_HASH_META: digest},
+    )
+    try:
+        if format_.lower() == "xlsx":
+            output.write(out_df)
+        else:
+            # CSV — порціями, щоб не тримати весь текст файлу в пам'яті
+            for start in range(0, len(out_df), DEFAULT_CHUNK_ROWS):
+                output.write(out_df.iloc[start:start + DEFAULT_CHUNK_ROWS])
+    except Exception:
+        output.abort()
+        raise
+    return output.finish()
 
-    # 0) materialize
-    csv_path, cleanup_paths = _materialize_to_csv(remote_gz_path, tmp_dir)
 
-    # 1) normalize → standard df
-    sup_cfg = _load_supplier_cfg(supplier)
-    layout = sup_cfg.get("raw_layout", {}) or {}
-    colmap: Dict[str, int] = (layout.get("columns") or {})
-    stock_index = layout.get("stock_index")
-    stock_header_token = layout.get("stock_header_token", "STAN")
-    gt5_to = layout.get("gt5_to")
-    skip_rows = (sup_cfg.get("preprocess") or {}).get("skip_rows", 0)
-    normalize_mode = (sup_cfg.get("normalize") or {}).get("mode", "spaces")
-
-    rows = raw_csv_to_rows(
-        csv_path,
-        stock_index=stock_index,
-        stock_header_token=stock_header_token,
-        gt5_to=gt5_to,
-        skip_rows=skip_rows,
-        normalize_mode=normalize_mode,
-    )
+# ----------------------- Streaming (chunked) mode -----------------------
+# Пікова пам'ять потокового режиму не залежить від розміру файлу:
+#   ≈ chunk_size × (сирий рядок + рядок df_std + рядок out_df на кожен профіль)
+# На практиці це ~1-2 КБ на рядок порції на профіль, тобто для chunk_size=50 000
+# і п'яти профілів — порядку 0.3-0.5 ГБ у найгіршому випадку, а не кратне розміру прайсу.
+# xlsx пишеться у constant_memory режимі xlsxwriter (у пам'яті лише поточний рядок).
 
-    df_std = _rows_to_standard_df(rows, colmap)
+DEFAULT_CHUNK_ROWS = 50_000
 
-    if colmap.get("unicode") == colmap.get("code"):
-        df_std["unicode"] = df_std["code"]
-    if colmap.get("name") == colmap.get("brand"):
-        df_std["name"] = df_std["brand"]
 
-    # 2) calc
-    price_final = _apply_pricing(
-        df_std, factor=factor, currency_out=currency_out, rate=rate, rounding=rounding
-    )
+def stream_chunk_size(chunk_size: Optional[int] = None) -> Optional[int]:
+    """
+    Розмір порції для потокового режиму: параметр → env PRICE_CHUNK_ROWS → None (усе в пам'яті).
+    """
+    if chunk_size is None:
+        env = os.getenv("PRICE_CHUNK_ROWS")
+        chunk_size = int(env) if env else None
+    if chunk_size is not None and chunk_size <= 0:
+        raise ValueError(f"chunk_size must be positive, got {chunk_size}")
+    return chunk_size
 
-    # 3) build output
-    out_df = _build_output_df(
-        df_std, price_final, columns_cfg=columns, supplier_id=supplier_id
-    )
 
-    # =================================================================
-    # ЗМІНА (Вирішує Проблему 1): Розумне збереження в базу даних
-    # =================================================================
-    if "/site/" in r2_prefix and supplier_id is not None:
-        try:
-            print(f"[INFO] DB Trigger: Updating site prices for supplier ID {supplier_id}. Connecting to PostgreSQL...")
-            # ВАЖЛИВО: Впишіть ваш пароль!
-            db_password = "123456789"
-
-            db_user = "postgres"
-            db_host = "localhost"
-            db_port = "5432"
-            db_name = "postgres"
-
-            db_url = f"postgresql+psycopg2://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-            engine = create_engine(db_url)
-
-            # КРОК А: Очищення старих даних ТІЛЬКИ цього постачальника
-            print(f"[INFO] DB: Removing old records for supplier ID {supplier_id}...")
-            with engine.connect() as conn:
-                # НОВЕ: Перевіряємо, чи існує таблиця, перед видаленням
-                from sqlalchemy import inspect
-                inspector = inspect(engine)
-
-                if inspector.has_table("product_catalog"):
-                    # Таблиця є, можна видаляти старі записи
-                    conn.execute(
-                        text("DELETE FROM product_catalog WHERE supplier_id = :sup_id"),
-                        {"sup_id": supplier_id}
-                    )
-                    conn.commit()
-                    print(f"[INFO] DB: Old records deleted.")
-                else:
-                    # Таблиці немає, нічого видаляти. Вона створиться на наступному кроці.
-                    print(f"[INFO] DB: Table 'product_catalog' does not exist yet. Skipping DELETE.")
-
-            # КРОК Б: Додавання нових даних (append)
-            print(f"[INFO] DB: Appending {len(out_df)} new rows for supplier ID {supplier_id}...")
-            # if_exists='append' додає дані до існуючої таблиці
-            out_df.to_sql('product_catalog', con=engine, if_exists='append', index=False)
-
-            print(f"[INFO] PostgreSQL: SUCCESS! Site prices for supplier ID {supplier_id} updated.")
-
-        except Exception as e:
-            print(f"\n[ERROR] PostgreSQL save failed!!!! Details: {e}\n")
-    elif "/site/" in r2_prefix and supplier_id is None:
-         print(f"\n[WARNING] DB Trigger skipped: Found '/site/' prefix but supplier_id is None.\n")
-    # =================================================================
+def iter_standard_chunks(
+        remote_gz_path: Union[str, LineSource],
+        supplier: str,
+        chunk_size: int = DEFAULT_CHUNK_ROWS,
+) -> Iterator[pd.DataFrame]:
+    """
+    Потоковий варіант prepare_standard_df: віддає df_std порціями по chunk_size сирих рядків.
+    Джерело читається напряму (FTP → gunzip → парсер), без файлів у data/temp.
+    """
+    plan = _parse_plan(supplier)
+    with open_source_text(remote_gz_path) as f:
+        lines = islice(f, plan["skip_rows"], None)
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                break
+            yield _parse_lines(chunk, plan)
 
 
-    # 4) export
-    ext = "xlsx" if format_.lower() == "xlsx" else "csv"
-    out_path = tmp_dir / f"{supplier_code_str}_{stamp}.{ext}"
+class _CsvChunkWriter:
+    """
+    Дописує out_df порціями (UTF-8) у потік для запису; результат ідентичний одному
+    out_df.to_csv(...). Потік не закривається — ним керує власник (_OutputUpload).
+    """
 
-    if ext == "xlsx":
-        out_df.to_excel(out_path, index=False, engine="xlsxwriter")
-        content_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    else:
-        delim = (csv_cfg or {}).get("delimiter", ";")
-        header = bool((csv_cfg or {}).get("header", True))
-        out_df.to_csv(out_path, index=False, sep=delim, header=header, encoding="utf-8")
-        content_type = "text/csv"
-
-    # 5) upload + cloud cleanup policy
-    storage = StorageClient()
-    prefix = r2_prefix
-    key = f"{prefix}{supplier_code_str}_{stamp}.{ext}"
-
-    keep_last = 7
-    if prefix.startswith("1_23/"):
-        keep_last = int(os.getenv("R2_KEEP_123", "7"))
-    elif prefix.startswith("1_27/"):
-        keep_last = int(os.getenv("R2_KEEP_127", "7"))
-    elif prefix.startswith("1_33/site/"):
-        keep_last = int(os.getenv("R2_KEEP_133_SITE", "7"))
-    elif prefix.startswith("1_33/exist/"):
-        keep_last = int(os.getenv("R2_KEEP_133_EXIST", "7"))
-    elif prefix.startswith("netto/"):
-        keep_last = int(os.getenv("R2_KEEP_NETTO", "7"))
-
-    url = storage.upload_file(
-        local_path=str(out_path),
-        key=key,
-        content_type=content_type,
-        cleanup_prefix=prefix,
-        keep_last=keep_last,
-    )
+    def __init__(self, out: BinaryIO, csv_cfg: Optional[Dict[str, Any]]):
+        self.delim = (csv_cfg or {}).get("delimiter", ";")
+        self.header = bool((csv_cfg or {}).get("header", True))
+        self.started = False
+        self.out = out
 
-    # 6) local cleanup
+    def _write(self, df: pd.DataFrame, header: bool) -> None:
+        self.out.write(df.to_csv(index=False, sep=self.delim, header=header).encode("utf-8"))
+
+    def write(self, out_df: pd.DataFrame) -> None:
+        self._write(out_df, self.header and not self.started)
+        self.started = True
+
+    def close(self, headers: List[str]) -> None:
+        if not self.started:
+            self._write(pd.DataFrame(columns=headers), self.header)
+
+
+class ProfileStream:
+    """
+    Потоковий експорт одного профілю: приймає df_std порціями,
+    рахує ціну, дописує БД (site) і файл — одразу в R2 (multipart upload), а finish() його завершує.
+    source_fingerprint (див. source_fingerprint()) дає ключ пропуску (_source_key): якщо він
+    збігається з ключем останнього файлу префікса, вивантаження не відкривається зовсім, а finish()
+    повертає той файл; інакше ключ іде в метадані нового файлу.
+    """
+
+    def __init__(
+            self,
+            supplier: str,
+            supplier_id: Optional[int],
+            factor: float,
+            currency_out: str,
+            format_: str,
+            rounding: Dict[str, int],
+            r2_prefix: str,
+            columns: List[Dict[str, str]],
+            csv_cfg: Optional[Dict[str, Any]] = None,
+            rate: float = 1.0,
+            report: Optional[Dict[str, Any]] = None,
+            cleanup: bool = True,
+            compression: Optional[str] = None,
+            compression_level: Optional[int] = None,
+            source_fingerprint: Optional[str] = None,
+    ):
+        self.supplier_id = supplier_id
+        self.factor = factor
+        self.currency_out = currency_out
+        self.rounding = rounding
+        self.r2_prefix = r2_prefix
+        self.columns = columns
+        self.rate = rate
+        self.rows = 0
+        self.report = report
+
+        self.file_name = _output_name(supplier, format_) + compression_suffix(compression)
+        self.latest = None
+        metadata = None
+        if source_fingerprint and skip_unchanged():
+            source_key = _source_key(source_fingerprint, supplier, dict(
+                supplier_id=supplier_id, factor=factor, currency_out=currency_out, rate=rate, rounding=rounding,
+                format_=format_, columns=columns, csv_cfg=csv_cfg, compression=compression,
+            ))
+            self.latest = _unchanged_output(StorageClient(), r2_prefix, source_key, SOURCE_HASH_META)
+            metadata = {SOURCE_HASH_META: source_key}
+        self.output = None if self.latest else _OutputUpload(
+            supplier, format_, r2_prefix, columns, csv_cfg, cleanup, compression, compression_level, metadata
+        )
+
+        self.catalog = None
+        if "/site/" in r2_prefix and supplier_id is not None:
+            try:
+                self.catalog = make_catalog_loader(supplier_id)
+                self.catalog.begin()
+            except Exception:
+                if self.output:
+                    self.output.abort()
+                raise
+        elif "/site/" in r2_prefix and supplier_id is None:
+            print(f"\n[WARNING] DB Trigger skipped: Found '/site/' prefix but supplier_id is None.\n")
+
+    @property
+    def idle(self) -> bool:
+        """Нічого писати: вихід не змінився і БД цей профіль не оновлює."""
+        return self.output is None and self.catalog is None
+
+    def write(self, df_std: pd.DataFrame) -> None:
+        out_df = _profile_output_df(
+            df_std, self.supplier_id, self.factor, self.currency_out, self.rate, self.rounding, self.columns
+        )
+        if self.catalog:
+            self.catalog.append(_catalog_frame(out_df, df_std))
+        if self.output:
+            self.output.write(out_df)
+        self.rows += len(out_df)
+
+    def finish(self) -> Tuple[str, str]:
+        if self.catalog:
+            try:
+                db_stats = self.catalog.finish()
+            except Exception:
+                if self.output:
+                    self.output.abort()
+                raise
+            if self.report is not None:
+                self.report["db"] = db_stats
+        output = self.output.finish() if self.output else self.latest
+        if self.report is not None:
+            self.report["upload"] = "uploaded" if self.output else "unchanged"
+        return output
+
+    def abort(self) -> None:
+        # незавершений multipart upload відкидається — у R2 нічого не з'являється
+        if self.output:
+            self.output.abort()
+        if self.catalog:
+            # staging-транзакція відкочується, старі рядки постачальника лишаються
+            self.catalog.abort()
+
+
+def cleanup_local_files(
+        paths: List[Path],
+        remote_gz_path: Optional[Union[str, LineSource]] = None,
+        delete_input_after: bool = False,
+) -> None:
+    """Прибирає тимчасові файли і (опціонально) вхідний файл (LineSource — не файл, не чіпається)."""
     try:
-        out_path.unlink(missing_ok=True)
-        for p in cleanup_paths:
+        for p in paths:
             p.unlink(missing_ok=True)
-        if delete_input_after and os.path.exists(remote_gz_path):
+        if delete_input_after and isinstance(remote_gz_path, str) and os.path.exists(remote_gz_path):
             rp = Path(remote_gz_path)
-            if rp.exists() and rp.resolve() not in [out_path.resolve(), *[c.resolve() for c in cleanup_paths]]:
+            if rp.exists() and rp.resolve() not in [c.resolve() for c in paths]:
                 rp.unlink(missing_ok=True)
     except Exception:
         pass
 
-    return key, url
\ No newline at end of file
+
+# ----------------------- Main pipeline -----------------------
+
+def prepare_standard_df(remote_gz_path: Union[str, LineSource], supplier: str) -> pd.DataFrame:
+    """
+    Етапи 0-1: джерело (локальний файл або FTP-потік) → стандартний DataFrame.
+    Результат не залежить від профілю, тому його можна розділити між усіма профілями.
+    """
+    plan = _parse_plan(supplier)
+    with open_source_text(remote_gz_path) as f:
+        lines = list(islice(f, plan["skip_rows"], None))
+    return _parse_lines(lines, plan)
+
+
+def stream_profiles(
+        remote_gz_path: Union[str, LineSource],
+        supplier: str,
+        streams: List[ProfileStream],
+        chunk_size: int,
+        on_chunk: Optional[Callable[[int], None]] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Потоковий конвеєр: кожна порція df_std парситься один раз і йде в усі профілі.
+    Повертає (key, url) у порядку streams.
+    on_chunk(rows) викликається після кожної порції з кількістю рядків на цей момент;
+    виняток з нього (напр. скасування імпорту) перериває конвеєр так само, як помилка парсингу.
+    Потоки з idle (незмінений вихід без БД) порцій не отримують; якщо таких усі — джерело не читається.
+    """
+    busy = [stream for stream in streams if not getattr(stream, "idle", False)]
+    rows = 0
+    try:
+        for chunk in (iter_standard_chunks(remote_gz_path, supplier, chunk_size) if busy else ()):
+            for stream in busy:
+                stream.write(chunk)
+            rows += len(chunk)
+            if on_chunk is not None:
+                on_chunk(rows)
+    except Exception:
+        for stream in streams:
+            stream.abort()
+        raise
+
+    results: List[Tuple[str, str]] = []
+    for i, stream in enumerate(streams):
+        try:
+            results.append(stream.finish())
+        except Exception:
+            for rest in streams[i + 1:]:
+                rest.abort()
+            raise
+    return results
+
+
+def process_one_price(
+        remote_gz_path: Union[str, LineSource],
+        supplier: str,
+        supplier_id: Optional[int],
+        factor: float,
+        currency_out: str,  # "EUR" | "UAH"
+        format_: str,  # "xlsx" | "csv"
+        rounding: Dict[str, int],  # {"EUR":2, "UAH":0}
+        r2_prefix: str,  # ".../{supplier}/"
+        columns: List[Dict[str, str]],
+        csv_cfg: Optional[Dict[str, Any]] = None,
+        rate: float = 1.0,
+        delete_input_after: bool = False,
+        chunk_size: Optional[int] = None,
+        compression: Optional[str] = None,
+) -> Tuple[str, str]:
+    """
+    Повний цикл обробки одного прайсу.
+    Для кількох профілів одного файлу використовуйте price_manager.process_all_prices —
+    він парсить джерело один раз.
+    chunk_size (або env PRICE_CHUNK_ROWS) вмикає потоковий режим з обмеженою пам'яттю;
+    результат такий самий, як і в режимі «все в пам'яті».
+    """
+    chunk_size = stream_chunk_size(chunk_size)
+    if chunk_size:
+        profile = dict(
+            supplier=supplier,
+            supplier_id=supplier_id,
+            factor=factor,
+            currency_out=currency_out,
+            format_=format_,
+            rounding=rounding,
+            r2_prefix=r2_prefix,
+            columns=columns,
+            csv_cfg=csv_cfg,
+            rate=rate,
+            compression=compression,
+        )
+        fingerprint = source_fingerprint(remote_gz_path) if skip_unchanged() else None
+        stream = ProfileStream(**profile, source_fingerprint=fingerprint)
+        [(key, url)] = stream_profiles(remote_gz_path, supplier, [stream], chunk_size)
+        cleanup_local_files([], remote_gz_path, delete_input_after)
+        return key, url
+
+    df_std = prepare_standard_df(remote_gz_path, supplier)
+    key, url = export_profile(
+        df_std,
+        supplier=supplier,
+        supplier_id=supplier_id,
+        factor=factor,
+        currency_out=currency_out,
+        format_=format_,
+        rounding=rounding,
+        r2_prefix=r2_prefix,
+        columns=columns,
+        csv_cfg=csv_cfg,
+        rate=rate,
+        compression=compression,
+    )
+
+    # 6) local cleanup
+    cleanup_local_files([], remote_gz_path, delete_input_after)
+    return key, url
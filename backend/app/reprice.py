@@ -0,0 +1,31 @@
+"""
+Reprice з командного рядка: перебудувати профілі постачальника з останнього знімка df_std
+(app/snapshots.py) без завантаження і парсингу джерела.
+
+    python -m app.reprice AP_GDANSK                 (з backend/)
+    python -m app.reprice AP_GDANSK --profile exist --workers 4
+"""
+import argparse
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from .price_manager import reprice_from_snapshot
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Regenerate price profiles from the latest snapshot")
+    parser.add_argument("supplier", help='напр. "AP_GDANSK"')
+    parser.add_argument("--profile", dest="profile_filter", help="лише профілі, назва яких містить цей рядок")
+    parser.add_argument("--workers", type=int, help="процесів для профілів (як PROFILE_WORKERS)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    results = reprice_from_snapshot(args.supplier, profile_filter=args.profile_filter, workers=args.workers)
+    for r in results:
+        status = f"ERROR: {r['error']}" if r.get("error") else r["url"]
+        print(f"[INFO] {r['name']}: {status}")
+
+
+if __name__ == "__main__":
+    main()
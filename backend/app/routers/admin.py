@@ -1,8 +1,13 @@
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
-# Імпортуємо функцію обробки з сусідньої папки (тому дві крапки ..)
-from ..price_manager import process_all_prices
+# Імпорт виконується у фоновій черзі (app/import_jobs.py), а не в самому запиті
+from ..config import get_supplier
+from ..exchange import prefetch_rate
+from ..import_jobs import get_queue
+from ..search_cache import get_cache
 
 # Створюємо роутер замість цілого додатку FastAPI
 router = APIRouter()
@@ -12,16 +17,101 @@ class ImportAllRequest(BaseModel):
     remote_gz_path: str
     supplier: str  # напр. "AP_GDANSK"
 
+def _require_supplier(supplier: str) -> None:
+    """Постачальник має бути в config/suppliers.yaml — інакше 400 одразу, а не помилка в задачі."""
+    if get_supplier(supplier) is None:
+        raise HTTPException(status_code=400, detail=f"Unknown supplier: {supplier}")
+
+
 # Визначаємо маршрут.
 # Зверніть увагу: ми пишемо просто "/import-all", а не "/admin/import-all".
 # Префікс "/admin" ми додамо в головному файлі main.py.
-@router.post("/import-all")
+@router.post("/import-all", status_code=202)
 def import_all(req: ImportAllRequest):
-    try:
-        print(f"[INFO] Admin received import request for: {req.supplier}")
-        # Викликаємо функцію, яка запустить обробку
-        results = process_all_prices(req.supplier, req.remote_gz_path)
-        return {"supplier": req.supplier, "results": results}
-    except Exception as e:
-        print(f"[ERROR] Import failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Import failed: {str(e)}")
\ No newline at end of file
+    """
+    Ставить імпорт у чергу і одразу повертає id задачі; статус — GET /admin/jobs/{job_id}.
+    Якщо для постачальника вже є задача в черзі чи в роботі, повертається вона (deduplicated=true).
+    """
+    print(f"[INFO] Admin received import request for: {req.supplier}")
+    _require_supplier(req.supplier)
+    job, created = get_queue().submit(req.supplier, req.remote_gz_path)
+    return {
+        "job_id": job.id,
+        "supplier": job.supplier,
+        "status": job.status,
+        "deduplicated": not created,
+    }
+
+
+class RepriceRequest(BaseModel):
+    supplier: str
+    profile_filter: Optional[str] = None  # напр. "exist" — лише UAH-профіль після зміни курсу
+
+
+@router.post("/reprice", status_code=202)
+def reprice(req: RepriceRequest):
+    """
+    Перебудувати профілі з останнього знімка прайсу (без FTP / Gmail і парсингу).
+    Працює як /import-all: фонова задача, статус — GET /admin/jobs/{job_id}.
+    """
+    print(f"[INFO] Admin received reprice request for: {req.supplier}")
+    _require_supplier(req.supplier)
+    options = {"profile_filter": req.profile_filter} if req.profile_filter else {}
+    job, created = get_queue().submit_reprice(req.supplier, **options)
+    return {
+        "job_id": job.id,
+        "supplier": job.supplier,
+        "status": job.status,
+        "deduplicated": not created,
+    }
+
+
+@router.get("/jobs")
+def list_jobs():
+    return [job.to_dict() for job in get_queue().list()]
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Задача з черги знімається одразу; задача в роботі зупиняється між профілями / порціями."""
+    job = get_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+# Кеш пошуку: лічильники hit/miss/eviction і ручне очищення
+@router.get("/search-cache")
+def search_cache_stats():
+    return get_cache().stats()
+
+
+@router.post("/search-cache/clear")
+def search_cache_clear():
+    cache = get_cache()
+    cache.clear()
+    return cache.stats()
+
+
+# Курс EUR→UAH (app/exchange.py): поточне значення і примусове оновлення перед пачкою імпортів
+@router.get("/exchange-rate")
+def exchange_rate():
+    quote = prefetch_rate()
+    if quote is None:
+        raise HTTPException(status_code=503, detail="Exchange rate is not available")
+    return quote
+
+
+@router.post("/exchange-rate/refresh")
+def exchange_rate_refresh():
+    quote = prefetch_rate(force=True)
+    if quote is None:
+        raise HTTPException(status_code=503, detail="Exchange rate is not available")
+    return quote
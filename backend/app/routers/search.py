@@ -1,21 +1,14 @@
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Dict, Any
-from sqlalchemy import create_engine, text
+from typing import List, Dict, Any, Optional
+
+from ..catalog_search import search_catalog, search_page
+from ..db import get_engine
+from ..search_cache import get_cache, normalize_query
 
 # Створюємо роутер (маршрутизатор) для пошукових запитів
 router = APIRouter()
 
-# --- НАЛАШТУВАННЯ БАЗИ ДАНИХ ---
-# (Таке саме, як у price_processor.py)
-DB_USER = "postgres"
-# ВАЖЛИВО: Впишіть сюди ваш пароль!
-DB_PASSWORD = "123456789"
-DB_HOST = "localhost"
-DB_PORT = "5432"
-DB_NAME = "postgres"
-
-DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-# -------------------------------
+# Підключення до БД — спільний пул з app/db.py (налаштування в .env)
 
 
 @router.get("/search", response_model=List[Dict[str, Any]])
@@ -25,42 +18,24 @@ def search_products(
 ):
     """
     Шукає товари в базі даних за артикулом (code), назвою (name) або брендом (brand).
-    Використовує нечутливий до регістру пошук (ILIKE).
+    Спочатку точний збіг нормалізованого артикула (code_key), потім префікс, потім
+    входження (ILIKE) — див. app/catalog_search.py. Поле "match" каже, який рівень спрацював.
     """
+    q = normalize_query(q)
     if not q:
          return []
 
     print(f"[INFO] API Search request: '{q}'")
 
-    try:
-        # Створюємо з'єднання з базою для цього запиту
-        engine = create_engine(DATABASE_URL)
-
-        # SQL-запит для пошуку.
-        # Використовуємо ILIKE та %...% для пошуку по входженню рядка без урахування регістру.
-        # ВИПРАВЛЕНО: price замінено на price_EUR у SELECT та ORDER BY
-        sql_query = text("""
-                    SELECT supplier_id, code, unicode, brand, name, stock, price_eur
-                    FROM product_catalog
-                    WHERE
-                        code ILIKE :search_term
-                        OR name ILIKE :search_term
-                        OR brand ILIKE :search_term
-                    ORDER BY price_eur ASC -- Сортуємо за правильною колонкою
-                    LIMIT :limit_val
-                """)
-        results = []
+    def run_query():
+        # Беремо з'єднання зі спільного пулу (не створюємо engine на кожен запит)
+        engine = get_engine()
         with engine.connect() as conn:
-            # Виконуємо запит, передаючи параметри безпечно (щоб уникнути SQL-ін'єкцій)
-            rows = conn.execute(
-                sql_query,
-                {"search_term": f"%{q}%", "limit_val": limit}
-            )
+            return search_catalog(conn, q, limit)
 
-            # Перетворюємо результати з формату бази даних у список словників (JSON)
-            # SQLAlchemy row._mapping перетворює рядок на словник {колонки: значення}
-            for row in rows:
-                results.append(dict(row._mapping))
+    try:
+        # Популярні запити віддаємо з кешу (app/search_cache.py), поки каталог не оновився
+        results = get_cache().get_or_compute(("search", q, limit), run_query)
 
         print(f"[INFO] API Search found {len(results)} items for '{q}'")
         return results
@@ -68,4 +43,35 @@ def search_products(
     except Exception as e:
         print(f"[ERROR] Database search failed: {e}")
         # Повертаємо помилку клієнту, якщо щось пішло не так з базою
-        raise HTTPException(status_code=500, detail=f"Database search error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database search error: {str(e)}")
+
+
+@router.get("/search/page", response_model=Dict[str, Any])
+def search_products_page(
+    q: str = Query(..., min_length=2, description="Пошуковий запит (мінімум 2 символи)"),
+    limit: int = Query(20, ge=1, le=200, description="Розмір сторінки"),
+    cursor: Optional[str] = Query(None, description="next_cursor з попередньої сторінки"),
+    estimate: bool = Query(False, description="Повернути приблизну кількість збігів (лише 1-ша сторінка)"),
+):
+    """
+    Той самий ранжований пошук, що й /search, але посторінково (keyset-пагінація):
+    {"items": [...], "next_cursor": "..." | null, "estimated_total": int | null}.
+    Наступна сторінка — той самий q + cursor=next_cursor; null означає кінець.
+    """
+    q = normalize_query(q)
+    if not q:
+        return {"items": [], "next_cursor": None, "estimated_total": None}
+
+    print(f"[INFO] API Search page request: '{q}' (cursor={'yes' if cursor else 'no'})")
+
+    def run_query():
+        with get_engine().connect() as conn:
+            return search_page(conn, q, limit, cursor=cursor, with_total=estimate)
+
+    try:
+        return get_cache().get_or_compute(("page", q, limit, cursor, estimate), run_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[ERROR] Database search failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Database search error: {str(e)}")
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Query, HTTPException
+from typing import List, Dict, Any, Optional
+
+from ..catalog_search import search_catalog_async, search_page_async
+from ..db import get_async_engine
+from ..search_cache import get_cache, normalize_query
+
+# Async-версія routers/search.py: ті самі шляхи, параметри і формат відповіді,
+# але запит до БД іде через AsyncEngine (asyncpg) і не займає потік threadpool-а.
+# Який роутер підключати, вирішує main.py (env SEARCH_ROUTER).
+router = APIRouter()
+
+
+@router.get("/search", response_model=List[Dict[str, Any]])
+async def search_products(
+    q: str = Query(..., min_length=2, description="Пошуковий запит (мінімум 2 символи)"),
+    limit: int = Query(50, ge=1, le=200, description="Максимальна кількість результатів")
+):
+    """
+    Шукає товари в базі даних за артикулом (code), назвою (name) або брендом (brand).
+    Спочатку точний збіг нормалізованого артикула (code_key), потім префікс, потім
+    входження (ILIKE) — див. app/catalog_search.py. Поле "match" каже, який рівень спрацював.
+    """
+    q = normalize_query(q)
+    if not q:
+        return []
+
+    print(f"[INFO] API Search request: '{q}'")
+
+    async def run_query():
+        async with get_async_engine().connect() as conn:
+            return await search_catalog_async(conn, q, limit)
+
+    try:
+        results = await get_cache().aget_or_compute(("search", q, limit), run_query)
+
+        print(f"[INFO] API Search found {len(results)} items for '{q}'")
+        return results
+
+    except Exception as e:
+        print(f"[ERROR] Database search failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Database search error: {str(e)}")
+
+
+@router.get("/search/page", response_model=Dict[str, Any])
+async def search_products_page(
+    q: str = Query(..., min_length=2, description="Пошуковий запит (мінімум 2 символи)"),
+    limit: int = Query(20, ge=1, le=200, description="Розмір сторінки"),
+    cursor: Optional[str] = Query(None, description="next_cursor з попередньої сторінки"),
+    estimate: bool = Query(False, description="Повернути приблизну кількість збігів (лише 1-ша сторінка)"),
+):
+    """Посторінковий пошук (keyset), як /search/page у routers/search.py."""
+    q = normalize_query(q)
+    if not q:
+        return {"items": [], "next_cursor": None, "estimated_total": None}
+
+    print(f"[INFO] API Search page request: '{q}' (cursor={'yes' if cursor else 'no'})")
+
+    async def run_query():
+        async with get_async_engine().connect() as conn:
+            return await search_page_async(conn, q, limit, cursor=cursor, with_total=estimate)
+
+    try:
+        return await get_cache().aget_or_compute(("page", q, limit, cursor, estimate), run_query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"[ERROR] Database search failed: {e}")
+        raise HTTPException(status_code=500, detail=f"Database search error: {str(e)}")
@@ -0,0 +1,372 @@
+"""
+Планувальник імпортів: довгоживучий процес поруч з API.
+
+    python -m app.scheduler                     (з backend/)
+    python -m app.scheduler --once --supplier MOTOROL
+
+Раніше імпорт запускався вручну: python -m app.gmail_puller_motorol для MOTOROL і
+POST /admin/import-all з FTP-шляхом для AP_GDANSK. Тепер джерело й інтервал кожного
+постачальника описані в секції schedule у config/suppliers.yaml:
+- ftp: кожні interval секунд дешева перевірка MDTM/SIZE (price_processor.ftp_fingerprint),
+  а коли файл змінився — завантаження в data/temp та імпорт локальної копії;
+- gmail: опитування пошти за historyId (gmail_puller_motorol.fetch_latest) й імпорт нового вкладення.
+
+Кожен постачальник має свій потік, а етапи обмежені двома семафорами на весь процес:
+- I/O (SCHEDULER_IO_LIMIT, 4): перевірки FTP / Gmail і завантаження — FTP-прайс у data/temp,
+  вкладення в пам'ять. Здебільшого очікування мережі, тож їх можна робити кілька одночасно,
+  і поки один постачальник парситься, інший уже завантажується;
+- CPU (SCHEDULER_CPU_LIMIT, 1): сам імпорт із локальної копії — парсинг, ціни, CSV/XLSX і БД.
+  На одній VM — один важкий імпорт за раз. Вивантаження в R2 теж рахується тут: файли
+  профілів пишуться одразу в multipart upload, тож воно перекривається з експортом, а не
+  є окремим етапом після нього.
+
+Пауза між перевірками — interval ± jitter; після збою — retry, 2×retry, 4×retry ... до max_backoff
+(теж ± jitter). Стан (остання перевірка / імпорт, помилка, збої поспіль, fingerprint FTP, час
+наступної перевірки) — у data/state/scheduler_state.json: після рестарту розклад продовжується,
+а вже імпортований файл не імпортується вдруге. Курсор Gmail (historyId, оброблені листи) тут
+не дублюється — він лише в data/state/gmail_puller_state.json, спільний із CLI puller-ом.
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+from dotenv import load_dotenv
+
+from .config import ScheduleConfig, SupplierConfig, get_suppliers
+from .paths import STATE_DIR, TEMP_DIR
+from .price_manager import ImportCancelled, process_all_prices
+from .price_processor import download_file_from_ftp, ftp_fingerprint
+
+SCHEDULER_STATE_FILE = STATE_DIR / "scheduler_state.json"
+
+UNCHANGED = "unchanged"
+IMPORTED = "imported"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def next_delay(schedule: ScheduleConfig, failures: int, rng: random.Random) -> float:
+    """Секунд до наступної перевірки: interval, після failures збоїв поспіль — backoff; ± jitter."""
+    if failures > 0:
+        base = min(schedule.max_backoff, schedule.retry * 2 ** min(failures - 1, 30))
+    else:
+        base = schedule.interval
+    return base * (1 + rng.uniform(-schedule.jitter, schedule.jitter))
+
+
+# ----------------------- Persisted state -----------------------
+
+class SchedulerState:
+    """Стан постачальників у JSON (атомарний запис: тимчасовий файл + os.replace)."""
+
+    def __init__(self, state_file: Path = SCHEDULER_STATE_FILE):
+        self.state_file = Path(state_file)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"[WARN] Scheduler: cannot read {self.state_file}: {e}")
+            return {}
+
+    def _save(self) -> None:
+        tmp = self.state_file.with_name(f".{uuid.uuid4().hex[:8]}_{self.state_file.name}")
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self.state_file)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            print(f"[WARN] Scheduler: cannot save {self.state_file}: {e}")
+
+    def get(self, supplier: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._data.get(supplier, {}))
+
+    def update(self, supplier: str, **fields: Any) -> None:
+        with self._lock:
+            self._data.setdefault(supplier, {}).update(fields)
+            self._save()
+
+
+# ----------------------- Sources -----------------------
+# fetch(entry) — I/O-етап: None, якщо нового немає; інакше задача {"source", "label", "commit"[, "close"]}:
+# source — що передати в process_all_prices (шлях / LineSource; None — імпортувати нічого),
+# commit() — викликається після успішного імпорту і повертає поля для стану постачальника,
+# close() — після задачі за будь-якого результату (зняти блокування, прибрати файли).
+
+class FtpSource:
+    """
+    Прайс на FTP: перевірка MDTM/SIZE, а якщо файл змінився — завантаження в spool_dir (data/temp).
+    Обидва кроки — I/O-етап; імпорт читає локальну копію, close() її видаляє.
+    """
+
+    def __init__(
+            self,
+            schedule: ScheduleConfig,
+            fingerprint: Callable[[str], Optional[str]] = ftp_fingerprint,
+            download: Callable[[str, Path], None] = download_file_from_ftp,
+            spool_dir: Path = TEMP_DIR,
+    ):
+        self.schedule = schedule
+        self.fingerprint = fingerprint
+        self.download = download
+        self.spool_dir = Path(spool_dir)
+
+    def fetch(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self.schedule.path
+        fp = self.fingerprint(path)
+        if fp is not None and fp == entry.get("fingerprint"):
+            return None
+        # суфікс (.csv.gz) зберігається — open_source_text розпакує локальний .gz так само
+        spool = self.spool_dir / f"{uuid.uuid4().hex[:8]}_{PurePosixPath(path).name}"
+        try:
+            self.download(path, spool)
+        except BaseException:
+            spool.unlink(missing_ok=True)
+            raise
+        return {
+            "source": str(spool),
+            "label": f"{path} ({fp or 'no MDTM/SIZE'})",
+            "commit": lambda: {"fingerprint": fp},
+            "close": lambda: spool.unlink(missing_ok=True),
+        }
+
+
+class GmailSource:
+    """
+    Лист із zip-вкладенням (формат MOTOROL, див. app/gmail_puller_motorol.py).
+    Курсор пошти — лише у стані puller-а (спільний із CLI); на час задачі він заблокований
+    (cursor_lock), тож CLI і планувальник не імпортують той самий лист і не гублять новий.
+    """
+
+    def __init__(self, schedule: ScheduleConfig, service_factory: Optional[Callable[[], Any]] = None):
+        from . import gmail_puller_motorol as puller  # google-клієнт потрібен лише gmail-джерелу
+
+        self.puller = puller
+        self.schedule = schedule
+        self.service_factory = service_factory or puller.gmail_service
+        self._service = None
+
+    def fetch(self, entry: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        lock = ExitStack()
+        if not lock.enter_context(self.puller.cursor_lock()):
+            lock.close()
+            print("[INFO] Scheduler: Gmail cursor is busy (CLI puller is running), next check later")
+            return None
+        try:
+            if self._service is None:
+                self._service = self.service_factory()
+            state = self.puller.load_state()
+            fetched = self.puller.fetch_latest(self._service, state, self.schedule.query, self.schedule.attachment)
+        except BaseException:
+            lock.close()
+            raise
+        if fetched is None:
+            lock.close()
+            return None
+
+        def commit() -> Dict[str, Any]:
+            self.puller.commit_fetched(state, fetched)
+            return {}
+
+        source = self.puller.attachment_source(fetched["msg_id"], fetched["raw"]) if fetched["raw"] else None
+        return {"source": source, "label": f"gmail message {fetched['msg_id']}", "commit": commit, "close": lock.close}
+
+
+SOURCES: Dict[str, Callable[[ScheduleConfig], Any]] = {"ftp": FtpSource, "gmail": GmailSource}
+
+
+# ----------------------- Scheduler -----------------------
+
+class Scheduler:
+    def __init__(
+            self,
+            suppliers: Optional[Mapping[str, SupplierConfig]] = None,
+            state: Optional[SchedulerState] = None,
+            io_limit: Optional[int] = None,
+            cpu_limit: Optional[int] = None,
+            runner: Callable[..., List[Dict[str, Any]]] = process_all_prices,
+            sources: Optional[Dict[str, Callable[[ScheduleConfig], Any]]] = None,
+            rng: Optional[random.Random] = None,
+            clock: Callable[[], float] = time.time,
+    ):
+        suppliers = get_suppliers() if suppliers is None else suppliers
+        self.suppliers = [s for s in suppliers.values() if s.schedule is not None and s.schedule.enabled]
+        gmail = [s.name for s in self.suppliers if s.schedule.source == "gmail"]
+        if len(gmail) > 1:
+            # стан Gmail (historyId, оброблені листи) — один файл на поштову скриньку
+            print(f"[WARN] Scheduler: only one gmail source is supported, skipping {', '.join(gmail[1:])}")
+            self.suppliers = [s for s in self.suppliers if s.name not in gmail[1:]]
+
+        self.state = state or SchedulerState()
+        self.io = threading.BoundedSemaphore(max(1, io_limit or int(os.getenv("SCHEDULER_IO_LIMIT", "4"))))
+        self.cpu = threading.BoundedSemaphore(max(1, cpu_limit or int(os.getenv("SCHEDULER_CPU_LIMIT", "1"))))
+        self.runner = runner
+        self.source_factories = sources or SOURCES
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self.stop_event = threading.Event()
+        self._sources: Dict[str, Any] = {}
+        self._threads: List[threading.Thread] = []
+
+    def _source(self, supplier: SupplierConfig) -> Any:
+        if supplier.name not in self._sources:
+            self._sources[supplier.name] = self.source_factories[supplier.schedule.source](supplier.schedule)
+        return self._sources[supplier.name]
+
+    def _import(self, supplier: SupplierConfig, job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        CPU-етап: process_all_prices із уже завантаженого джерела (разом з вивантаженням у R2,
+        див. докстрінг модуля); помилка будь-якого профілю — збій (файл перевіриться знову).
+        """
+        with self.cpu:
+            print(f"[INFO] Scheduler: importing {supplier.name} from {job['label']}")
+            results = self.runner(
+                supplier.name,
+                job["source"],
+                supplier_id=supplier.supplier_id,
+                profile_filter=supplier.schedule.profile_filter,
+                is_cancelled=self.stop_event.is_set,
+            )
+        errors = [f"{r['name']}: {r['error']}" for r in results if r.get("error")]
+        if errors:
+            raise RuntimeError(f"{len(errors)} profile(s) failed: {'; '.join(errors)}")
+        return {"profiles": len(results)}
+
+    def run_once(self, supplier: SupplierConfig) -> str:
+        """Одна перевірка постачальника і, якщо є нове, імпорт. Повертає статус; стан зберігається."""
+        entry = self.state.get(supplier.name)
+        fields: Dict[str, Any] = {"last_check": _now(), "last_error": None}
+        failures = 0
+        job = None
+        try:
+            with self.io:   # перевірка і завантаження; імпорт — окремо під self.cpu
+                job = self._source(supplier).fetch(entry)
+            if job is None:
+                status = UNCHANGED
+            else:
+                if job["source"] is not None:
+                    fields["last_result"] = self._import(supplier, job)
+                fields.update(job["commit"]() or {})
+                fields["last_import"] = fields["last_check"]
+                status = IMPORTED
+        except ImportCancelled:
+            # зупинка планувальника посеред імпорту — не збій; після рестарту одразу повторити
+            self.state.update(supplier.name, last_status=CANCELLED, next_run=self.clock())
+            print(f"[WARN] Scheduler: {supplier.name} import cancelled (shutdown)")
+            return CANCELLED
+        except Exception as e:
+            status = FAILED
+            failures = int(entry.get("failures", 0)) + 1
+            fields["last_error"] = str(e)
+        finally:
+            if job is not None and job.get("close"):
+                job["close"]()
+
+        delay = next_delay(supplier.schedule, failures, self.rng)
+        self.state.update(supplier.name, last_status=status, failures=failures, next_run=self.clock() + delay, **fields)
+        if status == FAILED:
+            print(f"[ERROR] Scheduler: {supplier.name} failed ({failures} in a row): {fields['last_error']}; "
+                  f"retry in {delay:.0f}s")
+        else:
+            print(f"[INFO] Scheduler: {supplier.name} {status}; next check in {delay:.0f}s")
+        return status
+
+    def _initial_wait(self, supplier: SupplierConfig) -> float:
+        """До першої перевірки: збережений next_run, а якщо він минув — невеликий розкид, щоб не стартувати разом."""
+        next_run = self.state.get(supplier.name).get("next_run")
+        if next_run is not None and next_run > self.clock():
+            return next_run - self.clock()
+        return self.rng.uniform(0, supplier.schedule.interval * supplier.schedule.jitter)
+
+    def _loop(self, supplier: SupplierConfig) -> None:
+        wait = self._initial_wait(supplier)
+        while not self.stop_event.wait(max(0.0, wait)):
+            self.run_once(supplier)
+            wait = self.state.get(supplier.name)["next_run"] - self.clock()
+
+    def start(self) -> None:
+        for supplier in self.suppliers:
+            thread = threading.Thread(target=self._loop, args=(supplier,), name=f"schedule-{supplier.name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        names = ", ".join(f"{s.name} ({s.schedule.source}, every {s.schedule.interval}s)" for s in self.suppliers)
+        print(f"[INFO] Scheduler started: {names}")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Зупинити потоки; імпорт, що йде, скасовується між профілями / порціями."""
+        self.stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_all_once(self) -> Dict[str, str]:
+        """Кожен постачальник — одна перевірка паралельно (з тими ж лімітами I/O і CPU)."""
+        statuses: Dict[str, str] = {}
+
+        def _one(supplier: SupplierConfig) -> None:
+            statuses[supplier.name] = self.run_once(supplier)
+
+        threads = [threading.Thread(target=_one, args=(s,), name=f"schedule-{s.name}") for s in self.suppliers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return statuses
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Import scheduler (schedule sections in config/suppliers.yaml)")
+    parser.add_argument("--once", action="store_true", help="одна перевірка кожного постачальника і вихід")
+    parser.add_argument("--supplier", help="лише цей постачальник")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    suppliers = get_suppliers()
+    if args.supplier:
+        suppliers = {name: s for name, s in suppliers.items() if name.upper() == args.supplier.upper()}
+    scheduler = Scheduler(suppliers)
+    if not scheduler.suppliers:
+        print("[WARN] Scheduler: no suppliers with an enabled schedule")
+        return
+
+    if args.once:
+        for name, status in scheduler.run_all_once().items():
+            print(f"[INFO] {name}: {status}")
+        return
+
+    done = threading.Event()
+
+    def _shutdown(signum, frame):
+        print("[INFO] Scheduler: stopping...")
+        done.set()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+    scheduler.start()
+    done.wait()
+    scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
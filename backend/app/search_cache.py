@@ -0,0 +1,235 @@
+"""
+Кеш результатів /api/search у пам'яті процесу (LRU + TTL).
+
+Ключ — (нормалізований запит, limit, фільтри). Пам'ять обмежена кількістю записів
+(SEARCH_CACHE_SIZE, кожен запис ≤ 200 рядків), запис живе SEARCH_CACHE_TTL секунд.
+
+Інвалідація — через catalog_meta.generation (app/catalog_schema.py): лоадер каталогу
+збільшує його після запису в БД. Кеш звіряє generation не частіше ніж раз на
+SEARCH_CACHE_CHECK_SECONDS і, побачивши нове значення, очищується повністю.
+Імпорт у цьому ж процесі (/admin/import-all) викликає mark_stale() — перевірка відбудеться
+на наступному ж запиті.
+
+Async-роутер (routers/search_async.py) користується тим самим кешем через aget_or_compute():
+generation читається через AsyncEngine і не блокує event loop.
+
+Env: SEARCH_CACHE_SIZE (1000; 0 — вимкнути), SEARCH_CACHE_TTL (300), SEARCH_CACHE_CHECK_SECONDS (2).
+"""
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from cachetools import TTLCache
+
+from .catalog_schema import read_generation, read_generation_async
+
+_MISSING = object()
+
+
+class _CountingTTLCache(TTLCache):
+    """TTLCache, що рахує витіснення (LRU) і прострочені записи."""
+
+    def __init__(self, maxsize, ttl, timer=time.monotonic):
+        super().__init__(maxsize, ttl, timer=timer)
+        self.evictions = 0
+        self.expirations = 0
+        self._clearing = False
+
+    def popitem(self):
+        item = super().popitem()
+        if not self._clearing:
+            self.evictions += 1
+        return item
+
+    def clear(self):
+        # MutableMapping.clear() іде через popitem() — це не витіснення
+        self._clearing = True
+        try:
+            super().clear()
+        finally:
+            self._clearing = False
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self.expirations += len(expired)
+        return expired
+
+
+def normalize_query(q: str) -> str:
+    """'  OC  90 ' → 'oc 90' (ILIKE і code_key нечутливі до регістру й зайвих пробілів)."""
+    return " ".join((q or "").split()).lower()
+
+
+class SearchCache:
+    def __init__(
+            self,
+            maxsize: int,
+            ttl: float,
+            check_seconds: float = 2.0,
+            generation_reader: Optional[Callable[[], int]] = None,
+            timer: Callable[[], float] = time.monotonic,
+            async_generation_reader: Optional[Callable[[], Awaitable[int]]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.check_seconds = check_seconds
+        self.generation_reader = generation_reader
+        self.async_generation_reader = async_generation_reader
+        self.timer = timer
+        self._data = _CountingTTLCache(max(maxsize, 1), ttl, timer=timer)
+        self._lock = threading.Lock()
+        self.generation: Optional[int] = None
+        self._checked_at = float("-inf")
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def mark_stale(self) -> None:
+        """Звірити generation на наступному get() (після імпорту в цьому процесі)."""
+        self._checked_at = float("-inf")
+
+    def _check_due(self) -> bool:
+        return self.generation_reader is not None and self.timer() - self._checked_at >= self.check_seconds
+
+    def _apply_generation(self, gen: int, now: float) -> None:
+        with self._lock:
+            self._checked_at = now
+            if gen != self.generation:
+                if self.generation is not None:
+                    self.invalidations += 1
+                self._data.clear()
+                self.generation = gen
+
+    def _generation_failed(self, e: Exception, now: float) -> None:
+        # БД недоступна — не віддаємо з кешу, поки не переконаємось, що він актуальний;
+        # наступна спроба — не раніше ніж через check_seconds, а не на кожен запит
+        print(f"[ERROR] Search cache: cannot read catalog generation: {e}")
+        with self._lock:
+            self._checked_at = now
+            self._data.clear()
+            self.generation = None
+
+    def _refresh_generation(self) -> None:
+        if not self._check_due():
+            return
+        now = self.timer()
+        try:
+            gen = self.generation_reader()
+        except Exception as e:
+            self._generation_failed(e, now)
+            return
+        self._apply_generation(gen, now)
+
+    async def _refresh_generation_async(self) -> None:
+        if not self._check_due():
+            return
+        now = self.timer()
+        try:
+            if self.async_generation_reader is not None:
+                gen = await self.async_generation_reader()
+            else:
+                gen = self.generation_reader()
+        except Exception as e:
+            self._generation_failed(e, now)
+            return
+        self._apply_generation(gen, now)
+
+    def _lookup(self, key: Hashable) -> Tuple[Any, Optional[int]]:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return value, self.generation
+
+    def get(self, key: Hashable) -> Tuple[Any, Optional[int]]:
+        """(значення або _MISSING, generation, під яким можна покласти результат)."""
+        if not self.enabled:
+            return _MISSING, None
+        self._refresh_generation()
+        return self._lookup(key)
+
+    async def aget(self, key: Hashable) -> Tuple[Any, Optional[int]]:
+        """get() для async-роутера: generation читається через async_generation_reader."""
+        if not self.enabled:
+            return _MISSING, None
+        await self._refresh_generation_async()
+        return self._lookup(key)
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int]) -> None:
+        """Покласти результат, якщо каталог не змінився, поки його рахували."""
+        if not self.enabled:
+            return
+        with self._lock:
+            # generation невідомий (читання не вдалось) — кеш вимкнено до наступної вдалої перевірки
+            unknown = generation is None and self.generation_reader is not None
+            if generation == self.generation and not unknown:
+                self._data[key] = value
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value, generation = self.get(key)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value, generation)
+        return value
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        value, generation = await self.aget(key)
+        if value is _MISSING:
+            value = await compute()
+            self.put(key, value, generation)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._data.expire()
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "size": len(self._data) if self.enabled else 0,
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._data.evictions,
+                "expirations": self._data.expirations,
+                "invalidations": self.invalidations,
+                "generation": self.generation,
+            }
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SearchCache:
+    """Кеш процесу з налаштуваннями з env (створюється при першому виклику)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache(
+                    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1000")),
+                    ttl=float(os.getenv("SEARCH_CACHE_TTL", "300")),
+                    check_seconds=float(os.getenv("SEARCH_CACHE_CHECK_SECONDS", "2")),
+                    generation_reader=read_generation,
+                    async_generation_reader=read_generation_async,
+                )
+    return _cache
+
+
+def mark_stale() -> None:
+    if _cache is not None:
+        _cache.mark_stale()
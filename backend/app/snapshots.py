@@ -0,0 +1,172 @@
+"""
+Знімок (snapshot) стандартизованого прайсу постачальника — df_std після парсингу.
+
+Кожен успішний імпорт зберігає df_std (code, unicode, brand, name, stock, price, code_key)
+у Parquet: data/snapshots/<supplier>.parquet. Reprice (price_manager.reprice_from_snapshot,
+POST /admin/reprice, python -m app.reprice) перебудовує профілі з цього файлу — без FTP /
+Gmail і без парсингу, тож зміна курсу чи factor — це секунди, а не повний реімпорт.
+
+Env:
+- PRICE_SNAPSHOTS (1) — 0 вимикає збереження;
+- SNAPSHOT_R2_PREFIX — якщо заданий (напр. "snapshots/"), знімок також вивантажується
+  в R2 як <prefix><supplier>.parquet; reprice бере його звідти, коли локального файлу немає.
+
+Запис атомарний (тимчасовий файл → rename): reprice ніколи не прочитає недописаний знімок.
+Помилка збереження знімка не ламає імпорт — лише [WARN] у лозі.
+"""
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .paths import SNAPSHOT_DIR
+from .storage import StorageClient
+
+_META_KEY = b"mg_snapshot"
+
+# Схема df_std (див. price_processor._rows_to_standard_df / vector_parser.STD_COLUMNS)
+SNAPSHOT_SCHEMA = pa.schema([
+    ("code", pa.string()),
+    ("unicode", pa.string()),
+    ("brand", pa.string()),
+    ("name", pa.string()),
+    ("stock", pa.int64()),
+    ("price", pa.float64()),
+    ("code_key", pa.string()),
+])
+
+
+def snapshots_enabled() -> bool:
+    return (os.getenv("PRICE_SNAPSHOTS", "1") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def snapshot_path(supplier: str, snapshot_dir: Optional[Path] = None) -> Path:
+    return (snapshot_dir or SNAPSHOT_DIR) / f"{supplier.lower()}.parquet"
+
+
+def _r2_key(supplier: str) -> Optional[str]:
+    prefix = os.getenv("SNAPSHOT_R2_PREFIX")
+    if not prefix:
+        return None
+    if not prefix.endswith("/"):
+        prefix += "/"
+    return f"{prefix}{supplier.lower()}.parquet"
+
+
+def _schema(supplier: str, source: Optional[str]) -> pa.Schema:
+    meta = {
+        "supplier": supplier,
+        "source": source,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    return SNAPSHOT_SCHEMA.with_metadata({_META_KEY: json.dumps(meta, ensure_ascii=False).encode("utf-8")})
+
+
+class SnapshotWriter:
+    """
+    Пише df_std у Parquet порціями (row group на порцію); finish() публікує файл
+    (атомарно), abort() — прибирає тимчасовий. Помилки не виходять назовні.
+    Для одного кадру — save_snapshot().
+    """
+
+    def __init__(self, supplier: str, source: Optional[str] = None, snapshot_dir: Optional[Path] = None):
+        self.supplier = supplier
+        self.path = snapshot_path(supplier, snapshot_dir)
+        self.tmp_path = self.path.with_name(f".{uuid.uuid4().hex[:8]}_{self.path.name}")
+        self.schema = _schema(supplier, source)
+        self.writer: Optional[pq.ParquetWriter] = None
+        self.rows = 0
+        self.failed = False
+
+    def _fail(self, e: Exception) -> None:
+        print(f"[WARN] Snapshot for {self.supplier} was not saved: {e}")
+        self.abort()
+        self.failed = True
+
+    def write(self, df_std: pd.DataFrame) -> None:
+        if self.failed:
+            return
+        try:
+            table = pa.Table.from_pandas(df_std[SNAPSHOT_SCHEMA.names], schema=self.schema, preserve_index=False)
+            if self.writer is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+            self.writer.write_table(table)
+            self.rows += len(df_std)
+        except Exception as e:
+            self._fail(e)
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        if self.failed:
+            return None
+        try:
+            if self.writer is None:
+                # порожній прайс — теж знімок (reprice дасть порожні профілі, як і імпорт)
+                self.write(pd.DataFrame({name: [] for name in SNAPSHOT_SCHEMA.names}))
+                if self.failed:
+                    return None
+            self.writer.close()
+            self.writer = None
+            os.replace(self.tmp_path, self.path)
+        except Exception as e:
+            self._fail(e)
+            return None
+
+        info = {"path": str(self.path), "rows": self.rows}
+        key = _r2_key(self.supplier)
+        if key:
+            try:
+                StorageClient().upload_file(str(self.path), key, content_type="application/vnd.apache.parquet")
+                info["r2_key"] = key
+            except Exception as e:
+                print(f"[WARN] Snapshot upload to R2 failed for {self.supplier}: {e}")
+        print(f"[INFO] Snapshot saved for {self.supplier}: {self.rows} rows → {self.path}")
+        return info
+
+    def abort(self) -> None:
+        if self.writer is not None:
+            try:
+                self.writer.close()
+            except Exception:
+                pass
+            self.writer = None
+        self.tmp_path.unlink(missing_ok=True)
+
+
+def save_snapshot(
+        df_std: pd.DataFrame,
+        supplier: str,
+        source: Optional[str] = None,
+        snapshot_dir: Optional[Path] = None,
+) -> Optional[Dict[str, Any]]:
+    """Зберегти df_std. Повертає {"path", "rows", ["r2_key"]} або None (вимкнено / помилка)."""
+    if not snapshots_enabled():
+        return None
+    writer = SnapshotWriter(supplier, source, snapshot_dir)
+    writer.write(df_std)
+    return writer.finish()
+
+
+def load_snapshot(supplier: str, snapshot_dir: Optional[Path] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """(df_std, опис знімка). FileNotFoundError, якщо знімка немає ні локально, ні в R2."""
+    path = snapshot_path(supplier, snapshot_dir)
+    if not path.exists():
+        key = _r2_key(supplier)
+        if not key:
+            raise FileNotFoundError(f"No snapshot for {supplier}: {path} not found")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        storage = StorageClient()
+        storage.s3.download_file(storage.bucket, key, str(path))
+        print(f"[INFO] Snapshot for {supplier} downloaded from R2: {key}")
+
+    table = pq.read_table(path)
+    raw_meta = (table.schema.metadata or {}).get(_META_KEY)
+    meta = json.loads(raw_meta.decode("utf-8")) if raw_meta else {}
+    meta.update(path=str(path), rows=table.num_rows)
+    return table.to_pandas(), meta
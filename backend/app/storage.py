@@ -1,21 +1,72 @@
+"""
+Cloudflare R2 (S3 API): вивантаження, посилання, прибирання старих файлів.
+
+- один boto3-клієнт на процес (_s3_client): StorageClient() більше не створює новий клієнт
+  і пул з'єднань на кожен файл;
+- TransferConfig з env: R2_MULTIPART_THRESHOLD_MB (8), R2_PART_SIZE_MB (8),
+  R2_UPLOAD_CONCURRENCY (4) — великі файли йдуть паралельними частинами multipart upload;
+- UploadStream — потік для запису, що одразу йде в multipart upload (os.pipe + фоновий потік):
+  експорт профілю пишеться в R2 напряму, без файлу в data/temp;
+- хеш вмісту (CONTENT_HASH_META) або, у потоковому режимі, ключ джерела (SOURCE_HASH_META) у
+  метаданих об'єкта: latest_content_hash() дозволяє не вивантажувати той самий прайс удруге
+  (див. price_processor._unchanged_output).
+"""
 import os
-from typing import Optional, List
+import threading
+from typing import Any, BinaryIO, Dict, Iterable, Optional, List, Tuple
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 
 
+# delete_objects приймає до 1000 ключів за виклик
+DELETE_BATCH = 1000
+MB = 1024 * 1024
+# x-amz-meta-content-hash: хеш логічного вмісту файлу профілю
+CONTENT_HASH_META = "content-hash"
+# потоковий режим: відбиток джерела + параметри профілю (price_processor._source_key)
+SOURCE_HASH_META = "source-hash"
+
+_client: Any = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def _s3_client():
+    """boto3-клієнт процесу (потокобезпечний). Після fork (пул профілів) створюється новий."""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = boto3.client(
+                    "s3",
+                    endpoint_url=os.getenv("R2_ENDPOINT"),
+                    aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID"),
+                    aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY"),
+                    config=Config(signature_version="s3v4", max_pool_connections=32),
+                    region_name="auto",
+                )
+                _client_pid = os.getpid()
+    return _client
+
+
+def transfer_config() -> TransferConfig:
+    """Розмір частини і паралельність multipart upload з env."""
+    concurrency = max(1, int(os.getenv("R2_UPLOAD_CONCURRENCY", "4")))
+    return TransferConfig(
+        multipart_threshold=int(float(os.getenv("R2_MULTIPART_THRESHOLD_MB", "8")) * MB),
+        multipart_chunksize=int(float(os.getenv("R2_PART_SIZE_MB", "8")) * MB),
+        max_concurrency=concurrency,
+        use_threads=concurrency > 1,
+    )
+
+
 class StorageClient:
-    def __init__(self):
+    def __init__(self, s3: Any = None):
         self.bucket = os.getenv("R2_BUCKET")
         self.public_base = (os.getenv("R2_PUBLIC_BASE") or "").rstrip("/")
-        self.s3 = boto3.client(
-            "s3",
-            endpoint_url=os.getenv("R2_ENDPOINT"),
-            aws_access_key_id=os.getenv("R2_ACCESS_KEY_ID"),
-            aws_secret_access_key=os.getenv("R2_SECRET_ACCESS_KEY"),
-            config=Config(signature_version="s3v4"),
-            region_name="auto",
-        )
+        self.s3 = s3 if s3 is not None else _s3_client()
+        self.transfer = transfer_config()
 
     # ----------- internal helper -------------
     def _list_all_objects(self, prefix: str) -> List[dict]:
@@ -44,6 +95,16 @@ class StorageClient:
             return None
         return max(items, key=lambda o: o["LastModified"])["Key"]
 
+    def latest_content_hash(
+            self, prefix: str, field: str = CONTENT_HASH_META
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """(останній ключ у префіксі, його хеш з метаданих — field). Хеша може не бути — None."""
+        key = self.latest_key(prefix)
+        if key is None:
+            return None, None
+        head = self.s3.head_object(Bucket=self.bucket, Key=key)
+        return key, (head.get("Metadata") or {}).get(field)
+
     def url_for(self, key: Optional[str], expires_sec: int = 3600) -> Optional[str]:
         if not key:
             return None
@@ -65,8 +126,32 @@ class StorageClient:
     ) -> str:
         """Завантажити файл і (опціонально) прибрати старі під cleanup_prefix."""
         extra = {"ContentType": content_type} if content_type else None
-        self.s3.upload_file(local_path, self.bucket, key, ExtraArgs=extra)
+        self.s3.upload_file(local_path, self.bucket, key, ExtraArgs=extra, Config=self.transfer)
+        return self._after_upload(key, cleanup_prefix, keep_last)
+
+    def upload_fileobj(
+            self,
+            fileobj: BinaryIO,
+            key: str,
+            content_type: Optional[str] = None,
+            cleanup_prefix: Optional[str] = None,
+            keep_last: int = 7,
+            metadata: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """
+        Завантажити з буфера / потоку (читається послідовно, seek не потрібен) —
+        multipart частинами по R2_PART_SIZE_MB, до R2_UPLOAD_CONCURRENCY паралельно.
+        metadata — користувацькі метадані (x-amz-meta-*), напр. {CONTENT_HASH_META: ...}.
+        """
+        extra: Dict[str, Any] = {}
+        if content_type:
+            extra["ContentType"] = content_type
+        if metadata:
+            extra["Metadata"] = metadata
+        self.s3.upload_fileobj(fileobj, self.bucket, key, ExtraArgs=extra or None, Config=self.transfer)
+        return self._after_upload(key, cleanup_prefix, keep_last)
 
+    def _after_upload(self, key: str, cleanup_prefix: Optional[str], keep_last: int) -> str:
         # опційне прибирання
         if cleanup_prefix:
             try:
@@ -76,19 +161,131 @@ class StorageClient:
 
         return self.url_for(key)
 
-    def cleanup_old_files(self, prefix: str, keep: int = 7) -> None:
-        """Видалити всі старі файли у префіксі, залишивши лише N останніх."""
+    def delete_keys(self, keys: Iterable[str]) -> int:
+        """Видалити ключі пачками delete_objects (до DELETE_BATCH за запит). Повертає кількість видалених."""
+        keys = list(keys)
+        deleted = 0
+        for start in range(0, len(keys), DELETE_BATCH):
+            batch = keys[start:start + DELETE_BATCH]
+            resp = self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+            )
+            errors = resp.get("Errors", []) or []
+            for err in errors:
+                print(f"⚠️ Failed to delete {err.get('Key')}: {err.get('Code')} {err.get('Message')}")
+            deleted += len(batch) - len(errors)
+        return deleted
+
+    def cleanup_old_files(self, prefix: str, keep: int = 7) -> int:
+        """Видалити всі старі файли у префіксі, залишивши лише N останніх. Один лістинг префікса."""
         items = self._list_all_objects(prefix)
         if not items or len(items) <= keep:
-            return
+            return 0
 
         items.sort(key=lambda o: o["LastModified"], reverse=True)
         to_delete = items[keep:]
 
         print(f"🧹 Cleanup {prefix}: keeping {keep}, deleting {len(to_delete)} old files")
+        return self.delete_keys(obj["Key"] for obj in to_delete)
 
-        for obj in to_delete:
+    def apply_retention(self, policies: Dict[str, int]) -> Dict[str, int]:
+        """
+        Відкладене прибирання за один прохід: {prefix: keep} → {prefix: видалено}.
+        Помилка одного префікса не зупиняє інші (для нього -1).
+        """
+        deleted: Dict[str, int] = {}
+        for prefix, keep in policies.items():
             try:
-                self.s3.delete_object(Bucket=self.bucket, Key=obj["Key"])
+                deleted[prefix] = self.cleanup_old_files(prefix, keep=keep)
             except Exception as e:
-                print(f"⚠️ Failed to delete {obj['Key']}: {e}")
+                print(f"⚠️ Cleanup failed for {prefix}: {e}")
+                deleted[prefix] = -1
+        return deleted
+
+
+# ----------------------- Streaming upload -----------------------
+
+class UploadAborted(Exception):
+    """Запис в UploadStream скасовано — незавершений multipart upload відкидається."""
+
+
+class _PipeReader:
+    """Читацький кінець pipe для upload_fileobj; після abort() замість даних / EOF — виняток."""
+
+    def __init__(self, f: BinaryIO, stream: "UploadStream"):
+        self.f = f
+        self.stream = stream
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.f.read(size)
+        if self.stream.aborted:
+            raise UploadAborted(f"Upload of {self.stream.key} aborted")
+        return data
+
+
+class UploadStream:
+    """
+    Потік для запису (write(bytes)), що одразу вивантажується в R2: дані йдуть через os.pipe
+    у storage.upload_fileobj у фоновому потоці. finish() — дочекатись і отримати URL,
+    abort() — скасувати (об'єкт у R2 не з'являється).
+    storage — будь-що з upload_fileobj(fileobj, key, content_type=..., cleanup_prefix=..., keep_last=...).
+    """
+
+    def __init__(self, storage: Any, key: str, content_type: Optional[str] = None, **upload_kwargs: Any):
+        self.key = key
+        self.aborted = False
+        self.url: Optional[str] = None
+        self.error: Optional[BaseException] = None
+        r, w = os.pipe()
+        self._reader = os.fdopen(r, "rb")
+        self._writer = os.fdopen(w, "wb")
+        self._thread = threading.Thread(
+            target=self._upload,
+            args=(storage, content_type, upload_kwargs),
+            name=f"upload-{os.path.basename(key)}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _upload(self, storage: Any, content_type: Optional[str], upload_kwargs: Dict[str, Any]) -> None:
+        try:
+            self.url = storage.upload_fileobj(
+                _PipeReader(self._reader, self), self.key, content_type=content_type, **upload_kwargs
+            )
+        except BaseException as e:
+            self.error = e
+        finally:
+            # якщо вивантаження впало, write() отримає BrokenPipeError, а не зависне на повному pipe
+            self._reader.close()
+
+    def write(self, data: bytes) -> int:
+        if self.aborted:
+            return len(data)   # скасовано: дописування (напр. закриття xlsx-книги) просто відкидається
+        try:
+            return self._writer.write(data)
+        except BrokenPipeError:
+            self._thread.join()
+            raise RuntimeError(f"Upload of {self.key} failed: {self.error}") from self.error
+
+    def flush(self) -> None:
+        if not self.aborted:
+            self._writer.flush()
+
+    def finish(self) -> str:
+        try:
+            self._writer.close()
+        except BrokenPipeError:
+            pass
+        self._thread.join()
+        if self.error is not None:
+            raise RuntimeError(f"Upload of {self.key} failed: {self.error}") from self.error
+        return self.url
+
+    def abort(self) -> None:
+        self.aborted = True
+        try:
+            self._writer.close()
+        except (BrokenPipeError, ValueError):
+            pass
+        self._thread.join()
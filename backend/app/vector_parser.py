@@ -0,0 +1,223 @@
+"""
+Векторний (колонковий) парсер сирих прайсів.
+
+Робить те саме, що raw_csv_to_rows + _rows_to_standard_df у price_processor.py,
+але кернелами pyarrow.compute над цілими колонками замість Python-циклу по рядках.
+Налаштування ті самі: raw_layout / preprocess / normalize із config/suppliers.yaml.
+Результат має збігатися зі старим шляхом (див. tests/test_vector_parser.py).
+
+pyarrow — опційна залежність: без неї price_processor повертається до legacy-парсера.
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .code_key import code_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - залежить від оточення
+    pa = None
+    pc = None
+
+STD_COLUMNS = ["code", "unicode", "brand", "name", "stock", "price", "code_key"]
+
+
+def available() -> bool:
+    return pa is not None
+
+
+# ----------------------- Python-сумісні regex-класи -----------------------
+# RE2 (pyarrow) трактує \s, \w, \d як ASCII, а Python re — як unicode.
+# Щоб результат не розходився на польських/українських назвах, будуємо явні класи.
+
+@lru_cache(maxsize=None)
+def _chars_where(kind: str) -> str:
+    test = {
+        "s": str.isspace,
+        "w": lambda ch: ch.isalnum() or ch == "_",
+        "d": str.isdecimal,
+    }[kind]
+    return "".join(
+        chr(cp) for cp in range(0x110000)
+        if not 0xD800 <= cp <= 0xDFFF and test(chr(cp))
+    )
+
+
+@lru_cache(maxsize=None)
+def _re2_class(kind: str) -> str:
+    cps = [ord(ch) for ch in _chars_where(kind)]
+    out: List[str] = []
+    start = prev = cps[0]
+    for cp in cps[1:] + [-1]:
+        if cp == prev + 1:
+            prev = cp
+            continue
+        out.append(f"\\x{{{start:X}}}" if start == prev else f"\\x{{{start:X}}}-\\x{{{prev:X}}}")
+        start = prev = cp
+    return "[" + "".join(out) + "]"
+
+
+# ----------------------- Helpers -----------------------
+
+def read_raw_lines(input_csv: Path, skip_rows: int = 0) -> List[str]:
+    """Читає файл цілком і повертає рядки (без перших skip_rows)."""
+    with open(input_csv, "r", encoding="utf-8", errors="ignore") as f:
+        lines = f.read().split("\n")
+    return lines[skip_rows:]
+
+
+def _strip(a):
+    return pc.utf8_trim(a, characters=_chars_where("s"))
+
+
+def _part(lists, idx: int):
+    """idx-й елемент кожного списку або null, якщо елементів менше."""
+    return pc.list_slice(lists, idx, idx + 1, return_fixed_size_list=True).flatten()
+
+
+def _is_int(a):
+    """Маска рядків, які прийме int(...)."""
+    d = _re2_class("d")
+    return pc.match_substring_regex(a, f"^[+-]?{d}+(?:_{d}+)*$")
+
+
+def _to_int(a) -> np.ndarray:
+    """Рядки, що пройшли _is_int → int64."""
+    if len(a) == 0:
+        return np.array([], dtype=np.int64)
+    if pc.all(pc.match_substring_regex(a, r"^[+-]?[0-9]+$")).as_py():
+        return pc.cast(pc.replace_substring_regex(a, r"^\+", ""), pa.int64()).to_numpy()
+    # рідкісний шлях: unicode-цифри або "_" — рахуємо так само, як int()
+    return np.array([int(x) for x in a.to_pylist()], dtype=np.int64)
+
+
+def _code_key(code) -> np.ndarray:
+    """Колонковий code_key: ASCII-рядки кернелами, решта — тією ж Python-функцією."""
+    key = pc.utf8_upper(pc.replace_substring_regex(code, r"[^0-9A-Za-z]+", ""))
+    out = key.to_numpy(zero_copy_only=False)
+    ascii_ = pc.string_is_ascii(code).to_numpy(zero_copy_only=False)
+    if not ascii_.all():
+        out = out.copy()
+        for i in np.flatnonzero(~ascii_):
+            out[i] = code_key(code[i].as_py())
+    return out
+
+
+def _normalize_spaces(s, gt5_to: Optional[int]):
+    """Колонковий аналог _normalize_line_with_cfg."""
+    ws, w = _re2_class("s"), _re2_class("w")
+    repl = str(gt5_to if gt5_to is not None else 10)
+    s = pc.replace_substring_regex(s, f">{ws}*5", repl)
+    glued = pc.match_substring_regex(s, f"{w}{ws}{w}*{ws}{w}")
+    s = pc.if_else(glued, pc.replace_substring_regex(s, ws, "", max_replacements=1), s)
+    return pc.replace_substring_regex(s, ws, ";")
+
+
+# ----------------------- Main -----------------------
+
+def parse_standard_df(
+        lines: Union[List[str], Iterable[str]],
+        colmap: Dict[str, int],
+        *,
+        stock_index: Optional[int],
+        stock_header_token: str = "STAN",
+        gt5_to: Optional[int] = None,
+        normalize_mode: str = "spaces",  # "spaces" | "csv"
+) -> pd.DataFrame:
+    """
+    Сирі рядки (skip_rows уже відкинуто) → стандартний DataFrame
+    code / unicode / brand / name / stock / price / code_key.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the vectorized parser")
+
+    s = _strip(pa.array(lines if isinstance(lines, list) else list(lines), type=pa.string()))
+    s = pc.filter(s, pc.not_equal(s, ""))
+
+    if normalize_mode != "csv":
+        s = _normalize_spaces(s, gt5_to)
+
+    lists = pc.split_pattern(s, ";")
+    nparts = pc.list_value_length(lists)
+
+    # --- stock-фільтр (як у raw_csv_to_rows) ---
+    if stock_index is None:
+        gt_pos = pc.subtract(nparts, 1)
+        tail = pc.split_pattern(s, ";", max_splits=1, reverse=True)
+        val = pc.if_else(pc.equal(pc.list_value_length(tail), 2), _part(tail, 1), _part(tail, 0))
+        idx_ok = pc.greater(nparts, 0)
+    else:
+        gt_pos = pa.array(np.full(len(s), stock_index, dtype=np.int32))
+        val = _part(lists, stock_index) if stock_index >= 0 else pa.nulls(len(s), pa.string())
+        idx_ok = pc.and_(pc.greater(nparts, stock_index), pa.scalar(stock_index >= 0))
+    val = _strip(pc.fill_null(val, ""))
+
+    keep = pc.and_(idx_ok, pc.not_equal(pc.utf8_lower(val), (stock_header_token or "").lower()))
+
+    gt = pa.array(np.zeros(len(s), dtype=bool))
+    if gt5_to is not None:
+        gt = pc.and_(keep, pc.starts_with(val, ">"))
+        val = pc.if_else(gt, str(gt5_to), val)
+
+    cand = pc.and_(keep, _is_int(val))
+    mask = cand.to_numpy(zero_copy_only=False).copy()
+    mask[mask] = _to_int(pc.filter(val, cand)) > 0
+    mask = pa.array(mask)
+
+    lists = pc.filter(lists, mask)
+    gt = pc.filter(gt, mask)
+    gt_pos = pc.filter(gt_pos, mask)
+    n = len(lists)
+
+    # --- стандартні колонки (як у _rows_to_standard_df) ---
+    def take(idx: Optional[int]):
+        if idx is None or idx < 0:
+            return pa.array([""] * n, type=pa.string())
+        part = pc.fill_null(_part(lists, idx), "")
+        if gt5_to is not None:
+            # у сирому рядку '>5' у колонці стоку вже замінено на gt5_to
+            part = pc.if_else(pc.and_(gt, pc.equal(gt_pos, idx)), str(gt5_to), part)
+        return _strip(part)
+
+    code = take(colmap.get("code"))
+    unicode_ = take(colmap.get("unicode"))
+    unicode_ = pc.if_else(pc.equal(unicode_, ""), code, unicode_)
+    brand = take(colmap.get("brand"))
+    name = take(colmap.get("name"))
+    name = pc.if_else(pc.equal(name, ""), brand, name)
+
+    stock_s = take(colmap.get("stock"))
+    stock_ok = _is_int(stock_s)
+    stock = np.zeros(n, dtype=np.int64)
+    stock[stock_ok.to_numpy(zero_copy_only=False)] = _to_int(pc.filter(stock_s, stock_ok))
+
+    price_s = pc.replace_substring(take(colmap.get("price")), ",", ".")
+    price_s = pc.replace_substring_regex(price_s, r"[^0-9.]", "")
+    price_ok = pc.match_substring_regex(price_s, r"^(?:[0-9]+\.?[0-9]*|\.[0-9]+)$")
+    if n:
+        price = np.full(n, np.nan, dtype=np.float64)
+        price[price_ok.to_numpy(zero_copy_only=False)] = pc.cast(pc.filter(price_s, price_ok), pa.float64()).to_numpy()
+    else:
+        price = np.array([], dtype=object)
+
+    df = pd.DataFrame(
+        {
+            "code": code.to_numpy(zero_copy_only=False),
+            "unicode": unicode_.to_numpy(zero_copy_only=False),
+            "brand": brand.to_numpy(zero_copy_only=False),
+            "name": name.to_numpy(zero_copy_only=False),
+            "stock": stock,
+            "price": price,
+            "code_key": _code_key(code),
+        },
+        columns=STD_COLUMNS,
+    )
+    # ті самі приведення типів, що й у _rows_to_standard_df (важливо для порожнього кадру)
+    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    df["stock"] = df["stock"].astype(int)
+    return df
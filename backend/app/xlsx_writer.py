@@ -0,0 +1,126 @@
+"""
+Швидкий запис вихідного прайсу в XLSX без pandas.to_excel.
+
+pandas.to_excel проганяє кожну клітинку через свій форматер (ExcelCell, стиль, визначення
+типу в worksheet.write) і тримає всю книгу в пам'яті. Тут:
+- xlsxwriter у режимі constant_memory: у пам'яті лише поточний рядок, а не весь аркуш;
+- тип визначається один раз на колонку за dtype, і клітинки пишуться напряму
+  write_number / write_string (без диспетчеризації worksheet.write на кожне значення);
+- формати колонок задаються наперед із config/profiles.yaml (columns[]):
+      - { from: price, header: "price_eur", num_format: "0.00", width: 12 }
+
+Порожні значення (None / NaN) не пишуться — як і в pandas (na_rep="").
+Замість шляху можна передати потік для запису (напр. storage.UploadStream): zip-архів книги
+пишеться послідовно, seek не потрібен.
+Результат для тих самих даних відповідає to_excel(index=False): той самий аркуш Sheet1
+і стиль шапки.
+"""
+import math
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+# той самий стиль шапки, що й у pandas
+HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
+
+
+class XlsxTableWriter:
+    """
+    Пише out_df порціями (write) і закриває книгу (close). Колонки — у порядку columns_cfg.
+    Для одного кадру: writer.write(out_df); writer.close(headers).
+    """
+
+    def __init__(self, path: Union[Path, BinaryIO], columns_cfg: Optional[List[Dict[str, Any]]] = None):
+        target = path if hasattr(path, "write") else str(path)
+        self.wb = xlsxwriter.Workbook(target, {"constant_memory": True})
+        self.ws = self.wb.add_worksheet()
+        self.header_fmt = self.wb.add_format(HEADER_FORMAT)
+        self.col_formats: List[Any] = []
+        for c, col in enumerate(columns_cfg or []):
+            fmt = self.wb.add_format({"num_format": col["num_format"]}) if col.get("num_format") else None
+            self.col_formats.append(fmt)
+            if col.get("width") or fmt is not None:
+                # constant_memory: set_column — до запису першого рядка
+                self.ws.set_column(c, c, col.get("width"), fmt)
+        self.row = 0
+
+    def _header(self, headers: List[str]) -> None:
+        for c, h in enumerate(headers):
+            self.ws.write_string(0, c, h, self.header_fmt)
+        self.row = 1
+
+    def _format(self, c: int):
+        return self.col_formats[c] if c < len(self.col_formats) else None
+
+    def _column_writer(self, series: pd.Series, c: int) -> Callable[[int, Any], None]:
+        """Функція запису однієї клітинки колонки c, обрана за dtype один раз на порцію."""
+        ws, fmt = self.ws, self._format(c)
+        kind = series.dtype.kind
+
+        if kind in "iu":
+            write_number = ws.write_number
+            return lambda r, v: write_number(r, c, v, fmt)
+
+        if kind == "f":
+            write_number, write_string = ws.write_number, ws.write_string
+
+            def write_float(r: int, v: float) -> None:
+                if v == v:
+                    write_number(r, c, v, fmt)
+
+            if not np.isinf(series.to_numpy()).any():
+                return write_float
+
+            def write_float_inf(r: int, v: float) -> None:
+                if v in (math.inf, -math.inf):
+                    write_string(r, c, "inf" if v > 0 else "-inf", fmt)   # як inf_rep у pandas
+                else:
+                    write_float(r, v)
+
+            return write_float_inf
+
+        if kind == "b":
+            write_boolean = ws.write_boolean
+            return lambda r, v: write_boolean(r, c, v, fmt)
+
+        # object: здебільшого рядки; інші типи — через загальний write
+        write_string, write_any = ws.write_string, ws.write
+
+        def write_object(r: int, v: Any) -> None:
+            if type(v) is str:
+                if v:
+                    write_string(r, c, v, fmt)
+            elif v is not None and v == v:
+                write_any(r, c, v, fmt)
+
+        return write_object
+
+    def write(self, out_df: pd.DataFrame) -> None:
+        if self.row == 0:
+            self._header([str(c) for c in out_df.columns])
+        writers = [self._column_writer(out_df.iloc[:, c], c) for c in range(out_df.shape[1])]
+        columns = [out_df.iloc[:, c].tolist() for c in range(out_df.shape[1])]
+
+        row = self.row
+        for values in zip(*columns):
+            for write, v in zip(writers, values):
+                write(row, v)
+            row += 1
+        self.row = row
+
+    def close(self, headers: List[str]) -> None:
+        if self.row == 0:
+            self._header(headers)
+        self.wb.close()
+
+
+def write_xlsx(out_df: pd.DataFrame, path: Union[Path, BinaryIO], columns_cfg: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Один кадр → XLSX (замість out_df.to_excel(path, index=False, engine="xlsxwriter"))."""
+    writer = XlsxTableWriter(path, columns_cfg)
+    try:
+        writer.write(out_df)
+    finally:
+        writer.close([str(c) for c in out_df.columns])
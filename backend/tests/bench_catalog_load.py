@@ -0,0 +1,69 @@
+# Бенчмарк завантаження site-прайсу у product_catalog: старий шлях (insert) проти COPY і diff.
+# python -m tests.bench_catalog_load [rows]      (з backend/, потрібна робоча PostgreSQL)
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from app.catalog_loader import LOADERS, CATALOG_TABLE
+from app.db import get_engine
+
+BENCH_SUPPLIER_ID = 9999
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rnd = np.random.default_rng(42)
+    codes = [f"BENCH{i:07d}" for i in range(rows)]
+    brands = rnd.choice(["KNECHT", "MANN", "BOSCH", "FEBI"], size=rows)
+    return pd.DataFrame({
+        "supplier_id": BENCH_SUPPLIER_ID,
+        "code": codes,
+        "unicode": codes,
+        "brand": brands,
+        "name": brands,
+        "stock": rnd.integers(1, 50, size=rows),
+        "price_eur": np.round(rnd.uniform(1, 500, size=rows), 2),
+    })
+
+
+def run(mode: str, engine, df: pd.DataFrame) -> dict:
+    loader = LOADERS[mode](BENCH_SUPPLIER_ID, engine=engine)
+    t0 = time.perf_counter()
+    loader.begin()
+    loader.append(df)
+    stats = loader.finish()
+    stats["wall_seconds"] = round(time.perf_counter() - t0, 3)
+    return stats
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    engine = get_engine()
+    df = make_frame(rows)
+
+    print(f"Benchmark: {rows} rows, supplier_id={BENCH_SUPPLIER_ID}")
+    for mode in ("insert", "copy"):
+        stats = run(mode, engine, df)
+        print(f"  {mode:>6}: {stats['rows']} rows in {stats['wall_seconds']}s "
+              f"→ {stats['rows_per_sec']} rows/sec (ok={stats['ok']})")
+
+    # diff: перший прогін заповнює row_hash, далі — типовий день (~2% цін змінилось)
+    changed = df.copy()
+    changed.loc[::50, "price_eur"] += 1
+    for label, frame in (("diff#1", df), ("diff#2", df), ("diff~2%", changed)):
+        stats = run("diff", engine, frame)
+        print(f"  {label:>7}: {stats['wall_seconds']}s  +{stats['inserted']} ~{stats['updated']} "
+              f"-{stats['deleted']} ={stats['unchanged']} (ok={stats['ok']})")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {CATALOG_TABLE} WHERE supplier_id = :sid"), {"sid": BENCH_SUPPLIER_ID})
+
+
+if __name__ == "__main__":
+    main()
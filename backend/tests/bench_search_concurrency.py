@@ -0,0 +1,93 @@
+# Бенчмарк /api/search під конкурентним навантаженням: sync-роутер (threadpool + psycopg2)
+# проти async-роутера (asyncpg). Запити йдуть напряму в ASGI-застосунок, без мережі й uvicorn;
+# кеш пошуку вимкнено, щоб кожен запит доходив до БД.
+# python -m tests.bench_search_concurrency [concurrency] [requests]   (з backend/, потрібна PostgreSQL)
+import asyncio
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+os.environ["SEARCH_CACHE_SIZE"] = "0"
+
+from fastapi import FastAPI
+
+from app.db import dispose_async_engine, dispose_engine
+from app.routers import search, search_async
+
+QUERIES = ["oc90", "oc 9", "knecht", "filtr", "w712", "bosch", "hu7", "mann"]
+
+
+def make_app(module) -> FastAPI:
+    app = FastAPI()
+    app.include_router(module.router, prefix="/api")
+    return app
+
+
+async def call(app: FastAPI, q: str) -> int:
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/api/search", "raw_path": b"/api/search",
+        "query_string": f"q={q}&limit=50".encode(), "headers": [], "client": ("bench", 0),
+        "server": ("bench", 80), "root_path": "",
+    }
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status["code"]
+
+
+async def run(app: FastAPI, concurrency: int, total: int) -> dict:
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            code = await call(app, QUERIES[i % len(QUERIES)])
+            latencies.append(time.perf_counter() - t0)
+            errors += code != 200
+
+    await one(0)   # прогрів пулу з'єднань
+    latencies.clear()
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "rps": round(total / wall, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+        "errors": errors,
+    }
+
+
+async def main_async(concurrency: int, total: int):
+    print(f"Benchmark /api/search: {total} requests, concurrency={concurrency}, cache off")
+    for label, module in (("sync", search), ("async", search_async)):
+        stats = await run(make_app(module), concurrency, total)
+        print(f"  {label:>5}: {stats['rps']} req/s  p50={stats['p50_ms']}ms  "
+              f"p95={stats['p95_ms']}ms  errors={stats['errors']}")
+    dispose_engine()
+    await dispose_async_engine()
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    asyncio.run(main_async(concurrency, total))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Бенчмарк експорту XLSX: pandas.to_excel (старий шлях) проти app/xlsx_writer.py.
+# Кожен варіант — в окремому процесі, щоб пікова пам'ять (RSS) не змішувалась.
+# python -m tests.bench_xlsx_writer [rows]      (з backend/)
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from app.xlsx_writer import write_xlsx
+
+COLUMNS = [
+    {"from": "code", "header": "code"},
+    {"from": "unicode", "header": "unicode"},
+    {"from": "brand", "header": "brand"},
+    {"from": "name", "header": "name"},
+    {"from": "stock", "header": "stock"},
+    {"from": "price", "header": "price_eur", "num_format": "0.00"},
+]
+
+
+def make_frame(rows: int) -> pd.DataFrame:
+    rnd = np.random.default_rng(42)
+    codes = [f"BENCH{i:07d}" for i in range(rows)]
+    brands = rnd.choice(["KNECHT", "MANN", "BOSCH", "FEBI"], size=rows)
+    return pd.DataFrame({
+        "code": codes,
+        "unicode": codes,
+        "brand": brands,
+        "name": rnd.choice(["Filtr oleju", "Klocki hamulcowe", "Swieca zaplonowa"], size=rows),
+        "stock": rnd.integers(0, 50, size=rows),
+        "price_eur": np.round(rnd.uniform(1, 500, size=rows), 2),
+    })
+
+
+def _max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # Linux: КБ
+
+
+def _run(mode: str, rows: int, queue) -> None:
+    df = make_frame(rows)
+    base = _max_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "out.xlsx"
+        t0 = time.perf_counter()
+        if mode == "to_excel":
+            df.to_excel(path, index=False, engine="xlsxwriter")
+        else:
+            write_xlsx(df, path, COLUMNS)
+        seconds = time.perf_counter() - t0
+        size = path.stat().st_size
+    queue.put({
+        "seconds": round(seconds, 2),
+        "rows_per_sec": int(rows / seconds),
+        "peak_rss_mb": round(_max_rss_mb(), 1),
+        "rss_growth_mb": round(_max_rss_mb() - base, 1),
+        "file_mb": round(size / 1024 / 1024, 1),
+    })
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    ctx = multiprocessing.get_context("spawn")
+    print(f"Benchmark XLSX export: {rows} rows")
+    for mode in ("to_excel", "typed"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_run, args=(mode, rows, queue))
+        proc.start()
+        stats = queue.get()
+        proc.join()
+        print(f"  {mode:>8}: {stats['seconds']}s → {stats['rows_per_sec']} rows/sec, "
+              f"peak RSS {stats['peak_rss_mb']} MB (+{stats['rss_growth_mb']} MB while writing), "
+              f"file {stats['file_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
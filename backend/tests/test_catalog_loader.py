@@ -0,0 +1,121 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.catalog_loader import CATALOG_TABLE, frame_to_copy_csv, make_catalog_loader
+
+# Інтеграційні тести з реальною PostgreSQL: TEST_DATABASE_URL=postgresql+psycopg2://...
+TEST_DB_URL = os.getenv("TEST_DATABASE_URL")
+needs_db = pytest.mark.skipif(not TEST_DB_URL, reason="TEST_DATABASE_URL is not set")
+
+SUPPLIER_ID = 9001
+
+
+def _frame(n: int, price_shift: float = 0.0) -> pd.DataFrame:
+    return pd.DataFrame({
+        "supplier_id": SUPPLIER_ID,
+        "code": [f"C{i}" for i in range(n)],
+        "unicode": [f"C{i}" for i in range(n)],
+        "brand": ["MANN", 'KN "X"; 1'] * (n // 2) + ["MANN"] * (n % 2),
+        "name": [""] * n,
+        "stock": np.arange(n) % 7,
+        "price_eur": np.where(np.arange(n) % 50 == 3, np.nan, np.round(np.arange(n) * 1.5 + price_shift, 2)),
+    })
+
+
+def test_copy_csv_quotes_text_and_keeps_empty_strings():
+    df = pd.DataFrame({"code": ["A;1", ""], "stock": [1, 2], "price_eur": [1.5, np.nan]})
+    assert frame_to_copy_csv(df).read() == '"A;1",1,1.5\n"",2,""\n'
+
+
+@pytest.fixture
+def engine():
+    eng = create_engine(TEST_DB_URL)
+    yield eng
+    with eng.begin() as conn:
+        conn.execute(text(f"DELETE FROM {CATALOG_TABLE} WHERE supplier_id = :sid"), {"sid": SUPPLIER_ID})
+    eng.dispose()
+
+
+def _load(engine, mode, frames):
+    loader = make_catalog_loader(SUPPLIER_ID, mode=mode, engine=engine)
+    loader.begin()
+    for f in frames:
+        loader.append(f)
+    return loader.finish()
+
+
+def _db_rows(engine) -> pd.DataFrame:
+    # id — сурогатний ключ, між завантаженнями він різний
+    return pd.read_sql(
+        text(f"SELECT * FROM {CATALOG_TABLE} WHERE supplier_id = :sid ORDER BY code"),
+        engine, params={"sid": SUPPLIER_ID},
+    ).drop(columns="id").reset_index(drop=True)
+
+
+@needs_db
+def test_copy_and_insert_modes_store_same_rows(engine):
+    df = _frame(501)
+    _load(engine, "insert", [df])
+    by_insert = _db_rows(engine)
+
+    stats = _load(engine, "copy", [df.iloc[:200], df.iloc[200:]])
+    by_copy = _db_rows(engine)
+
+    assert stats["ok"] and stats["rows"] == 501 and stats["rows_per_sec"] > 0
+    pd.testing.assert_frame_equal(by_copy, by_insert)
+
+
+@needs_db
+def test_copy_failure_keeps_old_rows(engine):
+    _load(engine, "copy", [_frame(10)])
+
+    loader = make_catalog_loader(SUPPLIER_ID, mode="copy", engine=engine)
+    loader.begin()
+    loader.append(_frame(10, price_shift=100))
+    loader.abort()
+
+    assert _db_rows(engine)["price_eur"].max() < 100
+
+
+@needs_db
+def test_diff_mode_applies_only_changes(engine):
+    old = _frame(100)
+    _load(engine, "diff", [old])
+
+    new = old.drop(index=[0, 1, 2]).copy()                 # 3 видалені
+    new.loc[10:14, "price_eur"] += 1                       # 5 оновлені
+    new.loc[20, "name"] = "FILTER"                         # 1 оновлений
+    extra = _frame(2).assign(code=["NEW1", "NEW2"])        # 2 нові
+    dup = new.loc[[30]]                                    # дубль ключа
+    new = pd.concat([new, extra, dup], ignore_index=True)
+
+    stats = _load(engine, "diff", [new.iloc[:50], new.iloc[50:]])
+
+    assert (stats["inserted"], stats["updated"], stats["deleted"]) == (3, 6, 3)
+    assert stats["unchanged"] == 100 - 3 - 6
+    by_diff = _db_rows(engine).drop(columns="row_hash")
+
+    _load(engine, "copy", [new])
+    by_copy = _db_rows(engine).drop(columns="row_hash")
+    sort = ["code", "brand", "price_eur"]
+    pd.testing.assert_frame_equal(
+        by_diff.sort_values(sort, ignore_index=True), by_copy.sort_values(sort, ignore_index=True)
+    )
+
+    # після copy row_hash = NULL: перший diff оновлює все, другий — нічого
+    stats = _load(engine, "diff", [new])
+    assert (stats["inserted"], stats["updated"], stats["deleted"]) == (0, len(new), 0)
+    stats = _load(engine, "diff", [new])
+    assert (stats["updated"], stats["unchanged"]) == (0, len(new))
+
+
+@needs_db
+def test_diff_mode_with_empty_price_deletes_all(engine):
+    _load(engine, "diff", [_frame(10)])
+    stats = _load(engine, "diff", [])
+    assert stats["deleted"] == 10
+    assert _db_rows(engine).empty
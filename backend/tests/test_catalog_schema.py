@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import catalog_schema, db, search_cache
+from app.routers import search
+
+TEST_DB_URL = os.getenv("TEST_DATABASE_URL")
+pytestmark = pytest.mark.skipif(not TEST_DB_URL, reason="TEST_DATABASE_URL is not set")
+
+SUPPLIER_ID = 9002
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    eng = create_engine(TEST_DB_URL)
+    monkeypatch.setattr(db, "_engine", eng)
+    monkeypatch.setattr(search_cache, "_cache", None)
+    yield eng
+    with eng.begin() as conn:
+        conn.execute(text(f"DELETE FROM product_catalog WHERE supplier_id = :sid"), {"sid": SUPPLIER_ID})
+    eng.dispose()
+
+
+def test_migrate_is_idempotent(engine):
+    first = catalog_schema.migrate(engine)
+    second = catalog_schema.migrate(engine)
+
+    assert first == second
+    insp = inspect(engine)
+    cols = {c["name"]: str(c["type"]) for c in insp.get_columns("product_catalog")}
+    assert cols["price_eur"] == "DOUBLE PRECISION" and "row_hash" in cols
+    index_names = {ix["name"] for ix in insp.get_indexes("product_catalog")}
+    expected = {name for name, _ in catalog_schema.BTREE_INDEXES}
+    if first["trgm"]:
+        expected |= {name for name, _ in catalog_schema.TRGM_INDEXES}
+    assert expected <= index_names
+
+
+def test_search_treats_like_wildcards_literally(engine):
+    catalog_schema.migrate(engine)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO product_catalog (supplier_id, code, brand, name, price_eur) "
+                 "VALUES (:sid, 'ZX_9%1', 'MANN', 'FILTER', 2.0), (:sid, 'ZXA9B1', 'MANN', 'FILTER', 1.0)"),
+            {"sid": SUPPLIER_ID},
+        )
+
+    found = search.search_products(q="zx_9%", limit=10)
+
+    assert [(r["code"], r["match"]) for r in found] == [("ZX_9%1", "substring")]
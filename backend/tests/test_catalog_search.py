@@ -0,0 +1,193 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import catalog_schema, db
+from app.catalog_loader import make_catalog_loader
+from app.catalog_search import (
+    search_catalog,
+    search_catalog_async,
+    search_page,
+    search_page_async,
+    search_tiers,
+    tier_sql,
+)
+
+TEST_DB_URL = os.getenv("TEST_DATABASE_URL")
+needs_db = pytest.mark.skipif(not TEST_DB_URL, reason="TEST_DATABASE_URL is not set")
+
+SUPPLIER_ID = 9003
+
+
+def test_tiers_use_normalized_key():
+    tiers, params = search_tiers("oc-90")
+    assert [m for m, _ in tiers] == ["exact", "prefix", "substring"]
+    assert params["key"] == "OC90" and params["key_prefix"] == "OC90%"
+    assert params["pattern"] == "%oc-90%"
+
+
+def test_query_without_letters_or_digits_is_text_only():
+    tiers, params = search_tiers("--")
+    assert [m for m, _ in tiers] == ["substring"]
+    assert "key" not in params
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    eng = create_engine(TEST_DB_URL)
+    monkeypatch.setattr(db, "_engine", eng)
+    catalog_schema.migrate(eng)
+    codes = ["OC 90", "OC90/1", "XOC-90", "OC91", "ZZ1"]
+    df = pd.DataFrame({
+        "supplier_id": SUPPLIER_ID,
+        "code": codes,
+        "unicode": codes,
+        "brand": ["KNECHT", "KNECHT", "MAHLE", "KNECHT", "MANN"],
+        "name": ["Filtr"] * 5,
+        "stock": 1,
+        "price_eur": [5.0, 1.0, 0.5, 2.0, 0.1],
+        "code_key": ["OC90", "OC901", "XOC90", "OC91", "ZZ1"],
+    })
+    loader = make_catalog_loader(SUPPLIER_ID, mode="copy", engine=eng)
+    loader.begin()
+    loader.append(df)
+    assert loader.finish()["ok"]
+    yield eng
+    with eng.begin() as conn:
+        conn.execute(text("DELETE FROM product_catalog WHERE supplier_id = :sid"), {"sid": SUPPLIER_ID})
+    eng.dispose()
+
+
+@needs_db
+@pytest.mark.parametrize("q", ["OC 90", "oc-90", "OC90", "oc.90"])
+def test_ranked_exact_then_prefix_then_substring(engine, q):
+    with engine.connect() as conn:
+        found = search_catalog(conn, q, limit=10)
+    found = [(r["code"], r["match"]) for r in found if r["supplier_id"] == SUPPLIER_ID]
+
+    assert found == [
+        ("OC 90", "exact"),
+        ("OC90/1", "prefix"),
+        ("XOC-90", "substring"),
+    ]
+
+
+@needs_db
+def test_brand_match_is_substring_tier_sorted_by_price(engine):
+    with engine.connect() as conn:
+        found = search_catalog(conn, "knecht", limit=10)
+    found = [(r["code"], r["match"]) for r in found if r["supplier_id"] == SUPPLIER_ID]
+    assert found == [("OC90/1", "substring"), ("OC91", "substring"), ("OC 90", "substring")]
+
+
+@needs_db
+def test_limit_stops_after_exact_tier(engine):
+    with engine.connect() as conn:
+        found = search_catalog(conn, "oc 90", limit=1)
+    assert [(r["code"], r["match"]) for r in found] == [("OC 90", "exact")]
+
+
+@needs_db
+def test_exact_tier_is_an_index_lookup(engine):
+    tiers, params = search_tiers("oc-90")
+    with engine.begin() as conn:
+        conn.execute(text("SET LOCAL enable_seqscan = off"))  # крихітна тестова таблиця
+        plan = conn.execute(
+            text("EXPLAIN " + tier_sql(dict(tiers)["exact"])), {**params, "limit_val": 10}
+        ).scalars().all()
+    assert any("ix_product_catalog_code_key" in line for line in plan)
+
+
+@pytest.fixture
+def paged_engine(monkeypatch):
+    eng = create_engine(TEST_DB_URL)
+    monkeypatch.setattr(db, "_engine", eng)
+    catalog_schema.migrate(eng)
+    n = 157
+    codes = [f"PG{i % 40}-{i}" if i % 3 else f"PG{i % 40}" for i in range(n)]
+    df = pd.DataFrame({
+        "supplier_id": SUPPLIER_ID,
+        "code": codes,
+        "unicode": codes,
+        "brand": ["KNECHT", "MANN"] * (n // 2) + ["MANN"],
+        "name": ["Filtr"] * n,
+        "stock": 1,
+        "price_eur": [None if i % 50 == 7 else float(i % 5) for i in range(n)],   # багато однакових цін
+        "code_key": [c.replace("-", "") for c in codes],
+    })
+    loader = make_catalog_loader(SUPPLIER_ID, mode="copy", engine=eng)
+    loader.begin()
+    loader.append(df)
+    assert loader.finish()["ok"]
+    yield eng
+    with eng.begin() as conn:
+        conn.execute(text("DELETE FROM product_catalog WHERE supplier_id = :sid"), {"sid": SUPPLIER_ID})
+    eng.dispose()
+
+
+def _key(r):
+    return r["id"], r["code"], r["match"]
+
+
+@needs_db
+@pytest.mark.parametrize("q", ["pg1", "filtr"])
+def test_keyset_pages_cover_full_result_in_order(paged_engine, q):
+    with paged_engine.connect() as conn:
+        full = [_key(r) for r in search_catalog(conn, q, limit=10_000)]
+        pages, cursor = [], None
+        while True:
+            page = search_page(conn, q, limit=7, cursor=cursor)
+            pages.extend(_key(r) for r in page["items"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+            assert len(page["items"]) == 7
+
+    assert len(full) > 20
+    assert pages == full
+
+
+@needs_db
+def test_first_page_estimate_and_cursor_validation(paged_engine):
+    with paged_engine.connect() as conn:
+        first = search_page(conn, "pg1", limit=5, with_total=True)
+        assert first["estimated_total"] > 0
+        second = search_page(conn, "pg1", limit=5, cursor=first["next_cursor"], with_total=True)
+        assert second["estimated_total"] is None
+
+        with pytest.raises(ValueError):
+            search_page(conn, "pg2", limit=5, cursor=first["next_cursor"])
+        with pytest.raises(ValueError):
+            search_page(conn, "pg1", limit=5, cursor="not-a-cursor")
+
+
+@needs_db
+def test_async_search_matches_sync(paged_engine):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    with paged_engine.connect() as conn:
+        sync_full = search_catalog(conn, "pg1", limit=50)
+        sync_page = search_page(conn, "pg1", limit=7, with_total=True)
+        sync_next = search_page(conn, "pg1", limit=7, cursor=sync_page["next_cursor"])
+
+    async def run():
+        url = paged_engine.url.set(drivername="postgresql+asyncpg")
+        aeng = create_async_engine(url)
+        try:
+            async with aeng.connect() as conn:
+                full = await search_catalog_async(conn, "pg1", limit=50)
+                page = await search_page_async(conn, "pg1", limit=7, with_total=True)
+                nxt = await search_page_async(conn, "pg1", limit=7, cursor=page["next_cursor"])
+                with pytest.raises(ValueError):
+                    await search_page_async(conn, "pg1", limit=7, cursor="not-a-cursor")
+            return full, page, nxt
+        finally:
+            await aeng.dispose()
+
+    full, page, nxt = asyncio.run(run())
+    assert full == sync_full
+    assert page == sync_page
+    assert nxt == sync_next
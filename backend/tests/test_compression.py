@@ -0,0 +1,49 @@
+import gzip
+import io
+
+import pytest
+
+from app import compression
+
+
+@pytest.mark.parametrize("codec", compression.CODECS)
+def test_roundtrip_and_raw_stays_open(codec):
+    if not compression.available(codec):
+        pytest.skip(f"{codec} is not available")
+    raw = io.BytesIO()
+    writer = compression.open_writer(codec, raw)
+    payload = b"code;brand;price\n" + b"OC90;KNECHT;12.50\n" * 10_000
+    for i in range(0, len(payload), 4096):
+        writer.write(payload[i:i + 4096])
+    writer.close()
+    assert not raw.closed
+
+    data = raw.getvalue()
+    assert len(data) < len(payload) / 10
+    if codec == "gzip":
+        assert gzip.decompress(data) == payload
+    else:
+        import zstandard
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(data) == payload
+
+
+def test_gzip_is_deterministic():
+    def compress():
+        raw = io.BytesIO()
+        writer = compression.open_writer("gzip", raw)
+        writer.write(b"same content")
+        writer.close()
+        return raw.getvalue()
+
+    assert compress() == compress()
+
+
+def test_suffix_and_content_type():
+    assert compression.suffix("gzip") == ".gz"
+    assert compression.suffix("zstd") == ".zst"
+    assert compression.suffix(None) == ""
+    assert compression.content_type("gzip", "text/csv") == "application/gzip"
+    assert compression.content_type("zstd", "text/csv") == "application/zstd"
+    assert compression.content_type(None, "text/csv") == "text/csv"
+    with pytest.raises(ValueError):
+        compression.open_writer("brotli", io.BytesIO())
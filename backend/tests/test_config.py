@@ -0,0 +1,123 @@
+import dataclasses
+import os
+import pickle
+import shutil
+
+import pytest
+
+from app import config
+from app.config import ConfigError, get_profiles, get_supplier, get_suppliers, validate_config
+from app.paths import CONFIG_DIR
+
+
+@pytest.fixture
+def cfg_dir(tmp_path):
+    for name in (config.SUPPLIERS_FILE, config.PROFILES_FILE):
+        shutil.copy(CONFIG_DIR / name, tmp_path / name)
+    return tmp_path
+
+
+def _write(path, text):
+    """Перезаписати файл і гарантовано змінити mtime (грубі таймстемпи ФС)."""
+    st = path.stat()
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_repo_config_is_valid():
+    counts = validate_config()
+    assert counts["suppliers"] >= 2 and counts["profiles"] >= 1
+
+
+def test_supplier_plan_and_case_insensitive_lookup(cfg_dir):
+    sup = get_supplier("ap_gdansk", cfg_dir)
+    assert sup is get_supplier("AP_GDANSK", cfg_dir)
+    assert sup.supplier_id == 2
+    assert sup.plan.skip_rows == 1
+    assert sup.plan.colmap["price"] == 2
+    assert sup.plan.parser_kwargs()["normalize_mode"] == "spaces"
+    assert get_supplier("NOPE", cfg_dir) is None
+
+
+def test_objects_are_immutable(cfg_dir):
+    sup = get_supplier("MOTOROL", cfg_dir)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        sup.supplier_id = 5
+    with pytest.raises(TypeError):
+        sup.plan.colmap["code"] = 9
+    profile = get_profiles(cfg_dir).profiles[0]
+    with pytest.raises(TypeError):
+        profile.columns[0]["header"] = "x"
+
+
+def test_parsed_once_and_reloaded_on_mtime_change(cfg_dir):
+    first = get_suppliers(cfg_dir)
+    assert get_suppliers(cfg_dir) is first
+
+    path = cfg_dir / config.SUPPLIERS_FILE
+    _write(path, path.read_text(encoding="utf-8").replace("supplier_id: 3", "supplier_id: 7"))
+    reloaded = get_suppliers(cfg_dir)
+    assert reloaded is not first
+    assert reloaded["MOTOROL"].supplier_id == 7
+
+
+def test_profiles_select_and_picklable_columns(cfg_dir):
+    profiles = get_profiles(cfg_dir)
+    site = profiles.select("SITE")
+    assert [p.name for p in site] == ["site_1_33_csv"]
+    assert site[0].r2_prefix("AP_GDANSK") == "1_33/site/ap_gdansk/"
+    assert pickle.loads(pickle.dumps(site[0].columns_cfg())) == site[0].columns_cfg()
+
+    uah = [p for p in profiles.profiles if p.currency_out == "UAH"]
+    assert uah and all(p.rate is not None for p in uah)
+
+
+@pytest.mark.parametrize("old, new, where", [
+    ("factor: 1.23", "factor: abc", "factor"),
+    ("format: xlsx", "format: pdf", "format"),
+    ("from: brand", "from: brend", "columns["),
+    ("format: xlsx", "format: xlsx\n    compression: gzip", "compression"),
+])
+def test_invalid_profiles_report_path(cfg_dir, old, new, where):
+    path = cfg_dir / config.PROFILES_FILE
+    text = path.read_text(encoding="utf-8")
+    assert old in text
+    _write(path, text.replace(old, new, 1))
+    with pytest.raises(ConfigError) as e:
+        get_profiles(cfg_dir)
+    assert str(e.value).startswith("profiles.yaml: profiles[")
+    assert where in str(e.value)
+
+
+def test_invalid_supplier_and_duplicate_ids(cfg_dir):
+    path = cfg_dir / config.SUPPLIERS_FILE
+    text = path.read_text(encoding="utf-8")
+    _write(path, text.replace("skip_rows: 1", "skip_rows: -1"))
+    with pytest.raises(ConfigError, match="AP_GDANSK.preprocess.skip_rows"):
+        get_suppliers(cfg_dir)
+
+    _write(path, text.replace("supplier_id: 3", "supplier_id: 2"))
+    with pytest.raises(ConfigError, match="already used by AP_GDANSK"):
+        get_suppliers(cfg_dir)
+
+
+def test_schedule_section(cfg_dir):
+    schedule = get_supplier("MOTOROL", cfg_dir).schedule
+    assert (schedule.source, schedule.attachment, schedule.enabled) == ("gmail", "09033.cennik.zip", False)
+    assert get_supplier("AP_GDANSK", cfg_dir).schedule.source == "ftp"
+    assert not any(s.schedule.enabled for s in get_suppliers(cfg_dir).values() if s.schedule)   # вмикається явно
+
+    path = cfg_dir / config.SUPPLIERS_FILE
+    text = path.read_text(encoding="utf-8")
+    _write(path, text.replace("source: gmail", "source: imap"))
+    with pytest.raises(ConfigError, match="MOTOROL.schedule.source"):
+        get_suppliers(cfg_dir)
+    _write(path, text.replace("interval: 600", "interval: 5", 1))
+    with pytest.raises(ConfigError, match="AP_GDANSK.schedule.interval"):
+        get_suppliers(cfg_dir)
+
+
+def test_missing_profiles_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        get_profiles(tmp_path)
+    assert dict(get_suppliers(tmp_path)) == {}
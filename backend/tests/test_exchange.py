@@ -0,0 +1,110 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from app import exchange
+from app.exchange import RateProvider
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Fetcher:
+    def __init__(self, rate=45.0):
+        self.rate = rate
+        self.calls = 0
+        self.fail = False
+
+    def __call__(self, timeout):
+        self.calls += 1
+        if self.fail:
+            raise TimeoutError("NBU timeout")
+        return {"rate": self.rate, "nbu_date": "17.10.2026"}
+
+
+@pytest.fixture
+def provider(tmp_path):
+    clock = Clock(datetime(2026, 10, 17, 9, 0).timestamp())
+    fetcher = Fetcher()
+    return RateProvider(tmp_path / "rate.json", ttl=86400, fetcher=fetcher, clock=clock), fetcher, clock
+
+
+def test_fetches_once_per_day(provider):
+    p, fetcher, clock = provider
+    assert p.get()["source"] == "nbu"
+    clock.now += 3600
+    assert p.get()["source"] == "cache"
+    assert fetcher.calls == 1
+
+    clock.now += 86400   # наступний день
+    fetcher.rate = 46.0
+    assert p.get()["rate"] == 46.0
+    assert fetcher.calls == 2
+
+
+def test_disk_value_survives_restart_and_is_used_when_nbu_is_down(provider, tmp_path):
+    p, fetcher, clock = provider
+    p.get()
+    saved = json.loads((tmp_path / "rate.json").read_text(encoding="utf-8"))
+    assert saved["rate"] == 45.0 and saved["fetched_at"]
+
+    # рестарт того ж дня — без мережі
+    restarted = RateProvider(tmp_path / "rate.json", fetcher=fetcher, clock=clock)
+    assert restarted.get()["source"] == "disk"
+    assert fetcher.calls == 1
+
+    # наступного дня НБУ недоступний — останній реальний курс, а не fallback
+    clock.now += 86400
+    fetcher.fail = True
+    quote = RateProvider(tmp_path / "rate.json", fetcher=fetcher, clock=clock).get()
+    assert (quote["rate"], quote["source"]) == (45.0, "last_known_good")
+
+
+def test_failed_fetch_is_not_retried_during_cooldown(provider):
+    p, fetcher, clock = provider
+    p.retry = 300
+    p.get()
+    clock.now += 86400
+    fetcher.fail = True
+
+    quotes = []
+    for _ in range(5):
+        quotes.append(p.get())
+        clock.now += 30
+    assert [(q["rate"], q["source"]) for q in quotes] == [(45.0, "last_known_good")] * 5
+    assert fetcher.calls == 2          # один успішний запит і один невдалий на всі п'ять get()
+
+    clock.now += 300                   # пауза минула — НБУ знову опитується
+    fetcher.fail = False
+    fetcher.rate = 46.0
+    assert (p.get()["rate"], fetcher.calls) == (46.0, 3)
+
+
+def test_quote_applies_markup_and_falls_back_without_any_rate(provider, monkeypatch):
+    p, fetcher, clock = provider
+    monkeypatch.setattr(exchange, "_provider", p)
+
+    quote = exchange.eur_to_uah_quote(add_uah=1, min_rate=49, fallback=50)
+    assert (quote["rate"], quote["nbu_rate"], quote["source"]) == (49.0, 45.0, "nbu")
+    assert exchange.get_eur_to_uah(add_uah=5, min_rate=0) == 50.0
+
+    p._quote = None
+    p.state_file.unlink()
+    fetcher.fail = True
+    assert exchange.eur_to_uah_quote(fallback=51) == {
+        "rate": 51.0, "nbu_rate": None, "nbu_date": None, "fetched_at": None, "source": "fallback",
+    }
+
+
+def test_force_refresh_bypasses_cache(provider):
+    p, fetcher, clock = provider
+    p.get()
+    fetcher.rate = 47.0
+    assert p.get(force=True)["rate"] == 47.0
+    assert fetcher.calls == 2
@@ -0,0 +1,202 @@
+import ftplib
+import gzip
+
+import pytest
+
+from app import price_processor
+
+LINES = [f"C{i};BRAND;{i},50;{i % 7}\n" for i in range(5000)]
+PAYLOAD = gzip.compress("".join(LINES).encode("utf-8"))
+
+
+class FakeConn:
+    def __init__(self, data: bytes, fail_after=None, exc=None):
+        self.data = data
+        self.pos = 0
+        self.fail_after = fail_after
+        self.exc = exc
+
+    def recv_into(self, b):
+        if self.fail_after is not None and self.pos >= self.fail_after:
+            raise self.exc
+        end = len(self.data) if self.fail_after is None else self.fail_after
+        n = min(len(b), 777, end - self.pos)
+        b[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+
+    def close(self):
+        pass
+
+
+class FakeFtp:
+    def __init__(self, voidresp_error=None):
+        self.voidresp_error = voidresp_error
+
+    def voidresp(self):
+        if self.voidresp_error:
+            raise self.voidresp_error
+        return "226 Transfer complete"
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _fake_server(monkeypatch, plan):
+    """plan: список (fail_after, exc, voidresp_error) для послідовних з'єднань."""
+    rests = []
+
+    def open_transfer(remote_path, rest=None):
+        rests.append(rest)
+        fail_after, exc, voidresp_error = plan[len(rests) - 1]
+        start = rest or 0
+        conn = FakeConn(PAYLOAD[start:], fail_after, exc)
+        return FakeFtp(voidresp_error), conn
+
+    monkeypatch.setattr(price_processor, "_ftp_open_transfer", open_transfer)
+    return rests
+
+
+def test_ftp_source_streams_and_decompresses(monkeypatch):
+    rests = _fake_server(monkeypatch, [(None, None, None)])
+
+    with price_processor.open_source_text("/prices/ap.csv.gz") as f:
+        assert list(f) == LINES
+    assert rests == [0]
+
+
+def test_ftp_source_resumes_after_disconnect(monkeypatch):
+    rests = _fake_server(monkeypatch, [
+        (1000, ConnectionResetError("reset"), None),
+        (2000, TimeoutError("timed out"), None),
+        (None, None, None),
+    ])
+
+    with price_processor.open_source_text("/prices/ap.csv.gz") as f:
+        assert list(f) == LINES
+    assert rests == [0, 1000, 3000]
+
+
+def test_ftp_source_resumes_when_server_reports_abort(monkeypatch):
+    cut = len(PAYLOAD) // 2
+    rests = _fake_server(monkeypatch, [
+        (None, None, None),
+        (None, None, None),
+    ])
+    real_open = price_processor._ftp_open_transfer
+
+    def truncated_first(remote_path, rest=None):
+        ftp, conn = real_open(remote_path, rest)
+        if not rest:
+            conn.data = conn.data[:cut]
+            ftp.voidresp_error = ftplib.error_temp("426 Connection closed; transfer aborted")
+        return ftp, conn
+
+    monkeypatch.setattr(price_processor, "_ftp_open_transfer", truncated_first)
+
+    with price_processor.open_source_text("/prices/ap.csv.gz") as f:
+        assert list(f) == LINES
+    assert rests == [0, cut]
+
+
+def test_ftp_source_gives_up_after_max_resumes(monkeypatch):
+    monkeypatch.setenv("FTP_MAX_RESUMES", "1")
+    _fake_server(monkeypatch, [
+        (100, ConnectionResetError("reset"), None),
+        (100, ConnectionResetError("reset"), None),
+    ])
+
+    with pytest.raises(RuntimeError, match="failed at 200 bytes"):
+        with price_processor.open_source_text("/prices/ap.csv.gz") as f:
+            list(f)
+
+
+def test_ftps_falls_back_to_plain_ftp(monkeypatch):
+    monkeypatch.setenv("FTP_HOST", "ftp.test")
+    monkeypatch.setenv("FTP_USER", "user")
+    monkeypatch.setenv("FTP_PASS", "secret")
+
+    def no_tls(*args, **kwargs):
+        raise ftplib.error_perm("530 TLS not available")
+
+    class PlainFtp:
+        def __init__(self, host, timeout=None):
+            self.commands = []
+
+        def set_pasv(self, val):
+            pass
+
+        def login(self, user, pwd):
+            pass
+
+        def voidcmd(self, cmd):
+            self.commands.append(cmd)
+
+        def transfercmd(self, cmd, rest=None):
+            self.commands.append((cmd, rest))
+            return "data-socket"
+
+    monkeypatch.setattr(price_processor.ftplib, "FTP_TLS", no_tls)
+    monkeypatch.setattr(price_processor.ftplib, "FTP", PlainFtp)
+
+    ftp, conn = price_processor._ftp_open_transfer("/prices/ap.csv.gz", rest=4096)
+
+    assert conn == "data-socket"
+    assert ftp.commands == ["TYPE I", ("RETR /prices/ap.csv.gz", 4096)]
+
+
+def test_ftp_fingerprint_uses_mdtm_and_size(monkeypatch):
+    monkeypatch.setenv("FTP_HOST", "ftp.test")
+    monkeypatch.setenv("FTP_USER", "user")
+    monkeypatch.setenv("FTP_PASS", "secret")
+
+    class StatFtp:
+        files = {"/prices/ap.csv.gz": ("20261017083000", 4096)}
+        instances = []
+
+        def __init__(self, host, timeout=None):
+            self.commands = []
+            StatFtp.instances.append(self)
+
+        def auth(self):
+            raise ftplib.error_perm("530 TLS not available")
+
+        def prot_p(self):
+            pass
+
+        def set_pasv(self, val):
+            pass
+
+        def login(self, user, pwd):
+            pass
+
+        def voidcmd(self, cmd):
+            self.commands.append(cmd)
+
+        def sendcmd(self, cmd):
+            self.commands.append(cmd)
+            path = cmd.split(" ", 1)[1]
+            if path not in self.files:
+                raise ftplib.error_perm("550 No such file")
+            return f"213 {self.files[path][0]}"
+
+        def size(self, path):
+            if path not in self.files:
+                raise ftplib.error_perm("550 No such file")
+            return self.files[path][1]
+
+        def quit(self):
+            self.commands.append("QUIT")
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(price_processor.ftplib, "FTP_TLS", StatFtp)
+    monkeypatch.setattr(price_processor.ftplib, "FTP", StatFtp)
+
+    assert price_processor.ftp_fingerprint("/prices/ap.csv.gz") == "20261017083000:4096"
+    assert StatFtp.instances[-1].commands == ["TYPE I", "MDTM /prices/ap.csv.gz", "QUIT"]
+    assert price_processor.ftp_fingerprint("/prices/missing.csv.gz") is None
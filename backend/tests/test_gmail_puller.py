@@ -0,0 +1,319 @@
+import base64
+import io
+import json
+import zipfile
+from types import SimpleNamespace
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from app import gmail_puller_motorol as puller
+from app.config import parse_supplier
+from app.price_processor import LineSource, prepare_standard_df
+from app.scheduler import IMPORTED, UNCHANGED, GmailSource, Scheduler, SchedulerState
+
+
+def _zip_b64(text: str) -> str:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("09033.cennik.csv", text)
+    return base64.urlsafe_b64encode(buf.getvalue()).decode("ascii")
+
+
+class FakeRequest:
+    def __init__(self, gmail, name, fn):
+        self.gmail, self.name, self.fn = gmail, name, fn
+
+    def execute(self):
+        self.gmail.calls.append(self.name)
+        return self.fn()
+
+
+class FakeBatch:
+    def __init__(self, gmail, callback):
+        self.gmail, self.callback, self.requests = gmail, callback, []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        assert len(self.requests) <= puller.BATCH_SIZE
+        self.gmail.calls.append("batch")
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request.fn(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+class FakeGmail:
+    """users.messages.list/get, attachments.get, history.list, getProfile і batch; calls — HTTP-запити."""
+
+    def __init__(self):
+        self.msgs = {}
+        self.history_id = 100
+        self.min_history_id = 0
+        self.calls = []
+        self.get_params = []
+        self.flaky = set()
+
+    def add(self, msg_id, ts, filename=puller.REQUIRED_FILENAME, text="A1\tBOSCH\t> 5\t10,5\n"):
+        self.history_id += 1
+        self.msgs[msg_id] = dict(ts=ts, filename=filename, data=_zip_b64(text), history=self.history_id)
+
+    # --- ресурси ---
+    def users(self):
+        return self
+
+    def messages(self):
+        return SimpleNamespace(list=self._list, get=self._get,
+                               attachments=lambda: SimpleNamespace(get=self._attachment))
+
+    def history(self):
+        return SimpleNamespace(list=self._history)
+
+    def getProfile(self, userId, fields=None):
+        return FakeRequest(self, "getProfile", lambda: {"historyId": str(self.history_id)})
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+    # --- методи ---
+    def _list(self, userId, q, maxResults, fields=None):
+        newest = sorted(self.msgs, key=lambda i: self.msgs[i]["ts"], reverse=True)[:maxResults]
+        return FakeRequest(self, "messages.list", lambda: {"messages": [{"id": i} for i in newest]})
+
+    def _get(self, userId, id, format=None, fields=None):
+        self.get_params.append((format, fields))
+        msg = self.msgs[id]
+
+        def run():
+            if id in self.flaky:
+                self.flaky.discard(id)
+                raise HttpError(httplib2.Response({"status": "429"}), b"{}")
+            if format == "metadata":
+                return {"id": id, "internalDate": str(msg["ts"])}
+            part = {"filename": msg["filename"], "body": {"attachmentId": f"att-{id}"}}
+            return {"id": id, "payload": {"parts": [{"filename": "", "body": {}}, part]}}
+        return FakeRequest(self, "messages.get", run)
+
+    def _attachment(self, userId, messageId, id, fields=None):
+        assert id == f"att-{messageId}"
+        return FakeRequest(self, "attachments.get", lambda: {"data": self.msgs[messageId]["data"]})
+
+    def _history(self, userId, startHistoryId, historyTypes=None, fields=None, pageToken=None):
+        def run():
+            if int(startHistoryId) < self.min_history_id:
+                raise HttpError(httplib2.Response({"status": "404"}), b"{}")
+            added = [i for i, m in self.msgs.items() if m["history"] > int(startHistoryId)]
+            return {"history": [{"messagesAdded": [{"message": {"id": i}}]} for i in added],
+                    "historyId": str(self.history_id)}
+        return FakeRequest(self, "history.list", run)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    state_dir = tmp_path / "state"
+    monkeypatch.setattr(puller, "TMP_DIR", tmp_path)
+    monkeypatch.setattr(puller, "STATE_DIR", state_dir)
+    monkeypatch.setattr(puller, "STATE_FILE", state_dir / "gmail_puller_state.json")
+    monkeypatch.setattr(puller, "LEGACY_STATE_FILE", tmp_path / "legacy" / "gmail_puller_state.json")
+    processed = []
+
+    def fake_process_all_prices(supplier, supplier_id, remote_gz_path, **kwargs):
+        assert isinstance(remote_gz_path, LineSource)
+        with remote_gz_path.open() as lines:
+            processed.append("".join(lines))
+        return [{"profile": "site"}]
+
+    monkeypatch.setattr(puller, "process_all_prices", fake_process_all_prices)
+    puller.ensure_tmp()
+    return SimpleNamespace(gmail=FakeGmail(), processed=processed)
+
+
+def _state():
+    return json.loads(puller.STATE_FILE.read_text(encoding="utf-8"))
+
+
+def test_first_poll_batches_metadata_and_fetches_attachment_once(env):
+    gmail = env.gmail
+    gmail.add("old", ts=1000)
+    gmail.add("mid", ts=2000)
+    gmail.add("new", ts=3000, filename="09033.cennik.zip.txt")   # filename: у пошуку Gmail — не точний збіг
+
+    puller.find_and_process_latest(gmail)
+
+    assert gmail.calls == ["getProfile", "messages.list", "batch",
+                           "messages.get", "messages.get", "attachments.get"]
+    assert gmail.get_params[:3] == [("metadata", puller.META_FIELDS)] * 3
+    assert env.processed == ["A1;BOSCH;10;10,5\n"]
+    assert _state()["processed"] == ["mid"]
+    assert _state()["history_id"] == str(gmail.history_id)
+    assert [p.name for p in puller.TMP_DIR.iterdir()] == ["state"]   # ні zip, ні CSV на диску
+
+
+def test_poll_without_new_mail_is_one_call(env):
+    gmail = env.gmail
+    gmail.add("a", ts=1000)
+    puller.find_and_process_latest(gmail)
+
+    gmail.calls.clear()
+    puller.find_and_process_latest(gmail)
+
+    assert gmail.calls == ["history.list"]
+    assert len(env.processed) == 1
+
+
+def test_new_mail_is_picked_up_incrementally(env):
+    gmail = env.gmail
+    gmail.add("a", ts=1000)
+    puller.find_and_process_latest(gmail)
+
+    gmail.add("b", ts=2000, text="B2\tFEBI\t3\t1,0\n")
+    gmail.flaky = {"b"}   # 429 всередині batch → повтор поодинці
+    gmail.calls.clear()
+    puller.find_and_process_latest(gmail)
+
+    assert gmail.calls[:3] == ["history.list", "messages.list", "batch"]
+    assert gmail.calls.count("attachments.get") == 1
+    assert env.processed[-1] == "B2;FEBI;3;1,0\n"
+    assert sorted(_state()["processed"]) == ["a", "b"]
+    assert _state()["history_id"] == str(gmail.history_id)
+
+
+def test_expired_history_falls_back_to_full_sync(env):
+    gmail = env.gmail
+    gmail.add("a", ts=1000)
+    puller.save_state({"processed": [], "history_id": "5"})
+    gmail.min_history_id = 50
+
+    puller.find_and_process_latest(gmail)
+
+    assert gmail.calls[:2] == ["history.list", "getProfile"]
+    assert len(env.processed) == 1
+    assert _state()["history_id"] == str(gmail.history_id)
+
+
+def test_failed_processing_does_not_advance_history(env, monkeypatch):
+    gmail = env.gmail
+    gmail.add("a", ts=1000)
+    puller.save_state({"processed": [], "history_id": "100"})
+
+    def boom(**kwargs):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(puller, "process_all_prices", boom)
+    with pytest.raises(RuntimeError):
+        puller.find_and_process_latest(gmail)
+    assert _state() == {"processed": [], "history_id": "100"}
+
+
+def test_legacy_state_location_is_read_once_and_moved(env):
+    puller.LEGACY_STATE_FILE.parent.mkdir()
+    puller.LEGACY_STATE_FILE.write_text(json.dumps({"processed": ["a"], "history_id": "7"}), encoding="utf-8")
+
+    assert puller.load_state() == {"processed": ["a"], "history_id": "7"}
+    puller.save_state({"processed": ["a"], "history_id": "8"})
+    assert _state()["history_id"] == "8" and puller.load_state()["history_id"] == "8"
+
+
+def test_cli_after_upgrade_continues_from_legacy_state(env, monkeypatch):
+    gmail = env.gmail
+    gmail.add("a", ts=1000)
+    puller.LEGACY_STATE_FILE.parent.mkdir()
+    puller.LEGACY_STATE_FILE.write_text(
+        json.dumps({"processed": ["a"], "history_id": str(gmail.history_id)}), encoding="utf-8",
+    )
+    monkeypatch.setattr(puller, "gmail_service", lambda: gmail)
+
+    puller.main()   # ensure_tmp() + опитування, як із командного рядка
+
+    assert gmail.calls == ["history.list"]   # курсор зі старого файлу, без повної синхронізації
+    assert env.processed == []               # лист "a" не імпортується вдруге
+
+
+def _gmail_scheduler(tmp_path, gmail, runner):
+    node = {"supplier_id": 3, "schedule": {"source": "gmail", "query": puller.GMAIL_QUERY,
+                                           "attachment": puller.REQUIRED_FILENAME, "interval": 600}}
+    motorol = parse_supplier("MOTOROL", node, "MOTOROL")
+    scheduler = Scheduler(
+        {"MOTOROL": motorol},
+        state=SchedulerState(tmp_path / "scheduler_state.json"),
+        runner=runner,
+        sources={"gmail": lambda schedule: GmailSource(schedule, service_factory=lambda: gmail)},
+    )
+    return scheduler, motorol
+
+
+def test_scheduler_and_cli_share_one_gmail_cursor(env, tmp_path):
+    gmail = env.gmail
+    imported = []
+
+    def runner(supplier, source, **kwargs):
+        with source.open() as lines:
+            imported.append("".join(lines))
+        return [{"name": "site_1_33_csv", "url": "https://r2.test/x.csv"}]
+
+    scheduler, motorol = _gmail_scheduler(tmp_path, gmail, runner)
+    gmail.add("a", ts=1000)
+    assert scheduler.run_once(motorol) == IMPORTED
+    assert "message" not in scheduler.state.get("MOTOROL")     # курсор — лише у стані puller-а
+
+    # CLI після планувальника: лист "a" уже оброблено — один history.list і жодного імпорту
+    gmail.calls.clear()
+    puller.find_and_process_latest(gmail)
+    assert gmail.calls == ["history.list"] and env.processed == []
+
+    # і навпаки: лист, імпортований CLI, планувальник не бере вдруге
+    gmail.add("b", ts=2000, text="B2\tFEBI\t3\t1,0\n")
+    puller.find_and_process_latest(gmail)
+    assert scheduler.run_once(motorol) == UNCHANGED
+    assert len(imported) == 1 and env.processed == ["B2;FEBI;3;1,0\n"]
+    assert sorted(_state()["processed"]) == ["a", "b"]
+
+
+def test_busy_cursor_is_skipped_not_shared(env, tmp_path):
+    gmail = env.gmail
+    gmail.add("a", ts=1000)
+    scheduler, motorol = _gmail_scheduler(tmp_path, gmail, runner=None)
+
+    with puller.cursor_lock() as locked:   # напр. CLI посеред імпорту
+        assert locked
+        assert scheduler.run_once(motorol) == UNCHANGED
+        puller.find_and_process_latest(gmail)
+    assert gmail.calls == [] and env.processed == []
+
+    puller.find_and_process_latest(gmail)  # блокування знято
+    assert len(env.processed) == 1
+
+
+def _legacy_format(input_csv, output_csv):
+    """Колишній format_motorol_csv (файл → файл) — еталон для потокового форматування."""
+    import csv
+    import re
+    with open(input_csv, newline="", encoding="utf-8", errors="ignore") as src, \
+            open(output_csv, "w", newline="", encoding="utf-8") as dst:
+        writer = csv.writer(dst, delimiter=";")
+        for row in csv.reader(src, delimiter="\t"):
+            joined = re.sub(r">\s*5", "10", re.sub(r";\s+", ";", ";".join(row)))
+            writer.writerow(joined.split(";"))
+
+
+@pytest.mark.parametrize("block_rows", [1, 2, 10_000])
+def test_streamed_zip_parses_like_formatted_file(tmp_path, monkeypatch, block_rows):
+    monkeypatch.setattr(puller, "FORMAT_BLOCK_ROWS", block_rows)
+    text = ("A1\t 4001\tFilter \"12\"\"\"\tBOSCH\t> 5\t10,5\r\n"
+            "B2\t4002\tPad;set\tFEBI\t3\t1,00\r\n"
+            "C3\t4003\tBelt\tGATES\t0\t7,25\r\n"
+            "D4\t4004\tPump\tSKF\t>5\t99\r\n")
+    (tmp_path / "raw.csv").write_text(text, encoding="utf-8", newline="")
+    _legacy_format(tmp_path / "raw.csv", tmp_path / "formatted.csv")
+    raw_zip = base64.urlsafe_b64decode(_zip_b64(text))
+
+    expected = prepare_standard_df(str(tmp_path / "formatted.csv"), "MOTOROL")
+    source = LineSource("gmail:test", lambda: puller.open_motorol_zip(raw_zip))
+    streamed = prepare_standard_df(source, "MOTOROL")
+
+    assert len(expected) == 2   # B2 (";" у назві зсуває колонки) і C3 (stock 0) відкидаються, як і раніше
+    assert streamed.equals(expected)
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from app.import_jobs import CANCELLED, FAILED, QUEUED, SUCCEEDED, ImportJobQueue
+from app.price_manager import ImportCancelled
+
+
+class BlockingRunner:
+    """Замість process_all_prices: звітує прогрес і чекає на release (або скасування)."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, supplier, remote_gz_path, progress=None, is_cancelled=None, **options):
+        self.calls.append((supplier, remote_gz_path))
+        progress("site", {"status": "running", "rows": 0})
+        progress("retail", {"status": "pending"})
+        self.started.set()
+        while not self.release.wait(0.01):
+            if is_cancelled():
+                raise ImportCancelled("Import cancelled")
+        if supplier == "BROKEN":
+            raise RuntimeError("boom")
+        progress("site", {"status": "done", "key": "k", "rows": 10})
+        progress("retail", {"status": "done", "key": "k2"})
+        return [{"name": "site", "key": "k"}, {"name": "retail", "key": "k2"}]
+
+
+def _wait(job, timeout=5):
+    for _ in range(int(timeout / 0.01)):
+        if job.to_dict()["finished_at"]:
+            return job.to_dict()
+        threading.Event().wait(0.01)
+    raise AssertionError("job did not finish")
+
+
+@pytest.fixture
+def queue():
+    runner = BlockingRunner()
+    q = ImportJobQueue(workers=1, runner=runner)
+    yield q, runner
+    runner.release.set()
+    q.shutdown(wait=True)
+
+
+def test_job_reports_progress_and_results(queue):
+    q, runner = queue
+    job, created = q.submit("AP_GDANSK", "/in.gz")
+    assert created
+    assert runner.started.wait(5)
+
+    running = q.get(job.id).to_dict()
+    assert running["status"] == "running"
+    assert running["profiles"] == [
+        {"name": "site", "status": "running", "rows": 0},
+        {"name": "retail", "status": "pending"},
+    ]
+
+    runner.release.set()
+    done = _wait(job)
+    assert done["status"] == SUCCEEDED
+    assert [p["status"] for p in done["profiles"]] == ["done", "done"]
+    assert done["results"][0]["key"] == "k"
+
+
+def test_same_supplier_is_deduplicated_while_active(queue):
+    q, runner = queue
+    job, _ = q.submit("AP_GDANSK", "/in.gz")
+    again, created = q.submit("ap_gdansk", "/other.gz")
+    assert not created and again is job
+
+    runner.release.set()
+    _wait(job)
+    fresh, created = q.submit("AP_GDANSK", "/in.gz")
+    assert created and fresh.id != job.id
+    _wait(fresh)
+
+
+def test_cancel_running_and_queued_jobs(queue):
+    q, runner = queue
+    running, _ = q.submit("AP_GDANSK", "/a.gz")
+    queued, _ = q.submit("MOTOROL", "/b.gz")   # один воркер — друга задача чекає
+    assert runner.started.wait(5)
+    assert queued.to_dict()["status"] == QUEUED
+
+    q.cancel(queued.id)
+    assert queued.to_dict()["status"] == CANCELLED
+    q.cancel(running.id)
+    done = _wait(running)
+
+    assert done["status"] == CANCELLED
+    assert [p["status"] for p in done["profiles"]] == [CANCELLED, "skipped"]
+    assert runner.calls == [("AP_GDANSK", "/a.gz")]
+    assert q.cancel("missing") is None
+
+
+def test_reprice_job_shares_supplier_dedupe(queue):
+    q, runner = queue
+    calls = []
+    q.reprice_runner = lambda supplier, progress=None, is_cancelled=None, **options: calls.append(
+        (supplier, options)) or []
+
+    job, _ = q.submit("AP_GDANSK", "/a.gz")
+    same, created = q.submit_reprice("AP_GDANSK")
+    assert not created and same is job
+
+    runner.release.set()
+    _wait(job)
+    reprice, created = q.submit_reprice("AP_GDANSK", profile_filter="exist")
+    done = _wait(reprice)
+    assert created and done["kind"] == "reprice" and done["status"] == SUCCEEDED
+    assert calls == [("AP_GDANSK", {"profile_filter": "exist"})]
+
+
+def test_failed_job_keeps_error(queue):
+    q, runner = queue
+    runner.release.set()
+    job, _ = q.submit("BROKEN", "/a.gz")
+    done = _wait(job)
+    assert done["status"] == FAILED
+    assert done["error"] == "boom"
+    assert q.list()[0] is job
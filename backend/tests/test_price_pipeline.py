@@ -0,0 +1,521 @@
+import contextlib
+import gzip
+import io
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from app import price_manager, price_processor, snapshots
+from app.config import get_profiles
+from app.storage import CONTENT_HASH_META, SOURCE_HASH_META
+
+RAW_AP_GDANSK = (
+    "SYMBOL CENA KLIENTA STAN\n"
+    "OC 90 KNECHT 12,50 3\n"
+    "W712 MANN 7.10 > 5\n"
+    "HU719 MANN 9,99 > 5\n"
+    "X1 BOSCH 1,00 0\n"
+)
+
+
+class FakeStorage:
+    started = []
+    uploads = []
+    sweeps = []
+    inline_cleanups = []
+    headers = {}
+    metadata = {}
+
+    def upload_fileobj(self, fileobj, key, content_type=None, cleanup_prefix=None, keep_last=7,
+                       metadata=None, **extra):
+        FakeStorage.started.append(key)
+        body = fileobj.read()   # як у S3: об'єкт з'являється лише після повного вивантаження
+        if cleanup_prefix:
+            FakeStorage.inline_cleanups.append(cleanup_prefix)
+        FakeStorage.headers[key] = (content_type, extra)   # extra — інші ExtraArgs (напр. Content-Encoding)
+        FakeStorage.metadata[key] = dict(metadata or {})
+        FakeStorage.uploads.append((key, body))
+        return self.url_for(key)
+
+    def latest_content_hash(self, prefix, field=CONTENT_HASH_META):
+        keys = [key for key, _ in FakeStorage.uploads if key.startswith(prefix)]
+        if not keys:
+            return None, None
+        return keys[-1], FakeStorage.metadata.get(keys[-1], {}).get(field)
+
+    def url_for(self, key):
+        return f"https://r2.test/{key}"
+
+    def apply_retention(self, policies):
+        FakeStorage.sweeps.append(dict(policies))
+        return {prefix: 1 for prefix in policies}
+
+
+class FakeCatalog:
+    frames = []
+
+    def __init__(self, supplier_id):
+        self.supplier_id = supplier_id
+
+    def begin(self):
+        FakeCatalog.frames = []
+
+    def append(self, out_df):
+        FakeCatalog.frames.append(out_df)
+
+    def finish(self):
+        return {"mode": "fake", "ok": True, "rows": sum(len(f) for f in FakeCatalog.frames)}
+
+    def abort(self):
+        pass
+
+
+def _patch_io(monkeypatch, tmp_path):
+    FakeStorage.started = []
+    FakeStorage.uploads = []
+    FakeStorage.sweeps = []
+    FakeStorage.inline_cleanups = []
+    FakeStorage.headers = {}
+    FakeStorage.metadata = {}
+    # тести нижче порівнюють повторні вивантаження; пропуск незмінених — окремий тест
+    monkeypatch.setenv("R2_SKIP_UNCHANGED", "0")
+    monkeypatch.setattr(price_processor, "TEMP_DIR", tmp_path / "temp")
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(price_processor, "StorageClient", FakeStorage)
+    monkeypatch.setattr(price_processor, "make_catalog_loader", FakeCatalog)
+    monkeypatch.setattr(price_manager, "eur_to_uah_quote", lambda **kw: {"rate": 50.0, "source": "test"})
+
+
+def test_process_all_prices_parses_source_once(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+
+    calls = []
+    real_prepare = price_manager.prepare_standard_df
+
+    def counting_prepare(*args, **kwargs):
+        calls.append(args)
+        return real_prepare(*args, **kwargs)
+
+    monkeypatch.setattr(price_manager, "prepare_standard_df", counting_prepare)
+
+    results = price_manager.process_all_prices("AP_GDANSK", str(src))
+
+    assert len(calls) == 1
+    assert [r["name"] for r in results] == [
+        "netto_xlsx", "x1_23_xlsx", "x1_27_xlsx", "exist_1_33_xlsx", "site_1_33_csv",
+    ]
+    assert all(r["url"].startswith("https://r2.test/") for r in results)
+    assert len(FakeStorage.uploads) == 5
+    # code_key іде в БД, але не в site-CSV
+    assert FakeCatalog.frames[0][["code", "code_key"]].values.tolist() == [["OC90", "OC90"]]
+    assert b"code_key" not in FakeStorage.uploads[-1][1]
+
+
+def test_fan_out_matches_single_profile_run(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+
+    price_manager.process_all_prices("AP_GDANSK", str(src), profile_filter="site")
+    fanned_out = FakeStorage.uploads[-1][1]
+
+    price_processor.process_one_price(
+        remote_gz_path=str(src),
+        supplier="AP_GDANSK",
+        supplier_id=2,
+        factor=1.33,
+        currency_out="EUR",
+        format_="csv",
+        rounding={"EUR": 2, "UAH": 0},
+        r2_prefix="1_33/site/ap_gdansk/",
+        columns=[
+            {"from": "supplier_id", "header": "supplier_id"},
+            {"from": "code", "header": "code"},
+            {"from": "unicode", "header": "unicode"},
+            {"from": "brand", "header": "brand"},
+            {"from": "name", "header": "name"},
+            {"from": "stock", "header": "stock"},
+            {"from": "price", "header": "price_eur"},
+        ],
+        csv_cfg={"delimiter": ";", "header": True},
+    )
+    assert FakeStorage.uploads[-1][1] == fanned_out
+
+
+def test_delete_input_after_waits_for_all_profiles(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+
+    results = price_manager.process_all_prices("AP_GDANSK", str(src), delete_input_after=True)
+
+    assert len(results) == 5
+    assert not src.exists()
+
+
+def test_prepare_standard_df_is_shared_read_only(tmp_path):
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+
+    df_std = price_processor.prepare_standard_df(str(src), "AP_GDANSK")
+    before = df_std.copy()
+    price_processor._build_output_df(
+        df_std,
+        price_processor._apply_pricing(df_std, 1.27, "EUR", 1.0, {"EUR": 2}),
+        columns_cfg=[{"from": "supplier_id", "header": "supplier_id"}],
+        supplier_id=2,
+    )
+
+    pd.testing.assert_frame_equal(df_std, before)
+
+
+def _big_raw(n: int) -> str:
+    brands = ["KNECHT", "MANN", "BOSCH", "FEBI"]
+    stocks = ["> 5", "1", "2", "0", "STAN"]
+    lines = [f"C{i};{brands[i % 4]};{i % 97},{i % 100:02d};{stocks[i % 5]}" for i in range(n)]
+    return "SYMBOL;CENA;KLIENTA;STAN\n" + "\n".join(lines) + "\n"
+
+
+def test_streaming_output_matches_in_memory(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(1000), encoding="utf-8")
+
+    price_manager.process_all_prices("AP_GDANSK", str(src))
+    in_memory = {key: body for key, body in FakeStorage.uploads}
+    db_in_memory = pd.concat(FakeCatalog.frames, ignore_index=True)
+
+    FakeStorage.uploads = []
+    results = price_manager.process_all_prices("AP_GDANSK", str(src), chunk_size=64)
+    streamed = {key: body for key, body in FakeStorage.uploads}
+    db_streamed = pd.concat(FakeCatalog.frames, ignore_index=True)
+
+    assert [r["key"] for r in results] == list(in_memory)
+    assert len(FakeCatalog.frames) > 1
+    pd.testing.assert_frame_equal(db_streamed, db_in_memory)
+    for key, body in in_memory.items():
+        if key.endswith(".csv"):
+            assert streamed[key] == body
+        else:
+            assert streamed[key][:2] == b"PK"
+
+
+def test_streaming_empty_result_writes_header(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text("SYMBOL;CENA;KLIENTA;STAN\nX1;BOSCH;1,00;0\n", encoding="utf-8")
+
+    price_manager.process_all_prices("AP_GDANSK", str(src), profile_filter="site", chunk_size=10)
+
+    assert FakeStorage.uploads[-1][1] == b"supplier_id;code;unicode;brand;name;stock;price_eur\n"
+
+
+@pytest.mark.parametrize("chunk_size", [None, 64])
+def test_line_source_matches_file(monkeypatch, tmp_path, chunk_size):
+    _patch_io(monkeypatch, tmp_path)
+    raw = _big_raw(300)
+    src = tmp_path / "ap.csv"
+    src.write_text(raw, encoding="utf-8")
+
+    price_manager.process_all_prices("AP_GDANSK", str(src), profile_filter="site", chunk_size=chunk_size)
+    from_file = FakeStorage.uploads[-1][1]
+
+    source = price_processor.LineSource("memory:ap", lambda: contextlib.nullcontext(io.StringIO(raw)))
+    [result] = price_manager.process_all_prices(
+        "AP_GDANSK", source, profile_filter="site", chunk_size=chunk_size, delete_input_after=True,
+    )
+
+    assert FakeStorage.uploads[-1][1] == from_file
+    assert result["url"]
+    assert snapshots.load_snapshot("AP_GDANSK")[1]["source"] == "memory:ap"
+
+
+def test_progress_and_cancel_between_chunks(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(1000), encoding="utf-8")
+    aborted = []
+    monkeypatch.setattr(price_processor.ProfileStream, "abort", lambda self: aborted.append(self.file_name))
+
+    events = []
+    results = price_manager.process_all_prices(
+        "AP_GDANSK", str(src), profile_filter="site", chunk_size=100,
+        progress=lambda name, info: events.append((name, info["status"], info.get("rows"))),
+    )
+    name = results[0]["name"]
+    assert events[0] == (name, "pending", None)
+    rows = [r for n, status, r in events if status == "running"]
+    assert rows == sorted(rows) and len(rows) > 5   # прогрес після кожної порції
+    assert events[-1][:2] == (name, "done")
+    assert results[0]["key"]
+
+    seen = []
+    FakeStorage.uploads = []
+    with pytest.raises(price_manager.ImportCancelled):
+        price_manager.process_all_prices(
+            "AP_GDANSK", str(src), chunk_size=100,
+            progress=lambda name, info: seen.append(info.get("rows")),
+            is_cancelled=lambda: len(seen) > 20,
+        )
+    assert aborted   # усі потоки відкочені, нічого не вивантажено
+    assert len(seen) < 40
+    assert FakeStorage.uploads == []
+
+
+class DirStorage(FakeStorage):
+    """Як FakeStorage, але пише у файли — видно й з дочірніх процесів пулу."""
+    root = None
+
+    def upload_fileobj(self, fileobj, key, content_type=None, cleanup_prefix=None, keep_last=7, **kwargs):
+        target = DirStorage.root / key
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(fileobj.read())
+        return f"https://r2.test/{key}"
+
+
+def _uploaded(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob("*")) if p.is_file()}
+
+
+def test_parallel_profiles_match_serial(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    monkeypatch.setattr(price_processor, "StorageClient", DirStorage)
+    monkeypatch.setenv("PROFILE_POOL_START", "fork")   # щоб дочірні процеси бачили monkeypatch
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(1000), encoding="utf-8")
+
+    DirStorage.root = tmp_path / "serial"
+    serial = price_manager.process_all_prices("AP_GDANSK", str(src))
+    DirStorage.root = tmp_path / "parallel"
+    events = []
+    parallel = price_manager.process_all_prices(
+        "AP_GDANSK", str(src), workers=3, progress=lambda name, info: events.append((name, info["status"])),
+    )
+
+    assert [r["key"] for r in parallel] == [r["key"] for r in serial]
+    assert [r.get("db", {}).get("rows") for r in parallel] == [r.get("db", {}).get("rows") for r in serial]
+    serial_files, parallel_files = _uploaded(tmp_path / "serial"), _uploaded(tmp_path / "parallel")
+    assert list(parallel_files) == list(serial_files)
+    for key, body in serial_files.items():
+        if key.endswith(".csv"):
+            assert parallel_files[key] == body
+    assert sorted(n for n, status in events if status == "done") == sorted(r["name"] for r in serial)
+    assert list((tmp_path / "temp").iterdir()) == []
+
+
+def test_parallel_profile_error_is_reported_per_profile(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    monkeypatch.setattr(price_processor, "StorageClient", DirStorage)
+    monkeypatch.setenv("PROFILE_POOL_START", "fork")
+    DirStorage.root = tmp_path / "r2"
+    real_pricing = price_processor._apply_pricing
+
+    def pricing(df_std, factor, **kwargs):
+        if factor == 1.27:
+            raise ValueError("bad factor")
+        return real_pricing(df_std, factor=factor, **kwargs)
+
+    monkeypatch.setattr(price_processor, "_apply_pricing", pricing)
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+
+    results = price_manager.process_all_prices("AP_GDANSK", str(src), workers=2)
+
+    failed = [r for r in results if r.get("error")]
+    assert [(r["factor"], r["error"], r["key"]) for r in failed] == [(1.27, "bad factor", None)]
+    assert all(r["key"] for r in results if not r.get("error"))
+
+
+@pytest.mark.parametrize("chunk_size", [None, 64])
+def test_reprice_from_snapshot_matches_import(monkeypatch, tmp_path, chunk_size):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(300), encoding="utf-8")
+
+    imported = price_manager.process_all_prices("AP_GDANSK", str(src), chunk_size=chunk_size)
+    uploads = dict(FakeStorage.uploads)
+    db_import = pd.concat(FakeCatalog.frames, ignore_index=True)
+    assert (tmp_path / "snapshots" / "ap_gdansk.parquet").exists()
+    assert not list((tmp_path / "snapshots").glob(".*"))   # тимчасових файлів не лишилось
+
+    src.unlink()   # джерело більше не потрібне
+    FakeStorage.uploads = []
+    repriced = price_manager.reprice_from_snapshot("AP_GDANSK")
+
+    assert [r["key"] for r in repriced] == [r["key"] for r in imported]
+    assert repriced[0]["snapshot"]["source"] == str(src)
+    pd.testing.assert_frame_equal(pd.concat(FakeCatalog.frames, ignore_index=True), db_import)
+    for key, body in FakeStorage.uploads:
+        if key.endswith(".csv"):
+            assert body == uploads[key]
+
+
+def test_reprice_uses_new_rate_and_filter(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+    price_manager.process_all_prices("AP_GDANSK", str(src))
+
+    monkeypatch.setattr(price_manager, "eur_to_uah_quote", lambda **kw: {"rate": 100.0, "source": "test"})
+    monkeypatch.setattr(price_manager, "prepare_standard_df", lambda *a: pytest.fail("must not parse"))
+    results = price_manager.reprice_from_snapshot("AP_GDANSK", profile_filter="exist")
+
+    assert [(r["currency"], r["rate"]["rate"]) for r in results] == [("UAH", 100.0)]
+
+
+def test_reprice_without_snapshot_fails(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    monkeypatch.delenv("SNAPSHOT_R2_PREFIX", raising=False)
+    with pytest.raises(FileNotFoundError):
+        price_manager.reprice_from_snapshot("AP_GDANSK")
+
+
+@pytest.mark.parametrize("chunk_size", [None, 2])
+def test_retention_is_one_deferred_sweep(monkeypatch, tmp_path, chunk_size):
+    _patch_io(monkeypatch, tmp_path)
+    monkeypatch.setenv("R2_KEEP_127", "3")
+    src = tmp_path / "ap.csv"
+    src.write_text(RAW_AP_GDANSK, encoding="utf-8")
+
+    results = price_manager.process_all_prices("AP_GDANSK", str(src), chunk_size=chunk_size)
+
+    assert FakeStorage.inline_cleanups == []
+    assert len(FakeStorage.sweeps) == 1
+    [policies] = FakeStorage.sweeps
+    assert list(policies) == [r["key"].rsplit("/", 1)[0] + "/" for r in results]
+    assert policies["1_27/ap_gdansk/"] == 3
+    assert policies["1_23/ap_gdansk/"] == 7
+    assert all(r["retention"]["deleted"] == 1 for r in results)
+    assert not (tmp_path / "temp").exists()   # вихідні файли йдуть у R2 напряму, не через data/temp
+
+
+@pytest.mark.parametrize("codec, decompress", [
+    ("gzip", gzip.decompress),
+    pytest.param("zstd", lambda b: zstandard.ZstdDecompressor().decompressobj().decompress(b),
+                 marks=pytest.mark.skipif(zstandard is None, reason="zstandard is not installed")),
+])
+@pytest.mark.parametrize("chunk_size", [None, 64])
+def test_compressed_csv_profile(monkeypatch, tmp_path, codec, decompress, chunk_size):
+    _patch_io(monkeypatch, tmp_path)
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(1000), encoding="utf-8")
+    [plain] = price_manager.process_all_prices("AP_GDANSK", str(src), profile_filter="site")
+    plain_body = dict(FakeStorage.uploads)[plain["key"]]
+
+    FakeStorage.uploads = []
+    [site] = get_profiles().select("site")
+    key, url = price_processor.process_one_price(
+        str(src), "AP_GDANSK", 2, site.factor, site.currency_out, site.format, {"EUR": 2, "UAH": 0},
+        site.r2_prefix("AP_GDANSK"), site.columns_cfg(), dict(site.csv),
+        chunk_size=chunk_size, compression=codec,
+    )
+
+    assert key.endswith(".csv" + {"gzip": ".gz", "zstd": ".zst"}[codec])
+    # одна модель: справжній архів (.gz / .zst + application/gzip | zstd), без Content-Encoding —
+    # інакше клієнти прозоро розпакували б його і під ім'ям *.gz лежав би звичайний CSV
+    assert FakeStorage.headers[plain["key"]] == ("text/csv", {})
+    assert FakeStorage.headers[key] == ({"gzip": "application/gzip", "zstd": "application/zstd"}[codec], {})
+    body = dict(FakeStorage.uploads)[key]
+    assert len(body) < len(plain_body) / 2
+    assert decompress(body) == plain_body
+
+
+def test_unchanged_outputs_are_not_uploaded_again(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    monkeypatch.setenv("R2_SKIP_UNCHANGED", "1")
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(300), encoding="utf-8")
+
+    first = price_manager.process_all_prices("AP_GDANSK", str(src))
+    assert {r["upload"] for r in first} == {"uploaded"}
+    assert all(FakeStorage.metadata[r["key"]].get(CONTENT_HASH_META) for r in first)
+    uploaded = len(FakeStorage.uploads)
+    FakeStorage.sweeps = []
+    FakeStorage.started = []
+
+    # той самий прайс ще раз: вивантаження навіть не відкривається, ключі — попередні,
+    # retention не чіпається
+    again = price_manager.process_all_prices("AP_GDANSK", str(src))
+    assert {r["upload"] for r in again} == {"unchanged"}
+    assert [r["key"] for r in again] == [r["key"] for r in first]
+    assert len(FakeStorage.uploads) == uploaded
+    assert FakeStorage.started == []
+    assert FakeStorage.sweeps == []
+
+    # новий курс змінює лише UAH-профіль
+    monkeypatch.setattr(price_manager, "eur_to_uah_quote", lambda **kw: {"rate": 51.0, "source": "test"})
+    repriced = price_manager.reprice_from_snapshot("AP_GDANSK")
+    assert {r["name"]: r["upload"] for r in repriced} == {
+        "netto_xlsx": "unchanged", "x1_23_xlsx": "unchanged", "x1_27_xlsx": "unchanged",
+        "exist_1_33_xlsx": "uploaded", "site_1_33_csv": "unchanged",
+    }
+    assert len(FakeStorage.uploads) == uploaded + 1
+    assert list(FakeStorage.sweeps[0]) == ["1_33/exist/ap_gdansk/"]
+
+
+def test_streaming_skips_unchanged_source_without_reading_it(monkeypatch, tmp_path):
+    _patch_io(monkeypatch, tmp_path)
+    monkeypatch.setenv("R2_SKIP_UNCHANGED", "1")
+    reads = []
+    real_open = price_processor.open_source_text
+    monkeypatch.setattr(price_processor, "open_source_text", lambda path: reads.append(path) or real_open(path))
+    src = tmp_path / "ap.csv"
+    src.write_text(_big_raw(300), encoding="utf-8")
+    profile = dict(profile_filter="netto", chunk_size=64)   # лише xlsx-профіль, без БД
+
+    first = price_manager.process_all_prices("AP_GDANSK", str(src), **profile)
+    assert [r["upload"] for r in first] == ["uploaded"] and len(reads) == 1   # змінене — один прохід
+    assert FakeStorage.metadata[first[0]["key"]].get(SOURCE_HASH_META)
+
+    FakeStorage.started = []
+    again = price_manager.process_all_prices("AP_GDANSK", str(src), **profile)
+    assert [r["upload"] for r in again] == ["unchanged"] and again[0]["key"] == first[0]["key"]
+    assert len(reads) == 1 and FakeStorage.started == []   # джерело не читалось, вивантаження не було
+    assert snapshots.snapshot_path("AP_GDANSK").exists()   # знімок з першого імпорту лишається
+
+    # змінений файл — новий відбиток, один прохід і нове вивантаження
+    src.write_text(_big_raw(301), encoding="utf-8")
+    changed = price_manager.process_all_prices("AP_GDANSK", str(src), **profile)
+    assert [r["upload"] for r in changed] == ["uploaded"] and len(reads) == 2
+
+
+def test_source_fingerprint(monkeypatch, tmp_path):
+    src = tmp_path / "ap.csv"
+    src.write_text("A;1\n", encoding="utf-8")
+    assert price_processor.source_fingerprint(str(src)) == price_processor.source_fingerprint(str(src))
+    before = price_processor.source_fingerprint(str(src))
+    src.write_text("A;2\n", encoding="utf-8")
+    assert price_processor.source_fingerprint(str(src)) != before
+
+    # FTP — MDTM/SIZE без завантаження
+    monkeypatch.setattr(price_processor, "ftp_fingerprint", lambda path: "20261017:100")
+    assert price_processor.source_fingerprint("/prices/ap.csv.gz") == "ftp:/prices/ap.csv.gz:20261017:100"
+    monkeypatch.setattr(price_processor, "ftp_fingerprint", lambda path: None)
+    assert price_processor.source_fingerprint("/prices/ap.csv.gz") is None
+    assert price_processor.source_fingerprint(price_processor.LineSource("memory", lambda: None, "x1")) == "x1"
+
+
+def test_content_hash_ignores_chunking():
+    df = pd.DataFrame({"code": ["A", "B", "C"], "price": [1.0, 2.5, 3.0]})
+    cols = [{"from": "code", "header": "code"}, {"from": "price", "header": "price"}]
+    whole = price_processor._ContentHash("csv", cols, {}, None).update(df).hexdigest()
+    parts = price_processor._ContentHash("csv", cols, {}, None).update(df.iloc[:1]).update(df.iloc[1:]).hexdigest()
+    assert whole == parts
+    assert price_processor._ContentHash("csv", cols, {}, "gzip").update(df).hexdigest() != whole
+    assert price_processor._ContentHash("csv", cols, {}, None).update(df.assign(price=[1.0, 2.5, 3.1])).hexdigest() != whole
+
+
+def test_chunk_size_from_env(monkeypatch):
+    monkeypatch.setenv("PRICE_CHUNK_ROWS", "5000")
+    assert price_processor.stream_chunk_size() == 5000
+    assert price_processor.stream_chunk_size(10) == 10
+    monkeypatch.delenv("PRICE_CHUNK_ROWS")
+    assert price_processor.stream_chunk_size() is None
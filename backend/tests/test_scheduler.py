@@ -0,0 +1,229 @@
+import random
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.config import parse_supplier
+from app.price_manager import ImportCancelled
+from app.scheduler import CANCELLED, FAILED, IMPORTED, UNCHANGED, FtpSource, Scheduler, SchedulerState, next_delay
+
+
+def _supplier(name, supplier_id, **schedule):
+    node = {"supplier_id": supplier_id, "schedule": {"source": "ftp", "path": f"/prices/{name.lower()}.csv.gz",
+                                                      "interval": 600, "jitter": 0.1, "retry": 60, **schedule}}
+    return parse_supplier(name, node, name)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Runner:
+    def __init__(self, results=None, error=None):
+        self.calls = []
+        self.bodies = []
+        self.results = results or [{"name": "site_1_33_csv", "url": "https://r2.test/x.csv"}]
+        self.error = error
+
+    def __call__(self, supplier, source, **kwargs):
+        self.calls.append((supplier, source, kwargs))
+        self.bodies.append(Path(source).read_bytes())
+        if self.error:
+            raise self.error
+        return self.results
+
+
+def _download(path, local_path):
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    local_path.write_bytes(f"body of {path}".encode())
+
+
+def _scheduler(tmp_path, suppliers, runner, fingerprints=None, download=_download, **kwargs):
+    fps = iter(fingerprints or [])
+    sources = {"ftp": lambda schedule: FtpSource(
+        schedule, fingerprint=lambda path: next(fps), download=download, spool_dir=tmp_path / "spool",
+    )}
+    return Scheduler(
+        {s.name: s for s in suppliers},
+        state=SchedulerState(tmp_path / "scheduler_state.json"),
+        runner=runner,
+        sources=kwargs.pop("sources", sources),
+        rng=random.Random(0),
+        **kwargs,
+    )
+
+
+def test_next_delay_jitter_and_backoff():
+    schedule = _supplier("AP", 2, max_backoff=1800).schedule
+    rng = random.Random(1)
+    assert all(540 <= next_delay(schedule, 0, rng) <= 660 for _ in range(200))
+    assert all(54 <= next_delay(schedule, 1, rng) <= 66 for _ in range(50))
+    assert all(216 <= next_delay(schedule, 3, rng) <= 264 for _ in range(50))
+    assert all(1620 <= next_delay(schedule, 40, rng) <= 1980 for _ in range(50))   # стеля max_backoff
+
+
+def test_ftp_imports_only_when_file_changes(tmp_path):
+    ap = _supplier("AP_GDANSK", 2, profile_filter="site")
+    runner = Runner()
+    clock = Clock()
+    scheduler = _scheduler(tmp_path, [ap], runner, fingerprints=["t1:100", "t1:100", "t2:120"], clock=clock)
+
+    assert [scheduler.run_once(ap) for _ in range(3)] == [IMPORTED, UNCHANGED, IMPORTED]
+    # імпорт читає локальну копію (суфікс .csv.gz зберігається), після імпорту її немає
+    assert all(c[1].endswith("_ap_gdansk.csv.gz") for c in runner.calls) and len(runner.calls) == 2
+    assert runner.bodies == [b"body of /prices/ap_gdansk.csv.gz"] * 2
+    assert list((tmp_path / "spool").iterdir()) == []
+    assert runner.calls[0][2]["supplier_id"] == 2
+    assert runner.calls[0][2]["profile_filter"] == "site"
+
+    # стан на диску: після рестарту той самий файл уже не імпортується
+    entry = SchedulerState(tmp_path / "scheduler_state.json").get("AP_GDANSK")
+    assert entry["fingerprint"] == "t2:120"
+    assert entry["failures"] == 0 and entry["last_status"] == IMPORTED
+    assert 540 <= entry["next_run"] - clock.now <= 660
+
+
+def test_failures_back_off_and_retry_same_file(tmp_path):
+    ap = _supplier("AP_GDANSK", 2)
+    runner = Runner(error=ConnectionError("FTP down"))
+    clock = Clock()
+    scheduler = _scheduler(tmp_path, [ap], runner, fingerprints=["t1:100"] * 4, clock=clock)
+
+    assert scheduler.run_once(ap) == FAILED
+    assert scheduler.run_once(ap) == FAILED
+    entry = scheduler.state.get("AP_GDANSK")
+    assert entry["failures"] == 2 and entry["last_error"] == "FTP down"
+    assert "fingerprint" not in entry
+    assert 108 <= entry["next_run"] - clock.now <= 132
+
+    runner.error = None
+    runner.results = [{"name": "netto_xlsx", "error": "disk full"}]
+    assert scheduler.run_once(ap) == FAILED          # помилка профілю — теж збій
+    assert scheduler.state.get("AP_GDANSK")["failures"] == 3
+
+    runner.results = [{"name": "netto_xlsx", "url": "https://r2.test/n.xlsx"}]
+    assert scheduler.run_once(ap) == IMPORTED
+    assert scheduler.state.get("AP_GDANSK")["failures"] == 0
+    assert len(runner.calls) == 4
+    assert list((tmp_path / "spool").iterdir()) == []   # копії прибираються і після збоїв
+
+
+def test_failed_download_is_a_failure_without_import(tmp_path):
+    ap = _supplier("AP_GDANSK", 2)
+    runner = Runner()
+
+    def broken(path, local_path):
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        local_path.write_bytes(b"partial")
+        raise ConnectionError("connection reset")
+
+    scheduler = _scheduler(tmp_path, [ap], runner, fingerprints=["t1:100"], download=broken)
+    assert scheduler.run_once(ap) == FAILED
+    assert scheduler.state.get("AP_GDANSK")["last_error"] == "connection reset"
+    assert runner.calls == [] and list((tmp_path / "spool").iterdir()) == []
+
+
+def test_download_overlaps_another_suppliers_import(tmp_path):
+    """Завантаження — I/O-етап: поки S0 парситься під CPU-лімітом 1, S1 уже завантажується."""
+    s0, s1 = _supplier("S0", 1), _supplier("S1", 2)
+    s0_parsing, s1_downloading = threading.Event(), threading.Event()
+    overlapped = []
+
+    def download(path, local_path):
+        if "s1" in path:
+            assert s0_parsing.wait(5)     # S1 стартує, коли S0 вже в CPU-етапі
+            s1_downloading.set()
+        _download(path, local_path)
+
+    def runner(supplier, source, **kwargs):
+        if supplier == "S0":
+            s0_parsing.set()
+            overlapped.append(s1_downloading.wait(5))   # S0 ще парситься, а S1 уже качає
+        return []
+
+    scheduler = _scheduler(tmp_path, [s0, s1], runner, fingerprints=["a:1", "b:1"], download=download,
+                           io_limit=2, cpu_limit=1)
+    assert scheduler.run_all_once() == {"S0": IMPORTED, "S1": IMPORTED}
+    assert overlapped == [True]
+
+
+def test_cancelled_import_is_not_a_failure(tmp_path):
+    ap = _supplier("AP_GDANSK", 2)
+    clock = Clock()
+    scheduler = _scheduler(tmp_path, [ap], Runner(error=ImportCancelled("stop")), fingerprints=["t1:100"], clock=clock)
+
+    assert scheduler.run_once(ap) == CANCELLED
+    entry = scheduler.state.get("AP_GDANSK")
+    assert entry.get("failures", 0) == 0 and "fingerprint" not in entry
+    assert entry["next_run"] == clock.now
+
+
+def test_cpu_limit_serialises_imports_while_checks_overlap(tmp_path):
+    suppliers = [_supplier(f"S{i}", i + 1) for i in range(3)]
+    checks = threading.Barrier(3, timeout=5)   # усі три перевірки мають іти одночасно (I/O ліміт 3)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    class SlowSource:
+        def __init__(self, schedule):
+            self.schedule = schedule
+
+        def fetch(self, entry):
+            checks.wait()
+            return {"source": self.schedule.path, "label": "test", "commit": lambda: {}}
+
+    def runner(supplier, source, **kwargs):
+        with lock:
+            active.append(supplier)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(supplier)
+        return []
+
+    scheduler = _scheduler(tmp_path, suppliers, runner, sources={"ftp": SlowSource}, io_limit=3, cpu_limit=1)
+    assert scheduler.run_all_once() == {"S0": IMPORTED, "S1": IMPORTED, "S2": IMPORTED}
+    assert max(peak) == 1
+
+
+def test_restart_resumes_saved_schedule(tmp_path):
+    ap, mo = _supplier("AP_GDANSK", 2), _supplier("MOTOROL", 3)
+    clock = Clock()
+    state = SchedulerState(tmp_path / "scheduler_state.json")
+    state.update("AP_GDANSK", next_run=clock.now + 300)
+    state.update("MOTOROL", next_run=clock.now - 5000)
+
+    scheduler = _scheduler(tmp_path, [ap, mo], Runner(), clock=clock)
+
+    assert scheduler._initial_wait(ap) == pytest.approx(300)
+    assert 0 <= scheduler._initial_wait(mo) <= 60    # прострочено → розкид у межах jitter
+
+
+def test_only_enabled_schedules_run(tmp_path):
+    on = _supplier("AP_GDANSK", 2)
+    off = _supplier("MOTOROL", 3, enabled=False)
+    plain = parse_supplier("OTHER", {"supplier_id": 4}, "OTHER")
+    scheduler = _scheduler(tmp_path, [on, off, plain], Runner())
+    assert [s.name for s in scheduler.suppliers] == ["AP_GDANSK"]
+
+
+def test_loop_stops_on_event(tmp_path):
+    ap = _supplier("AP_GDANSK", 2, jitter=0)   # без розкиду: перша перевірка одразу
+    runner = Runner()
+    scheduler = _scheduler(tmp_path, [ap], runner, fingerprints=[f"t{i}:1" for i in range(100)])
+
+    scheduler.start()
+    deadline = time.time() + 5
+    while not runner.calls and time.time() < deadline:
+        time.sleep(0.01)
+    scheduler.stop(timeout=5)
+
+    assert len(runner.calls) == 1      # наступна перевірка — через interval, до неї потік зупинено
+    assert not any(t.is_alive() for t in scheduler._threads)
@@ -0,0 +1,182 @@
+import asyncio
+import os
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import catalog_schema, db, search_cache
+from app.catalog_loader import make_catalog_loader
+from app.routers import admin, search
+from app.search_cache import SearchCache, normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _cache(maxsize=2, ttl=60, generation=None):
+    clock = Clock()
+    gen = generation if generation is not None else {"value": 1}
+    cache = SearchCache(maxsize, ttl, check_seconds=5, generation_reader=lambda: gen["value"], timer=clock)
+    return cache, clock, gen
+
+
+def test_normalize_query():
+    assert normalize_query("  OC  90 ") == "oc 90"
+
+
+def test_hits_misses_and_lru_evictions():
+    cache, clock, _ = _cache(maxsize=2)
+    calls = []
+
+    def compute(v):
+        return lambda: calls.append(v) or [v]
+
+    assert cache.get_or_compute("a", compute("a")) == ["a"]
+    assert cache.get_or_compute("a", compute("a2")) == ["a"]
+    cache.get_or_compute("b", compute("b"))
+    cache.get_or_compute("a", compute("a3"))     # "a" — свіжий, "b" — найстаріший
+    cache.get_or_compute("c", compute("c"))      # витісняє "b"
+    cache.get_or_compute("b", compute("b2"))
+
+    assert calls == ["a", "b", "c", "b2"]
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 4, 2)
+    assert stats["size"] == 2
+
+
+def test_ttl_expiry():
+    cache, clock, _ = _cache(ttl=10)
+    cache.get_or_compute("a", lambda: 1)
+    clock.now = 11
+    assert cache.get_or_compute("a", lambda: 2) == 2
+    assert cache.stats()["expirations"] == 1
+
+
+def test_generation_bump_invalidates_after_check_interval():
+    cache, clock, gen = _cache()
+    cache.get_or_compute("a", lambda: "old")
+    gen["value"] = 2
+
+    clock.now = 1
+    assert cache.get_or_compute("a", lambda: "new") == "old"  # ще не перевіряли
+    clock.now = 6
+    assert cache.get_or_compute("a", lambda: "new") == "new"
+    assert cache.stats()["invalidations"] == 1
+    assert cache.stats()["generation"] == 2
+
+
+def test_mark_stale_forces_generation_check():
+    cache, clock, gen = _cache()
+    cache.get_or_compute("a", lambda: "old")
+    gen["value"] = 2
+    cache.mark_stale()
+    assert cache.get_or_compute("a", lambda: "new") == "new"
+
+
+def test_result_computed_during_import_is_not_cached():
+    cache, clock, gen = _cache()
+
+    def compute_while_import_finishes():
+        gen["value"] = 2
+        cache.mark_stale()
+        cache.get("other")              # інший запит уже побачив нове покоління
+        return "stale"
+
+    assert cache.get_or_compute("a", compute_while_import_finishes) == "stale"
+    assert cache.get_or_compute("a", lambda: "fresh") == "fresh"
+
+
+def test_failed_generation_read_is_retried_once_per_interval():
+    clock = Clock()
+    reads = []
+
+    def broken_reader():
+        reads.append(clock.now)
+        raise RuntimeError('relation "catalog_meta" does not exist')
+
+    cache = SearchCache(10, 60, check_seconds=5, generation_reader=broken_reader, timer=clock)
+    calls = []
+    for t in (0, 1, 2, 4):
+        clock.now = t
+        cache.get_or_compute("a", lambda: calls.append(1) or len(calls))
+
+    assert reads == [0]             # не на кожен запит, а раз на check_seconds
+    assert len(calls) == 4          # поки generation невідомий, нічого не кешується
+    clock.now = 5
+    cache.get_or_compute("a", lambda: 0)
+    assert reads == [0, 5]
+
+
+def test_async_get_or_compute_uses_async_generation_reader():
+    clock = Clock()
+    gen = {"value": 1}
+    calls = []
+
+    async def read_gen():
+        return gen["value"]
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    cache = SearchCache(10, 60, check_seconds=5, timer=clock,
+                        generation_reader=lambda: 1 / 0, async_generation_reader=read_gen)
+
+    async def run():
+        first = await cache.aget_or_compute("k", compute)
+        second = await cache.aget_or_compute("k", compute)
+        gen["value"] = 2
+        clock.now = 10
+        third = await cache.aget_or_compute("k", compute)
+        return first, second, third
+
+    assert asyncio.run(run()) == (1, 1, 2)
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_disabled_cache_always_computes():
+    cache = SearchCache(0, 60)
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert cache.get_or_compute("a", lambda: 2) == 2
+    assert cache.stats()["size"] == 0
+
+
+TEST_DB_URL = os.getenv("TEST_DATABASE_URL")
+SUPPLIER_ID = 9004
+
+
+@pytest.mark.skipif(not TEST_DB_URL, reason="TEST_DATABASE_URL is not set")
+def test_import_invalidates_search_cache(monkeypatch):
+    eng = create_engine(TEST_DB_URL)
+    monkeypatch.setattr(db, "_engine", eng)
+    monkeypatch.setattr(search_cache, "_cache", None)
+    monkeypatch.setenv("SEARCH_CACHE_CHECK_SECONDS", "3600")
+
+    def load(price):
+        loader = make_catalog_loader(SUPPLIER_ID, mode="copy", engine=eng)
+        loader.begin()
+        loader.append(pd.DataFrame({
+            "supplier_id": [SUPPLIER_ID], "code": ["QQ-777"], "unicode": ["QQ-777"], "brand": ["MANN"],
+            "name": ["Filtr"], "stock": [1], "price_eur": [price], "code_key": ["QQ777"],
+        }))
+        assert loader.finish()["ok"]
+
+    try:
+        load(1.0)
+        assert search.search_products(q="qq777", limit=5)[0]["price_eur"] == 1.0
+        assert search.search_products(q=" QQ777", limit=5)[0]["price_eur"] == 1.0
+        assert admin.search_cache_stats()["hits"] == 1
+
+        load(2.0)   # у цьому ж процесі: mark_stale + новий generation
+        assert search.search_products(q="qq777", limit=5)[0]["price_eur"] == 2.0
+        assert admin.search_cache_stats()["invalidations"] == 1
+    finally:
+        with eng.begin() as conn:
+            conn.execute(text("DELETE FROM product_catalog WHERE supplier_id = :sid"), {"sid": SUPPLIER_ID})
+        eng.dispose()
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import storage as storage_module
+from app.storage import DELETE_BATCH, StorageClient, UploadStream
+
+
+class FakeS3:
+    """list_objects_v2 (сторінки по 1000) і delete_objects — як у S3 / R2."""
+
+    def __init__(self, keys):
+        base = datetime(2026, 1, 1)
+        self.objects = {key: base + timedelta(minutes=i) for i, key in enumerate(keys)}
+        self.list_calls = []
+        self.delete_calls = []
+        self.fail_keys = set()
+
+    def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+        self.list_calls.append(Prefix)
+        keys = sorted(k for k in self.objects if k.startswith(Prefix))
+        start = int(ContinuationToken or 0)
+        page = keys[start:start + 1000]
+        resp = {"Contents": [{"Key": k, "LastModified": self.objects[k]} for k in page]}
+        if start + 1000 < len(keys):
+            resp.update(IsTruncated=True, NextContinuationToken=str(start + 1000))
+        return resp
+
+    def delete_objects(self, Bucket, Delete):
+        keys = [o["Key"] for o in Delete["Objects"]]
+        assert len(keys) <= DELETE_BATCH
+        self.delete_calls.append(keys)
+        errors = [{"Key": k, "Code": "AccessDenied", "Message": "nope"} for k in keys if k in self.fail_keys]
+        for k in keys:
+            if k not in self.fail_keys:
+                self.objects.pop(k, None)
+        return {"Errors": errors} if errors else {}
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    monkeypatch.setenv("R2_BUCKET", "test")
+    return StorageClient()
+
+
+def test_cleanup_lists_once_and_deletes_in_batches(storage):
+    keys = [f"1_23/ap/{i:05d}.xlsx" for i in range(2507)]
+    storage.s3 = FakeS3(keys + ["1_27/ap/keep.xlsx"])
+
+    deleted = storage.cleanup_old_files("1_23/ap/", keep=7)
+
+    assert deleted == 2500
+    assert [len(batch) for batch in storage.s3.delete_calls] == [1000, 1000, 500]
+    assert len(storage.s3.list_calls) == 3      # одна пагінована видача префікса
+    remaining = sorted(k for k in storage.s3.objects if k.startswith("1_23/ap/"))
+    assert remaining == sorted(keys[-7:])        # лишились найновіші
+    assert "1_27/ap/keep.xlsx" in storage.s3.objects
+
+
+def test_apply_retention_sweeps_all_prefixes(storage):
+    storage.s3 = FakeS3([f"netto/ap/{i}.xlsx" for i in range(5)] + [f"1_33/site/ap/{i}.csv" for i in range(3)])
+    storage.s3.fail_keys = {"netto/ap/0.xlsx"}
+
+    deleted = storage.apply_retention({"netto/ap/": 2, "1_33/site/ap/": 7})
+
+    assert deleted == {"netto/ap/": 2, "1_33/site/ap/": 0}   # одна помилка видалення не рахується
+    assert storage.s3.list_calls == ["netto/ap/", "1_33/site/ap/"]
+    assert len(storage.s3.delete_calls) == 1
+
+
+def test_apply_retention_continues_after_prefix_error(storage):
+    class Broken(FakeS3):
+        def list_objects_v2(self, Bucket, Prefix, ContinuationToken=None):
+            if Prefix == "1_23/ap/":
+                raise ConnectionError("boom")
+            return super().list_objects_v2(Bucket, Prefix, ContinuationToken)
+
+    storage.s3 = Broken([f"1_27/ap/{i}.xlsx" for i in range(4)])
+    assert storage.apply_retention({"1_23/ap/": 1, "1_27/ap/": 1}) == {"1_23/ap/": -1, "1_27/ap/": 3}
+
+
+class ReadingStorage:
+    """upload_fileobj, що читає потік частинами, як s3transfer."""
+
+    def __init__(self, fail_after=None):
+        self.parts = []
+        self.fail_after = fail_after
+
+    def upload_fileobj(self, fileobj, key, content_type=None, **kwargs):
+        while True:
+            part = fileobj.read(64 * 1024)
+            if not part:
+                return f"https://r2.test/{key}"
+            self.parts.append(part)
+            if self.fail_after is not None and len(self.parts) >= self.fail_after:
+                raise ConnectionError("part upload failed")
+
+
+def test_upload_stream_sends_everything_in_parts():
+    target = ReadingStorage()
+    stream = UploadStream(target, "netto/ap/x.csv", "text/csv")
+    payload = b"code;price\n" * 100_000
+    for i in range(0, len(payload), 10_000):
+        stream.write(payload[i:i + 10_000])
+    assert stream.finish() == "https://r2.test/netto/ap/x.csv"
+    assert b"".join(target.parts) == payload
+    assert len(target.parts) > 1
+
+
+def test_upload_stream_abort_fails_the_upload():
+    target = ReadingStorage()
+    stream = UploadStream(target, "netto/ap/x.csv")
+    stream.write(b"partial")
+    stream.abort()
+    assert isinstance(stream.error, storage_module.UploadAborted)
+    assert stream.url is None
+
+
+def test_upload_stream_write_fails_fast_when_upload_breaks():
+    stream = UploadStream(ReadingStorage(fail_after=1), "netto/ap/x.csv")
+    with pytest.raises(RuntimeError, match="part upload failed"):
+        for _ in range(1000):   # більше за буфер pipe: без обробки збою write() зависнув би
+            stream.write(b"x" * 64 * 1024)
+            stream.flush()
+
+
+def test_client_is_reused_and_transfer_config_from_env(monkeypatch):
+    monkeypatch.setenv("R2_PART_SIZE_MB", "16")
+    monkeypatch.setenv("R2_UPLOAD_CONCURRENCY", "8")
+    a, b = StorageClient(), StorageClient()
+    assert a.s3 is b.s3
+    assert a.transfer.multipart_chunksize == 16 * 1024 * 1024
+    assert a.transfer.max_concurrency == 8
+
+
+def test_latest_key_and_retention_on_compressed_keys(storage):
+    keys = [f"1_33/site/ap/ap_2026010{i}_1200.csv" for i in range(3)]
+    keys += [f"1_33/site/ap/ap_2026011{i}_1200.csv.gz" for i in range(3)]
+    storage.s3 = FakeS3(keys)
+    assert storage.latest_key("1_33/site/ap/") == keys[-1]
+    assert storage.cleanup_old_files("1_33/site/ap/", keep=2) == 4
+    assert sorted(storage.s3.objects) == sorted(keys[-2:])
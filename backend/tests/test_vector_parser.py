@@ -0,0 +1,109 @@
+import random
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from app import vector_parser
+from app.price_processor import raw_csv_to_rows, _rows_to_standard_df
+
+AP_GDANSK = dict(
+    colmap={"code": 0, "unicode": 0, "brand": 1, "name": 1, "stock": 3, "price": 2},
+    stock_index=3, stock_header_token="STAN", gt5_to=10, skip_rows=1, normalize_mode="spaces",
+)
+MOTOROL = dict(
+    colmap={"code": 0, "unicode": 1, "brand": 3, "name": 2, "stock": 4, "price": 5},
+    stock_index=4, stock_header_token="stan", gt5_to=10, skip_rows=0, normalize_mode="csv",
+)
+
+
+def _legacy(path: Path, cfg: dict) -> pd.DataFrame:
+    rows = raw_csv_to_rows(
+        path,
+        stock_index=cfg["stock_index"],
+        stock_header_token=cfg["stock_header_token"],
+        gt5_to=cfg["gt5_to"],
+        skip_rows=cfg["skip_rows"],
+        normalize_mode=cfg["normalize_mode"],
+    )
+    return _rows_to_standard_df(rows, cfg["colmap"])
+
+
+def _vectorized(path: Path, cfg: dict) -> pd.DataFrame:
+    return vector_parser.parse_standard_df(
+        vector_parser.read_raw_lines(path, skip_rows=cfg["skip_rows"]),
+        cfg["colmap"],
+        stock_index=cfg["stock_index"],
+        stock_header_token=cfg["stock_header_token"],
+        gt5_to=cfg["gt5_to"],
+        normalize_mode=cfg["normalize_mode"],
+    )
+
+
+def _assert_same(path: Path, cfg: dict) -> None:
+    pd.testing.assert_frame_equal(_vectorized(path, cfg), _legacy(path, cfg))
+
+
+def test_spaces_layout_matches_legacy(tmp_path):
+    path = tmp_path / "ap.csv"
+    path.write_text(
+        "SYMBOL CENA KLIENTA STAN\n"
+        "OC 90 KNECHT 12,50 3\n"
+        "W712 MANN 7.10 > 5\n"
+        "HU719 MANN 9,99 >5\n"
+        "\n"
+        "X1 BOSCH 1,00 0\n"
+        "Y2 BOSCH abc -4\n"
+        "Z3 FEBI 3,3,3 2\n"
+        "SHORT 1\n"
+        "A1 B2 C3 STAN\n",
+        encoding="utf-8",
+    )
+    _assert_same(path, AP_GDANSK)
+
+
+def test_csv_layout_matches_legacy(tmp_path):
+    path = tmp_path / "motorol.csv"
+    path.write_text(
+        "indeks;kod;nazwa;producent;stan;cena\n"
+        "OC90;OC 90;Filtr oleju;KNECHT;10;12,50\n"
+        " W712 ; ;Filtr;MANN; >5 ;7.1 EUR\n"
+        "HU719;HU719;;MANN;0;9,99\n"
+        "X1;X1;Pompa;BOSCH;+3;\n"
+        "X2;X2;Pompa;BOSCH;1_0;.5\n"
+        "X3;X3;Pompa\n",
+        encoding="utf-8",
+    )
+    _assert_same(path, MOTOROL)
+
+
+def test_empty_input_matches_legacy(tmp_path):
+    path = tmp_path / "empty.csv"
+    path.write_text("SYMBOL CENA KLIENTA STAN\n", encoding="utf-8")
+    _assert_same(path, AP_GDANSK)
+
+
+@pytest.mark.parametrize("cfg", [AP_GDANSK, MOTOROL], ids=["spaces", "csv"])
+def test_random_lines_match_legacy(tmp_path, cfg):
+    rnd = random.Random(42)
+    tokens = ["OC", "90", "KNECHT", "12,50", "7.10", "> 5", ">5", "0", "-1", "3", "STAN",
+              "a b", "", " ", "1_000", "x.y", ",", "MANN-FILTER", "Ł", "9.9.9"]
+    sep = " " if cfg["normalize_mode"] == "spaces" else ";"
+    lines = [sep.join(rnd.choice(tokens) for _ in range(rnd.randint(1, 8))) for _ in range(2000)]
+    path = tmp_path / "random.csv"
+    path.write_text("\n".join(lines), encoding="utf-8")
+    _assert_same(path, cfg)
+
+
+def test_code_key_matches_legacy_and_strips_separators(tmp_path):
+    path = tmp_path / "motorol.csv"
+    path.write_text(
+        "oc-90;OC 90;Filtr;KNECHT;1;1,00\n"
+        "OC 90;x;Filtr;KNECHT;1;1,00\n"
+        "w.712/4_1;x;Filtr;MANN;1;1,00\n"
+        "Żółw-ß1;x;Filtr;FEBI;1;1,00\n",
+        encoding="utf-8",
+    )
+    df = _vectorized(path, MOTOROL)
+    assert df["code_key"].tolist() == ["OC90", "OC90", "W71241", "ŻÓŁWSS1"]
+    _assert_same(path, MOTOROL)
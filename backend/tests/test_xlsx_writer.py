@@ -0,0 +1,77 @@
+import math
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+import pandas as pd
+
+from app.xlsx_writer import XlsxTableWriter, write_xlsx
+
+NS = {"m": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def read_cells(path):
+    """{(рядок, колонка): значення} з sheet1.xml (shared і inline рядки, числа, bool)."""
+    with zipfile.ZipFile(path) as z:
+        shared = []
+        if "xl/sharedStrings.xml" in z.namelist():
+            root = ET.fromstring(z.read("xl/sharedStrings.xml"))
+            shared = ["".join(t.text or "" for t in si.iter(f"{{{NS['m']}}}t")) for si in root.findall("m:si", NS)]
+        sheet = ET.fromstring(z.read("xl/worksheets/sheet1.xml"))
+
+    cells = {}
+    for c in sheet.iter(f"{{{NS['m']}}}c"):
+        col, row = re.match(r"([A-Z]+)(\d+)", c.get("r")).groups()
+        kind = c.get("t")
+        if kind == "s":
+            value = shared[int(c.find("m:v", NS).text)]
+        elif kind == "inlineStr":
+            value = "".join(t.text or "" for t in c.iter(f"{{{NS['m']}}}t"))
+        elif kind == "b":
+            value = c.find("m:v", NS).text == "1"
+        elif c.find("m:v", NS) is not None:
+            value = float(c.find("m:v", NS).text)
+        else:
+            continue
+        cells[(int(row), col)] = value
+    return cells
+
+
+def _frame():
+    return pd.DataFrame({
+        "code": ["OC 90", "W712", None, ""],
+        "brand": ["KNECHT", "MANN", "BOSCH", "FEBI"],
+        "stock": [3, 10, 0, 1],
+        "price_eur": [12.5, 7.1, float("nan"), math.inf],
+        "flag": [True, False, True, False],
+    })
+
+
+def test_same_cells_as_pandas_to_excel(tmp_path):
+    df = _frame()
+    df.to_excel(tmp_path / "pandas.xlsx", index=False, engine="xlsxwriter")
+    write_xlsx(df, tmp_path / "typed.xlsx")
+
+    assert read_cells(tmp_path / "typed.xlsx") == read_cells(tmp_path / "pandas.xlsx")
+
+
+def test_chunks_and_column_formats(tmp_path):
+    df = _frame()
+    columns = [{"from": "code", "header": "code", "width": 20}, {"from": "brand", "header": "brand"},
+               {"from": "stock", "header": "stock"}, {"from": "price", "header": "price_eur", "num_format": "0.00"}]
+    writer = XlsxTableWriter(tmp_path / "chunks.xlsx", columns)
+    writer.write(df.iloc[:2])
+    writer.write(df.iloc[2:])
+    writer.close(list(df.columns))
+    write_xlsx(df, tmp_path / "whole.xlsx")
+
+    assert read_cells(tmp_path / "chunks.xlsx") == read_cells(tmp_path / "whole.xlsx")
+    with zipfile.ZipFile(tmp_path / "chunks.xlsx") as z:
+        assert 'formatCode="0.00"' in z.read("xl/styles.xml").decode()
+        assert '<col min="1" max="1" width="20.7109375"' in z.read("xl/worksheets/sheet1.xml").decode()
+
+
+def test_empty_frame_writes_header_only(tmp_path):
+    writer = XlsxTableWriter(tmp_path / "empty.xlsx")
+    writer.close(["code", "price_eur"])
+    assert read_cells(tmp_path / "empty.xlsx") == {(1, "A"): "code", (1, "B"): "price_eur"}
@@ -1,10 +1,11 @@
 // src/components/CatalogList/CatalogList.jsx
 import { useSelector } from "react-redux";
 import Loader from "../Loader/Loader";
+import LoadMoreBtn from "../LoadMoreBtn/LoadMoreBtn";
 
 const CatalogList = () => {
   // Дістаємо дані (товари, статус завантаження, помилки) з Redux store
-  const {items, isLoading, error} = useSelector((state) => state.products);
+  const {items, estimatedTotal, isLoading, error, loadMoreError} = useSelector((state) => state.products);
 
   if (isLoading) return <Loader/>;
   if (error) return <p style={{color: 'red', textAlign: 'center'}}>Помилка: {error}</p>;
@@ -17,11 +18,15 @@ const CatalogList = () => {
   }
 
   return (
+    <>
+    {estimatedTotal !== null && (
+      <p style={{color: '#666'}}>Знайдено приблизно: {estimatedTotal}</p>
+    )}
     <ul style={{listStyle: "none", padding: 0}}>
       {items.map((product) => (
-        // Використовуємо комбінацію коду і постачальника як унікальний ключ
+        // id рядка каталогу — унікальний ключ
         <li
-          key={`${product.code}-${product.supplier_id}`}
+          key={product.id}
           style={{
             border: "1px solid #eee",
             borderRadius: '8px',
@@ -65,6 +70,12 @@ const CatalogList = () => {
         </li>
       ))}
     </ul>
+    {/* Помилка "Load More" не ховає вже завантажені товари; кнопка лишається для повтору */}
+    {loadMoreError && (
+      <p style={{color: 'red', textAlign: 'center'}}>Не вдалося завантажити ще: {loadMoreError}</p>
+    )}
+    <LoadMoreBtn/>
+    </>
   );
 };
 
@@ -4,23 +4,55 @@ import axios from "axios";
 // Вказуємо адресу вашого локального бекенду
 axios.defaults.baseURL = "http://localhost:8000";
 
-// Асинхронний thunk для пошуку товарів
+// Скільки товарів показуємо за раз (перша сторінка і кожне "Load More")
+export const PAGE_SIZE = 20;
+
+// Асинхронний thunk для пошуку товарів (перша сторінка)
 export const fetchProductsByQuery = createAsyncThunk(
   "products/fetchByQuery",
   async (query, thunkAPI) => {
     try {
-      // Робимо GET запит: /api/search?q=...&limit=20
-      const response = await axios.get("/api/search", {
+      // Робимо GET запит: /api/search/page?q=...&limit=20&estimate=true
+      // Відповідь: { items: [...], next_cursor: "..." | null, estimated_total: число | null }
+      const response = await axios.get("/api/search/page", {
         params: {
           q: query,
-          limit: 20, // Можна змінити ліміт
+          limit: PAGE_SIZE,
+          estimate: true,
         },
       });
-      // Повертаємо дані (масив товарів), які прийшли з бекенду
-      return response.data;
+      return { query, ...response.data };
     } catch (error) {
       // Якщо сталася помилка, повертаємо текст помилки
       return thunkAPI.rejectWithValue(error.message);
     }
   }
-);
\ No newline at end of file
+);
+
+// Наступна сторінка того самого запиту (курсор береться зі стейту)
+export const fetchMoreProducts = createAsyncThunk(
+  "products/fetchMore",
+  async (_, thunkAPI) => {
+    const { query, nextCursor } = thunkAPI.getState().products;
+    try {
+      const response = await axios.get("/api/search/page", {
+        params: {
+          q: query,
+          limit: PAGE_SIZE,
+          cursor: nextCursor,
+        },
+      });
+      return response.data;
+    } catch (error) {
+      return thunkAPI.rejectWithValue(error.message);
+    }
+  },
+  {
+    // Не запускаємо, якщо сторінок більше немає, вже вантажимо
+    // або йде новий пошук (курсор у стейті ще від попереднього запиту)
+    condition: (_, { getState }) => {
+      const { nextCursor, isLoading, isLoadingMore } = getState().products;
+      return Boolean(nextCursor) && !isLoading && !isLoadingMore;
+    },
+  }
+);
@@ -1,32 +1,64 @@
 import { createSlice } from "@reduxjs/toolkit";
-import { fetchProductsByQuery } from "./productsOps";
+import { fetchMoreProducts, fetchProductsByQuery } from "./productsOps";
 
 const initialState = {
   items: [],       // Масив знайдених товарів
+  query: "",       // Поточний пошуковий запит
+  nextCursor: null, // Курсор наступної сторінки (null — більше немає)
+  estimatedTotal: null, // Приблизна кількість збігів
   isLoading: false, // Індикатор завантаження
-  error: null,     // Текст помилки, якщо вона є
+  isLoadingMore: false, // Індикатор завантаження наступної сторінки
+  loadMoreRequestId: null, // requestId актуального "Load More" (відповіді інших ігноруємо)
+  error: null,     // Текст помилки пошуку (замінює список)
+  loadMoreError: null, // Помилка "Load More" (список лишається на місці)
 };
 
 const productsSlice = createSlice({
   name: "products",
   initialState,
-  // Тут ми обробляємо результати асинхронного запиту fetchProductsByQuery
+  // Тут ми обробляємо результати асинхронних запитів
   extraReducers: (builder) => {
     builder
       .addCase(fetchProductsByQuery.pending, (state) => {
         state.isLoading = true;
         state.error = null;
+        // Новий пошук скасовує "Load More" попереднього: його сторінку не дописуємо
+        state.isLoadingMore = false;
+        state.loadMoreRequestId = null;
+        state.loadMoreError = null;
       })
       .addCase(fetchProductsByQuery.fulfilled, (state, action) => {
         state.isLoading = false;
-        state.items = action.payload; // Записуємо отримані товари у стейт
+        state.query = action.payload.query;
+        state.items = action.payload.items; // Записуємо отримані товари у стейт
+        state.nextCursor = action.payload.next_cursor;
+        state.estimatedTotal = action.payload.estimated_total;
       })
       .addCase(fetchProductsByQuery.rejected, (state, action) => {
         state.isLoading = false;
         state.error = action.payload;
+      })
+      .addCase(fetchMoreProducts.pending, (state, action) => {
+        state.isLoadingMore = true;
+        state.loadMoreRequestId = action.meta.requestId;
+        state.loadMoreError = null;
+      })
+      .addCase(fetchMoreProducts.fulfilled, (state, action) => {
+        // Застаріла відповідь (після неї почався новий пошук) — ігноруємо
+        if (action.meta.requestId !== state.loadMoreRequestId) return;
+        state.isLoadingMore = false;
+        state.loadMoreRequestId = null;
+        state.items.push(...action.payload.items); // Дописуємо наступну сторінку
+        state.nextCursor = action.payload.next_cursor;
+      })
+      .addCase(fetchMoreProducts.rejected, (state, action) => {
+        if (action.meta.requestId !== state.loadMoreRequestId) return;
+        state.isLoadingMore = false;
+        state.loadMoreRequestId = null;
+        state.loadMoreError = action.payload ?? action.error.message;
       });
   },
 });
 
 // Експортуємо редьюсер
-export const productsReducer = productsSlice.reducer;
\ No newline at end of file
+export const productsReducer = productsSlice.reducer;